@@ -0,0 +1,264 @@
+"""
+Batched artist refresh from Spotify.
+
+Fetches artist data through Spotify's "Get Several Artists" endpoint, up to
+MAX_ARTISTS_PER_REQUEST artists per request, and writes the updates in
+batched transactions that skip artists whose data did not change.
+
+Each artist row records when it was last fetched, a hash of the last
+normalized payload and the last error, so incremental runs can refresh only
+stale artists and artists whose data did not change are not rewritten.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from database import WRITE_BATCH_SIZE, update_sql, write_batches
+from migrations import SYNC_COLUMNS, migrate
+from spotify_cache import spotify_response_cache
+from spotify_utils import (
+    MAX_ARTISTS_PER_REQUEST,
+    safe_spotify_artist,
+    safe_spotify_artists
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Raw Spotify ids are 22 base-62 characters; locally created artists use 'local:<hex>'
+SPOTIFY_ID_PATTERN = re.compile(r'^[0-9A-Za-z]{22}$')
+
+# Incremental runs refresh artists whose data is older than this many hours
+DEFAULT_STALE_HOURS = float(os.getenv('TOPPEN_STALE_HOURS', '24'))
+
+# Timestamps are stored as text so they compare correctly in SQL
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Artist columns written from a Spotify payload; an update is skipped when none of them changed
+ARTIST_DATA_COLUMNS = (
+    'name', 'popularity', 'followers', 'link', 'picture_small', 'picture_large', 'spotify_payload_hash',
+)
+
+
+def is_spotify_artist_id(artist_id: str) -> bool:
+    """Return True if artist_id looks like a raw Spotify artist id."""
+    return bool(artist_id) and SPOTIFY_ID_PATTERN.match(artist_id) is not None
+
+
+def sync_timestamp(moment: Optional[datetime] = None) -> str:
+    """Format a datetime (default: now) the way sync timestamps are stored."""
+    return (moment or datetime.now()).strftime(TIMESTAMP_FORMAT)
+
+
+def stale_cutoff(stale_hours: float) -> str:
+    """Return the stored-timestamp value older than which data counts as stale."""
+    return sync_timestamp(datetime.now() - timedelta(hours=stale_hours))
+
+
+def payload_hash(payload) -> str:
+    """Return a stable hash of a (normalized) Spotify payload."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_payload_hashes(conn, hash_column: str) -> Dict[str, str]:
+    """Return the stored payload hash per artist id for hash_column."""
+    if hash_column not in SYNC_COLUMNS:
+        raise ValueError(f"Unknown sync column: {hash_column}")
+    return {
+        row[0]: row[1]
+        for row in conn.execute(f'SELECT id, {hash_column} FROM artists WHERE {hash_column} IS NOT NULL')
+    }
+
+
+def select_artists_to_sync(
+    conn,
+    fetched_column: str,
+    stale_hours: Optional[float] = None,
+    max_artists: Optional[int] = None
+) -> List[Tuple[str, str]]:
+    """
+    Select active artists that need a refresh, never-fetched artists first.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        fetched_column: Sync timestamp column to check ('spotify_fetched_at' or 'tracks_fetched_at')
+        stale_hours: Only select artists fetched longer ago than this; None selects all
+        max_artists: Optional cap on the number of artists returned
+
+    Returns:
+        List of (id, name) tuples for artists with a Spotify id
+    """
+    if fetched_column not in SYNC_COLUMNS:
+        raise ValueError(f"Unknown sync column: {fetched_column}")
+
+    query = 'SELECT id, name FROM artists WHERE (bInactivate = 0 OR bInactivate IS NULL)'
+    params = []
+    if stale_hours is not None:
+        query += f' AND ({fetched_column} IS NULL OR {fetched_column} < ?)'
+        params.append(stale_cutoff(stale_hours))
+    # Never-fetched (newly added) artists first, newest additions first, then the stalest;
+    # added_at only orders the never-fetched ones, fetched artists go by fetch time alone
+    query += (
+        f' ORDER BY {fetched_column} IS NOT NULL,'
+        f' CASE WHEN {fetched_column} IS NULL THEN added_at END DESC, {fetched_column}, id'
+    )
+
+    rows = [(row[0], row[1]) for row in conn.execute(query, params) if is_spotify_artist_id(row[0])]
+    if max_artists is not None:
+        rows = rows[:max_artists]
+    return rows
+
+
+def artist_update_values(artist: Dict) -> Dict:
+    """
+    Map a Spotify artist payload to the columns stored in the artists table.
+
+    Args:
+        artist: Artist dict as returned by the Spotify API
+
+    Returns:
+        Dict with name, popularity, followers, link, picture_small and picture_large
+    """
+    images = artist.get('images') or []
+    return {
+        'name': artist['name'].replace('"', "''"),
+        'popularity': artist['popularity'],
+        'followers': artist['followers']['total'],
+        'link': artist['external_urls']['spotify'],
+        'picture_large': images[0]['url'] if len(images) > 0 else "",
+        'picture_small': images[1]['url'] if len(images) > 1 else "",
+    }
+
+
+def fetch_artists_batched(
+    sp,
+    artist_ids: List[str],
+    batch_size: int = MAX_ARTISTS_PER_REQUEST,
+    cache=spotify_response_cache
+) -> Iterator[Tuple[str, Optional[Dict]]]:
+    """
+    Fetch artists from Spotify in batches of up to batch_size ids per request.
+
+    If a whole batch fails (after the retries done by spotify_request_with_retry),
+    the artists in that batch are fetched one by one so that a single bad id
+    does not cost the rest of the batch.
+
+    Args:
+        sp: Spotify client instance
+        artist_ids: Spotify artist ids to fetch
+        batch_size: Number of ids per request (max MAX_ARTISTS_PER_REQUEST)
+        cache: Spotify response cache to use (None disables it)
+
+    Yields:
+        (artist_id, artist dict or None) tuples in the order of artist_ids
+    """
+    batch_size = max(1, min(batch_size, MAX_ARTISTS_PER_REQUEST))
+
+    for start in range(0, len(artist_ids), batch_size):
+        batch = artist_ids[start:start + batch_size]
+        artists = safe_spotify_artists(sp, batch, cache=cache)
+
+        if artists is None or len(artists) != len(batch):
+            logger.warning(f"Batch request for {len(batch)} artists failed, falling back to single requests")
+            for artist_id in batch:
+                yield artist_id, safe_spotify_artist(sp, artist_id, cache=cache)
+            continue
+
+        for artist_id, artist in zip(batch, artists):
+            yield artist_id, artist
+
+
+def refresh_artists_from_spotify(
+    conn,
+    sp,
+    batch_size: int = MAX_ARTISTS_PER_REQUEST,
+    stale_hours: Optional[float] = None,
+    max_artists: Optional[int] = None,
+    write_batch_size: int = WRITE_BATCH_SIZE
+) -> Dict:
+    """
+    Refresh popularity, followers, links and images for active artists.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        sp: Spotify client instance
+        batch_size: Number of artists per Spotify request (max MAX_ARTISTS_PER_REQUEST)
+        stale_hours: Incremental mode; only refresh artists fetched longer ago
+            than this many hours (never-fetched artists always qualify)
+        max_artists: Optional cap on the number of artists refreshed in this run
+        write_batch_size: Artists written per database transaction
+
+    Returns:
+        dict: total, update_count (artists whose stored data changed),
+        changed_count (the same number), unchanged_count, changed_ids (set
+        of artist ids whose stored data changed), error_count and failed_ids
+    """
+    migrate(conn)
+
+    artists = select_artists_to_sync(conn, 'spotify_fetched_at', stale_hours, max_artists)
+    artist_ids = [artist_id for artist_id, _ in artists]
+
+    results = {
+        'total': len(artist_ids),
+        'update_count': 0,
+        'changed_count': 0,
+        'unchanged_count': 0,
+        'changed_ids': set(),
+        'error_count': 0,
+        'failed_ids': [],
+    }
+    if stale_hours is not None:
+        logger.info(f"Incremental refresh: {len(artist_ids)} artists older than {stale_hours:g} hours")
+    logger.info(f"Refreshing {len(artist_ids)} artists from Spotify in batches of {batch_size}...")
+
+    fetched_at = sync_timestamp()
+    stored_hashes = load_payload_hashes(conn, 'spotify_payload_hash')
+    updates = []
+    unchanged = []
+    failures = []
+    for i, (artist_id, artist) in enumerate(fetch_artists_batched(sp, artist_ids, batch_size), 1):
+        if not artist:
+            logger.error(f"Failed to get artist data for {artist_id}")
+            results['error_count'] += 1
+            results['failed_ids'].append(artist_id)
+            failures.append([f"{fetched_at}: no artist data returned by Spotify", artist_id])
+            continue
+
+        # Hash only the fields we store, so unrelated payload changes don't count
+        values = artist_update_values(artist)
+        values_hash = payload_hash(values)
+        if stored_hashes.get(artist_id) == values_hash:
+            unchanged.append([fetched_at, artist_id])
+            continue
+
+        logger.debug(f"[{i}/{len(artist_ids)}] Updating: {values['name']}")
+        values['spotify_payload_hash'] = values_hash
+        values['spotify_fetched_at'] = fetched_at
+        values['id'] = artist_id
+        updates.append(values)
+        results['changed_ids'].add(artist_id)
+
+    # Changed artists are rewritten. Unchanged ones still get one small write:
+    # their fetch time, which the incremental mode (stale_hours) selects by
+    write_batches(conn, updates, [
+        update_sql('artists', ARTIST_DATA_COLUMNS),
+        'UPDATE artists SET spotify_fetched_at = :spotify_fetched_at, spotify_last_error = NULL WHERE id = :id',
+    ], batch_size=write_batch_size)
+    write_batches(conn, unchanged, [
+        'UPDATE artists SET spotify_fetched_at = ?, spotify_last_error = NULL WHERE id = ?',
+    ], batch_size=write_batch_size)
+    write_batches(conn, failures, ['UPDATE artists SET spotify_last_error = ? WHERE id = ?'],
+                  batch_size=write_batch_size)
+    results['update_count'] = results['changed_count'] = len(updates)
+    results['unchanged_count'] = len(unchanged)
+
+    logger.info(
+        f"Artist refresh completed: {results['update_count']} updated, "
+        f"{results['unchanged_count']} unchanged, {results['error_count']} errors"
+    )
+    return results
@@ -0,0 +1,355 @@
+"""
+Shared data-access helpers for the toppen database.
+
+Connections come from a small per-thread pool: get_connection() hands each
+thread one tuned connection (WAL journal, busy timeout, larger page cache
+and memory-mapped reads) and reuses it until release_connection() returns
+it to the pool, e.g. at the end of a web request. Calling close() on a
+pooled connection only rolls back an open transaction. Read-only work can
+use a separate connection opened with mode=ro, which never takes a write
+lock.
+
+Bulk writes go through executemany() in batches of WRITE_BATCH_SIZE rows
+with one transaction per batch, instead of one statement and one commit per
+row. Upserts use INSERT ... ON CONFLICT DO UPDATE with a WHERE clause that
+skips rows whose values did not change, so an unchanged row costs neither a
+page write nor a journal entry.
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Database used by the web admin and the CLI scripts
+DB_PATH = os.getenv('TOPPEN_DB_PATH', 'toppen.sqlite3')
+
+# Milliseconds a connection waits for a lock held by another writer before failing
+BUSY_TIMEOUT_MS = int(os.getenv('TOPPEN_DB_BUSY_TIMEOUT', '5000'))
+
+# Page cache per connection in KiB (negative cache_size means KiB in SQLite)
+CACHE_SIZE_KB = 20000
+
+# Bytes of the database file read through mmap instead of read() calls
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Idle connections kept per (path, mode) for reuse by later threads
+POOL_SIZE = 8
+
+# Rows per executemany() call and per transaction for bulk writes
+WRITE_BATCH_SIZE = int(os.getenv('TOPPEN_WRITE_BATCH_SIZE', '500'))
+
+# Column order of the tracks table, as produced by track_sync.track_rows_from_payload()
+TRACK_COLUMNS = ('id', 'artist_id', 'name', 'popularity', 'album_type', 'url', 'release_date')
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() keeps it open for reuse."""
+
+    def close(self):
+        """Roll back any open transaction; the pool owns the connection."""
+        self.rollback()
+
+    def dispose(self):
+        """Really close the connection."""
+        super().close()
+
+
+def connect(
+    db_path: str = DB_PATH,
+    readonly: bool = False,
+    factory=sqlite3.Connection,
+    check_same_thread: bool = True
+) -> sqlite3.Connection:
+    """
+    Open a new tuned connection.
+
+    Read-write connections switch the database to WAL so readers and the
+    sync writer don't block each other; read-only connections are opened
+    with mode=ro and query_only.
+
+    Args:
+        db_path: SQLite database file
+        readonly: Open the database read-only
+        factory: Connection class to instantiate
+        check_same_thread: Passed on to sqlite3.connect()
+
+    Returns:
+        Open connection (the caller closes it)
+    """
+    if readonly:
+        conn = sqlite3.connect(
+            f'file:{db_path}?mode=ro', uri=True, factory=factory, check_same_thread=check_same_thread
+        )
+    else:
+        conn = sqlite3.connect(db_path, factory=factory, check_same_thread=check_same_thread)
+
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    else:
+        # WAL is persistent in the database file; NORMAL sync is durable enough with WAL
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+_idle_connections: Dict[Tuple[str, bool], queue.LifoQueue] = {}
+_idle_lock = threading.Lock()
+_thread_connections = threading.local()
+
+
+def _idle_pool(key: Tuple[str, bool]) -> queue.LifoQueue:
+    with _idle_lock:
+        return _idle_connections.setdefault(key, queue.LifoQueue(maxsize=POOL_SIZE))
+
+
+def get_connection(
+    db_path: str = DB_PATH,
+    readonly: bool = False,
+    row_factory=sqlite3.Row
+) -> PooledConnection:
+    """
+    Return this thread's pooled connection, taking one from the pool if needed.
+
+    The same connection is returned on every call from the thread until
+    release_connection() is called.
+
+    Args:
+        db_path: SQLite database file
+        readonly: Use the read-only connection for db_path
+        row_factory: Row factory set on the connection (None for plain tuples)
+
+    Returns:
+        Pooled connection; close() only rolls back
+    """
+    key = (db_path, readonly)
+    connections = getattr(_thread_connections, 'connections', None)
+    if connections is None:
+        connections = _thread_connections.connections = {}
+
+    conn = connections.get(key)
+    if conn is None:
+        try:
+            conn = _idle_pool(key).get_nowait()
+        except queue.Empty:
+            conn = connect(db_path, readonly, factory=PooledConnection, check_same_thread=False)
+        connections[key] = conn
+
+    conn.row_factory = row_factory
+    return conn
+
+
+def release_connection():
+    """Return the calling thread's connections to the pool."""
+    connections = getattr(_thread_connections, 'connections', None) or {}
+    while connections:
+        key, conn = connections.popitem()
+        try:
+            conn.rollback()
+            _idle_pool(key).put_nowait(conn)
+        except queue.Full:
+            conn.dispose()
+        except sqlite3.Error:
+            logger.exception("Discarding broken pooled connection to %s", key[0])
+            conn.dispose()
+
+
+def close_all_connections():
+    """Release this thread's connections and close every idle pooled connection."""
+    release_connection()
+    with _idle_lock:
+        pools = list(_idle_connections.values())
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().dispose()
+            except queue.Empty:
+                break
+
+
+def batched(rows: Iterable, batch_size: int = WRITE_BATCH_SIZE) -> Iterator[List]:
+    """Yield lists of at most batch_size rows."""
+    batch_size = max(1, batch_size)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def upsert_sql(
+    table: str,
+    columns: Sequence[str],
+    conflict_columns: Sequence[str],
+    compare_columns: Optional[Sequence[str]] = None
+) -> str:
+    """
+    Build an INSERT ... ON CONFLICT DO UPDATE statement with positional parameters.
+
+    Args:
+        table: Table to write
+        columns: Columns in the order of the row tuples
+        conflict_columns: Primary key or unique columns the conflict is detected on
+        compare_columns: Columns compared to decide whether an existing row changed;
+            defaults to every column that is not a conflict column
+
+    Returns:
+        SQL string for executemany() with one '?' per column
+    """
+    update_columns = [column for column in columns if column not in conflict_columns]
+    if compare_columns is None:
+        compare_columns = update_columns
+
+    assignments = ', '.join(f'{column} = excluded.{column}' for column in update_columns)
+    changed = ' OR '.join(f'{table}.{column} IS NOT excluded.{column}' for column in compare_columns)
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)}) '
+        f'ON CONFLICT ({", ".join(conflict_columns)}) DO UPDATE SET {assignments} '
+        f'WHERE {changed}'
+    )
+
+
+def update_sql(
+    table: str,
+    columns: Sequence[str],
+    key_column: str = 'id',
+    compare_columns: Optional[Sequence[str]] = None
+) -> str:
+    """
+    Build an UPDATE statement with named parameters that skips unchanged rows.
+
+    Args:
+        table: Table to write
+        columns: Columns to set; rows are dicts with these keys plus key_column
+        key_column: Column identifying the row
+        compare_columns: Columns compared to decide whether the row changed;
+            defaults to columns
+
+    Returns:
+        SQL string for executemany() with dict rows
+    """
+    if compare_columns is None:
+        compare_columns = columns
+
+    assignments = ', '.join(f'{column} = :{column}' for column in columns)
+    changed = ' OR '.join(f'{column} IS NOT :{column}' for column in compare_columns)
+    return f'UPDATE {table} SET {assignments} WHERE {key_column} = :{key_column} AND ({changed})'
+
+
+def write_batches(
+    conn,
+    rows: Iterable,
+    statements: Sequence[str],
+    batch_size: int = WRITE_BATCH_SIZE
+) -> int:
+    """
+    Run statements with executemany() over rows, one transaction per batch.
+
+    Every statement is applied to a batch before the batch is committed, so
+    related writes (e.g. data and bookkeeping columns) land together.
+
+    Args:
+        conn: Open sqlite3 connection
+        rows: Parameter rows shared by all statements
+        statements: SQL statements to execute for each batch
+        batch_size: Rows per batch and per transaction
+
+    Returns:
+        Number of rows changed
+    """
+    changes = conn.total_changes
+    for batch in batched(rows, batch_size):
+        with conn:
+            for statement in statements:
+                conn.executemany(statement, batch)
+    return conn.total_changes - changes
+
+
+def store_artist_tracks(conn, artist_tracks: Dict[str, List[Tuple]], fetched_at: str) -> int:
+    """
+    Replace the stored top tracks of several artists inside the caller's transaction.
+
+    Tracks are upserted (unchanged rows are skipped), tracks that dropped out
+    of an artist's top list are deleted and the artists' tracks_fetched_at is
+    set. The caller owns the transaction so a batch of artists is written
+    with a single commit.
+
+    Args:
+        conn: Open sqlite3 connection inside a transaction
+        artist_tracks: Track rows in TRACK_COLUMNS order keyed by artist id
+        fetched_at: Sync timestamp stored in tracks_fetched_at
+
+    Returns:
+        Number of track rows inserted, updated or deleted
+    """
+    changes = conn.total_changes
+    conn.executemany(
+        upsert_sql('tracks', TRACK_COLUMNS, ['id']),
+        [row for rows in artist_tracks.values() for row in rows]
+    )
+    conn.executemany(
+        'DELETE FROM tracks WHERE artist_id = ? AND id NOT IN (SELECT value FROM json_each(?))',
+        [(artist_id, json.dumps([row[0] for row in rows])) for artist_id, rows in artist_tracks.items()]
+    )
+    tracks_changed = conn.total_changes - changes
+    conn.executemany(
+        'UPDATE artists SET tracks_fetched_at = ? WHERE id = ?',
+        [(fetched_at, artist_id) for artist_id in artist_tracks]
+    )
+    return tracks_changed
+
+
+# Number of top tracks shown per artist on the toplist
+TOP_TRACKS_PER_ARTIST = 5
+
+
+def load_top_tracks(conn, limit: int = TOP_TRACKS_PER_ARTIST) -> Dict[str, List[Dict]]:
+    """
+    Load the most popular tracks of every artist in a single query.
+
+    The window scans the tracks_artist_popularity index (schema migration 6)
+    in order, so no sort is needed.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        limit: Maximum number of tracks per artist
+
+    Returns:
+        dict mapping artist id to a list of {'name', 'popularity', 'url'} dicts,
+        most popular first
+    """
+    rows = conn.execute('''
+        SELECT artist_id, name, popularity, url
+        FROM (
+            SELECT artist_id, name, popularity, url,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY artist_id
+                       ORDER BY popularity DESC, name COLLATE NOCASE ASC
+                   ) AS position
+            FROM tracks
+        )
+        WHERE position <= ?
+        ORDER BY artist_id, position
+    ''', [limit]).fetchall()
+
+    top_tracks = {}
+    for artist_id, name, popularity, url in rows:
+        top_tracks.setdefault(artist_id, []).append({
+            'name': name or 'Okänd låt',
+            'popularity': popularity if popularity is not None else 0,
+            'url': url or '',
+        })
+    return top_tracks
@@ -0,0 +1,219 @@
+"""
+Persistent SQLite-backed cache of rendered page fragments.
+
+Every generated page is mostly a long run of repeated cards (one per artist
+or track). Between two runs only a handful of rows usually change, so each
+card's rendered HTML is stored under a hash of the template version and the
+exact context it was rendered from. A page run looks the cards up in
+batches, renders only the misses and hands the fragments to the page
+template, which just concatenates them.
+
+The template version is a hash of the card template's source, so editing a
+card invalidates its fragments. Entries a complete page run did not use
+(rows that changed or disappeared, old template versions) are evicted at
+the end of that run.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from markupsafe import Markup
+
+from renderer import get_environment
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cache database location; set TOPPEN_FRAGMENT_CACHE to an empty string to disable caching
+FRAGMENT_CACHE_PATH = os.getenv('TOPPEN_FRAGMENT_CACHE', 'fragment_cache.sqlite3')
+
+# Bump when a filter or global used by the card templates changes output
+FRAGMENT_FORMAT_VERSION = 1
+
+# Rows looked up and stored per query
+FRAGMENT_BATCH_SIZE = 500
+
+
+def make_fragment_key(version: str, context: Dict) -> str:
+    """Build a stable cache key from a template version and a card's context."""
+    payload = json.dumps(context, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(f'{version}\0{payload}'.encode('utf-8')).hexdigest()
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class FragmentCache:
+    """
+    On-disk cache of rendered card fragments.
+
+    Each render() call uses its own connection, so page generators running
+    in different threads or processes can share the cache file.
+
+    Args:
+        path: SQLite file used for the cache
+        batch_size: Rows looked up and stored per query
+    """
+
+    def __init__(self, path: str = FRAGMENT_CACHE_PATH, batch_size: int = FRAGMENT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        try:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fragments (
+                    key TEXT PRIMARY KEY,
+                    template TEXT NOT NULL,
+                    html TEXT NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS fragments_template_used_at ON fragments (template, used_at)')
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"Fragment cache unavailable, rendering without it: {e}")
+            return None
+
+    def template_version(self, template_name: str) -> str:
+        """Return a hash identifying the current source of a card template."""
+        env = get_environment()
+        source, _, _ = env.loader.get_source(env, template_name)
+        payload = f'{FRAGMENT_FORMAT_VERSION}\0{template_name}\0{source}'
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _lookup(self, conn: sqlite3.Connection, keys: List[str], now: float) -> Dict[str, str]:
+        placeholders = ', '.join('?' * len(keys))
+        rows = conn.execute(
+            f'SELECT key, html FROM fragments WHERE key IN ({placeholders})', keys
+        ).fetchall()
+        if rows:
+            # Commit right away so other processes sharing the cache are not locked out
+            conn.execute(
+                f'UPDATE fragments SET used_at = ? WHERE key IN ({placeholders})', [now] + keys
+            )
+            conn.commit()
+        return dict(rows)
+
+    def render(self, template_name: str, contexts: Iterable[Dict], evict: bool = True) -> Iterator[Markup]:
+        """
+        Yield the rendered card for each context, reusing cached fragments.
+
+        Contexts are consumed lazily in batches, so rows can come straight
+        from a cursor. Stale entries for the template are evicted once every
+        context has been rendered; an abandoned run leaves the cache as is.
+
+        Args:
+            template_name: Card template path relative to templates/
+            contexts: Template variables for each card, in page order
+            evict: Evict stale entries at the end; pass False when contexts
+                are only part of a page and call evict_unused() once the
+                whole page is done
+
+        Yields:
+            Rendered card HTML, safe to output in an autoescaped template
+        """
+        template = get_environment().get_template(template_name)
+        conn = self._connect() if self.path else None
+        if conn is None:
+            for context in contexts:
+                yield Markup(template.render(context))
+            return
+
+        version = self.template_version(template_name)
+        started = time.time()
+        hits = misses = 0
+        try:
+            for batch in _batches(contexts, self.batch_size):
+                keys = [make_fragment_key(version, context) for context in batch]
+                try:
+                    cached = self._lookup(conn, keys, started)
+                except sqlite3.Error as e:
+                    logger.warning(f"Fragment cache read failed: {e}")
+                    cached = {}
+
+                rendered = []
+                for key, context in zip(keys, batch):
+                    html = cached.get(key)
+                    if html is None:
+                        html = template.render(context)
+                        rendered.append((key, template_name, html, started))
+                    yield Markup(html)
+                hits += len(batch) - len(rendered)
+                misses += len(rendered)
+
+                try:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO fragments (key, template, html, used_at)
+                        VALUES (?, ?, ?, ?)
+                    ''', rendered)
+                    conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Fragment cache write failed: {e}")
+                    conn.rollback()
+
+            evicted = self._evict(conn, template_name, started) if evict else 0
+            logger.info("Fragments for %s: %d cached, %d rendered, %d evicted",
+                        template_name, hits, misses, evicted)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, template_name: str, since: float) -> int:
+        try:
+            evicted = conn.execute(
+                'DELETE FROM fragments WHERE template = ? AND used_at < ?', [template_name, since]
+            ).rowcount
+            conn.commit()
+            return evicted
+        except sqlite3.Error as e:
+            logger.warning(f"Fragment cache eviction failed: {e}")
+            return 0
+
+    def evict_unused(self, template_name: str, since: float) -> int:
+        """
+        Evict a template's entries not used since a point in time.
+
+        Args:
+            template_name: Card template path relative to templates/
+            since: time.time() taken before the page's cards were rendered
+
+        Returns:
+            Number of evicted entries
+        """
+        conn = self._connect() if self.path else None
+        if conn is None:
+            return 0
+        try:
+            return self._evict(conn, template_name, since)
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Remove every cached fragment."""
+        conn = self._connect() if self.path else None
+        if conn is None:
+            return
+        try:
+            conn.execute('DELETE FROM fragments')
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# Shared by every page generator in this process
+fragment_cache = FragmentCache()
@@ -29,6 +29,7 @@ fi
 
 # Default options
 UPDATE_SPOTIFY=false
+FORCE_REFRESH=false
 INCLUDE_RANDOM_ARTIST_LIST=false
 VERBOSE=false
 
@@ -39,6 +40,10 @@ while [[ $# -gt 0 ]]; do
             UPDATE_SPOTIFY=true
             shift
             ;;
+        -f|--force-refresh)
+            FORCE_REFRESH=true
+            shift
+            ;;
         -v|--verbose)
             VERBOSE=true
             shift
@@ -53,6 +58,7 @@ while [[ $# -gt 0 ]]; do
             echo ""
             echo "Options:"
             echo "  -u, --update-spotify    Update artist data from Spotify first"
+            echo "  -f, --force-refresh     Ignore cached Spotify responses"
             echo "  -r, --include-random-artist-list  Also generate randomized artist list HTML"
             echo "  -v, --verbose          Enable verbose output"
             echo "  -h, --help             Show this help message"
@@ -79,6 +85,9 @@ CMD="python generate_all_cli.py"
 if [ "$UPDATE_SPOTIFY" = true ]; then
     CMD="$CMD --update-spotify"
 fi
+if [ "$FORCE_REFRESH" = true ]; then
+    CMD="$CMD --force-refresh"
+fi
 if [ "$INCLUDE_RANDOM_ARTIST_LIST" = true ]; then
     CMD="$CMD --include-random-artist-list"
 fi
@@ -2,6 +2,10 @@
 """
 Generate All Lists - CLI Version
 Generates both toplist and songs list in one run with optional Spotify updates.
+
+The steps run as a dependency-aware pipeline (see pipeline.py): lists whose
+inputs have not changed since the last run are skipped, and independent
+steps run in parallel.
 """
 
 import sys
@@ -14,12 +18,14 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import our utilities and web_admin functions
-from spotify_utils import rate_limit_delay
-from generate_random_artist_list import generate_random_artist_list
-from web_admin import (
-    get_db_connection, generate_html_toplist, generate_html_songs,
-    safe_spotify_artist, sp, logger
-)
+from artist_sync import DEFAULT_STALE_HOURS, refresh_artists_from_spotify
+from spotify_cache import spotify_response_cache
+from parallel_render import RENDER_PROCESSES
+from pipeline import STATUS_FAILED
+from precompress import PRECOMPRESS
+from song_shards import SONGS_OUTPUT, SONGS_OUTPUT_MODES, SONGS_SHARD_SIZE
+from toplist_data import TOPLIST_OUTPUT, TOPLIST_OUTPUT_MODES
+from web_admin import run_generation_pipeline, logger
 
 def setup_logging(verbose=False):
     """Setup logging configuration"""
@@ -33,75 +39,10 @@ def setup_logging(verbose=False):
         ]
     )
 
-def update_artists_from_spotify():
-    """Update all artist data from Spotify"""
-    if not sp:
-        logger.error("Spotify client not configured. Skipping artist updates.")
-        return 0, 0
-    
-    logger.info("Updating artist data from Spotify...")
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    update_count = 0
-    error_count = 0
-    
-    total_artists = conn.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
-    logger.info(f"Processing {total_artists} artists...")
-    
-    for i, row in enumerate(cur.execute('SELECT * FROM artists ORDER BY id'), 1):
-        urn = row['id']
-        
-        logger.debug(f"Processing artist {i}/{total_artists}: {urn}")
-        
-        # Use safe Spotify artist call with retry handling
-        artist = safe_spotify_artist(sp, urn)
-        if not artist:
-            logger.error(f"Failed to get artist data for {urn}")
-            error_count += 1
-            continue
-        
-        print(f"[{i:3d}/{total_artists}] Updating: {artist['name']}")
-        
-        if row['bInactivate'] != 0:
-            logger.debug(f"Skipping inactive artist: {artist['name']}")
-            continue
-            
-        name = artist['name'].replace('"', "''")
-        popularity = artist['popularity']
-        followers = artist['followers']['total']
-        link = artist['external_urls']['spotify']
-        picture_small = ""
-        picture_large = ""
-        
-        if len(artist['images']) > 0:
-            picture_large = artist['images'][0]['url']
-        if len(artist['images']) > 1:
-            picture_small = artist['images'][1]['url']
-        
-        conn.execute('''
-            UPDATE artists 
-            SET name = ?, popularity = ?, followers = ?, link = ?, 
-                picture_small = ?, picture_large = ?
-            WHERE id = ?
-        ''', [name, popularity, followers, link, picture_small, picture_large, urn])
-        
-        update_count += 1
-        
-        # Add small delay between requests to be respectful
-        rate_limit_delay()
-        
-        # Show progress every 10 artists
-        if i % 10 == 0:
-            logger.info(f"Progress: {i}/{total_artists} artists processed")
-    
-    conn.commit()
-    conn.close()
-    
-    logger.info(f"Artist update completed: {update_count} updated, {error_count} errors")
-    return update_count, error_count
-
-def generate_all_lists(update_spotify=False, include_random_artist_list=False, verbose=False):
+def generate_all_lists(update_spotify=False, include_random_artist_list=False, verbose=False, force_refresh=False,
+                       incremental=False, stale_hours=DEFAULT_STALE_HOURS, max_artists=None,
+                       sync_tracks=False, match_links=False, force=False, processes=RENDER_PROCESSES,
+                       toplist_output=TOPLIST_OUTPUT, songs_output=SONGS_OUTPUT, precompress=PRECOMPRESS):
     """
     Generate all lists (toplist and songs) in one run
     
@@ -109,132 +50,119 @@ def generate_all_lists(update_spotify=False, include_random_artist_list=False, v
         update_spotify (bool): Whether to update artist data from Spotify first
         include_random_artist_list (bool): Whether to generate randomized artist list HTML
         verbose (bool): Enable verbose logging
+        force_refresh (bool): Ignore cached Spotify responses and fetch everything again
+        incremental (bool): Only refresh artists whose Spotify data is older than stale_hours
+        stale_hours (float): Staleness window in hours for incremental refreshes
+        max_artists (int): Optional cap on the number of artists refreshed
+        sync_tracks (bool): Whether to sync top tracks from Spotify first
+        match_links (bool): Whether to match missing Apple Music and YouTube Music links first
+        force (bool): Regenerate every list even if its inputs are unchanged
+        processes (int): Render the lists from one read snapshot in this many worker processes
+        toplist_output (str): Toplist output mode, 'cards' or 'data'
+        songs_output (str): Songs list output mode, 'single' or 'sharded'
+        precompress (bool): Write .gz and .br siblings of the generated files
         
     Returns:
         dict: Results summary with generated files and statistics
     """
     setup_logging(verbose)
     
+    if force_refresh:
+        spotify_response_cache.force_refresh = True
+    
     start_time = datetime.now()
     logger.info("="*60)
     logger.info("Starting batch generation of all lists")
     logger.info(f"Start time: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"Update from Spotify: {'Yes' if update_spotify else 'No'}")
+    logger.info(f"Sync top tracks: {'Yes' if sync_tracks else 'No'}")
+    if (update_spotify or sync_tracks) and incremental:
+        logger.info(f"Incremental refresh: artists older than {stale_hours:g} hours")
+    if update_spotify or sync_tracks:
+        logger.info(f"Spotify response cache: {'Bypassed (force refresh)' if spotify_response_cache.force_refresh else 'Enabled'}")
+    logger.info(f"Match music links: {'Yes' if match_links else 'No'}")
     logger.info(f"Include random artist list: {'Yes' if include_random_artist_list else 'No'}")
+    logger.info(f"Regenerate unchanged lists: {'Yes' if force else 'No'}")
+    logger.info(f"Render processes: {processes if processes > 1 else 'In-process'}")
+    logger.info(f"Toplist output: {toplist_output}")
+    logger.info(f"Songs output: {songs_output}")
+    logger.info(f"Precompress outputs: {'Yes' if precompress else 'No'}")
     logger.info("="*60)
     
-    results = {
-        'toplist_file': None,
-        'songs_file': None,
-        'random_artist_file': None,
-        'update_count': 0,
-        'error_count': 0,
-        'errors': [],
-        'start_time': start_time,
-        'end_time': None,
-        'duration': None
-    }
-    
     try:
-        # Step 1: Update artist data from Spotify if requested
-        if update_spotify:
-            logger.info("Step 1/4: Updating artist data from Spotify...")
-            update_count, error_count = update_artists_from_spotify()
-            results['update_count'] = update_count
-            results['error_count'] += error_count
-            
-            if error_count > 0:
-                results['errors'].append(f"Failed to update {error_count} artists from Spotify")
-        else:
-            logger.info("Step 1/4: Skipping Spotify update (not requested)")
-        
-        # Step 2: Generate HTML toplist
-        logger.info("Step 2/4: Generating HTML toplist...")
-        logger.info("Step 2/4: Toplist uses DB-only mode (no Spotify API calls during static generation)")
-        try:
-            results['toplist_file'] = generate_html_toplist()
-            logger.info(f"✅ Toplist generated: {results['toplist_file']}")
-        except Exception as e:
-            error_msg = f"Error generating toplist: {str(e)}"
-            logger.error(f"❌ {error_msg}")
-            results['errors'].append(error_msg)
-            results['error_count'] += 1
-        
-        # Step 3: Generate HTML songs list
-        logger.info("Step 3/4: Generating HTML songs list...")
-        try:
-            results['songs_file'] = generate_html_songs()
-            logger.info(f"✅ Songs list generated: {results['songs_file']}")
-        except Exception as e:
-            error_msg = f"Error generating songs list: {str(e)}"
-            logger.error(f"❌ {error_msg}")
-            results['errors'].append(error_msg)
-            results['error_count'] += 1
-
-        # Step 4: Generate randomized artist list (optional)
-        if include_random_artist_list:
-            logger.info("Step 4/4: Generating randomized artist list...")
-            try:
-                results['random_artist_file'] = generate_random_artist_list()
-                logger.info(f"✅ Random artist list generated: {results['random_artist_file']}")
-            except Exception as e:
-                error_msg = f"Error generating random artist list: {str(e)}"
-                logger.error(f"❌ {error_msg}")
-                results['errors'].append(error_msg)
-                results['error_count'] += 1
-        else:
-            logger.info("Step 4/4: Skipping randomized artist list (not requested)")
-        
-        # Calculate completion stats
-        results['end_time'] = datetime.now()
-        results['duration'] = results['end_time'] - results['start_time']
-        
-        # Summary
-        logger.info("="*60)
-        logger.info("BATCH GENERATION SUMMARY")
-        logger.info("="*60)
-        logger.info(f"Duration: {results['duration']}")
-        logger.info(f"Files generated:")
-        if results['toplist_file']:
-            logger.info(f"  ✅ Toplist: {results['toplist_file']}")
-        else:
-            logger.info(f"  ❌ Toplist: Failed to generate")
-        
-        if results['songs_file']:
-            logger.info(f"  ✅ Songs: {results['songs_file']}")
-        else:
-            logger.info(f"  ❌ Songs: Failed to generate")
-
-        if include_random_artist_list:
-            if results['random_artist_file']:
-                logger.info(f"  ✅ Random artists: {results['random_artist_file']}")
-            else:
-                logger.info(f"  ❌ Random artists: Failed to generate")
-        
-        if update_spotify:
-            logger.info(f"Artists updated from Spotify: {results['update_count']}")
-        
-        if results['error_count'] > 0:
-            logger.info(f"Total errors: {results['error_count']}")
-            for error in results['errors']:
-                logger.info(f"  - {error}")
-        else:
-            logger.info("✅ No errors encountered")
-        
-        logger.info("="*60)
-        
-        return results
-        
+        results = run_generation_pipeline(
+            update_spotify=update_spotify,
+            sync_tracks=sync_tracks,
+            match_links=match_links,
+            include_random_artist_list=include_random_artist_list,
+            stale_hours=stale_hours if incremental else None,
+            max_artists=max_artists,
+            force=force,
+            processes=processes,
+            toplist_output=toplist_output,
+            songs_output=songs_output,
+            precompress=precompress
+        )
     except Exception as e:
         error_msg = f'Critical error during batch generation: {str(e)}'
         logger.error(error_msg)
         import traceback
         logger.error(traceback.format_exc())
-        results['errors'].append(error_msg)
-        results['error_count'] += 1
-        results['end_time'] = datetime.now()
-        results['duration'] = results['end_time'] - results['start_time']
-        return results
+        results = {
+            'toplist_file': None,
+            'songs_file': None,
+            'random_artist_file': None,
+            'update_count': 0,
+            'changed_artist_ids': set(),
+            'track_count': 0,
+            'error_count': 1,
+            'errors': [error_msg],
+            'skipped': [],
+            'steps': {},
+        }
+    
+    # Calculate completion stats
+    results['start_time'] = start_time
+    results['end_time'] = datetime.now()
+    results['duration'] = results['end_time'] - results['start_time']
+    
+    # Summary
+    logger.info("="*60)
+    logger.info("BATCH GENERATION SUMMARY")
+    logger.info("="*60)
+    logger.info(f"Duration: {results['duration']}")
+    logger.info("Steps:")
+    for name, step in results['steps'].items():
+        marker = '❌' if step['status'] == STATUS_FAILED else '✅'
+        logger.info(f"  {marker} {name}: {step['status']} ({step['elapsed']:.1f}s)")
+    
+    logger.info(f"Files generated:")
+    files = [('Toplist', 'toplist', 'toplist_file'), ('Songs', 'songs', 'songs_file')]
+    if include_random_artist_list:
+        files.append(('Random artists', 'random_artist_list', 'random_artist_file'))
+    for label, step, key in files:
+        if not results[key]:
+            logger.info(f"  ❌ {label}: Failed to generate")
+        elif step in results['skipped']:
+            logger.info(f"  ✅ {label}: {results[key]} (up to date)")
+        else:
+            logger.info(f"  ✅ {label}: {results[key]}")
+    
+    if update_spotify:
+        logger.info(f"Artists updated from Spotify: {results['update_count']}")
+    if sync_tracks:
+        logger.info(f"Tracks synced from Spotify: {results['track_count']}")
+    
+    if results['error_count'] > 0:
+        logger.info(f"Total errors: {results['error_count']}")
+        for error in results['errors']:
+            logger.info(f"  - {error}")
+    else:
+        logger.info("✅ No errors encountered")
+    
+    logger.info("="*60)
+    
+    return results
 
 def main():
     """Main CLI function"""
@@ -245,15 +173,29 @@ def main():
 Examples:
   python generate_all_cli.py                    # Generate lists without Spotify update
   python generate_all_cli.py --update-spotify  # Update from Spotify first, then generate
+  python generate_all_cli.py -u --force-refresh  # Update from Spotify, ignoring cached responses
+  python generate_all_cli.py -u --incremental --stale-hours 6  # Only refresh artists older than 6 hours
+  python generate_all_cli.py -u --sync-tracks --match-links  # Refresh artists, tracks and music links first
+  python generate_all_cli.py --force            # Regenerate lists even if nothing changed
+  python generate_all_cli.py --force -p 8       # Regenerate lists in 8 worker processes
     python generate_all_cli.py --include-random-artist-list  # Also generate randomized artist list
   python generate_all_cli.py -v                # Verbose output
     python generate_all_cli.py --update-spotify --include-random-artist-list -v  # Full update with verbose output
 
 This script will:
 1. Optionally update all artist data from Spotify (popularity, followers, images)
-2. Generate HTML toplist ranking artists by popularity
-3. Generate HTML songs list with all top tracks
-4. Optionally generate randomized artist list with Spotify links and images
+2. Optionally sync top tracks from Spotify and match missing Apple Music and
+   YouTube Music links (link matching runs alongside the Spotify steps)
+3. Generate HTML toplist ranking artists by popularity
+4. Generate HTML songs list with all top tracks
+5. Optionally generate randomized artist list with Spotify links and images
+
+The toplist and songs list are only regenerated when the artists, tracks,
+templates or code they are built from changed since the last run (--force
+regenerates them anyway); the lists themselves are generated in parallel.
+
+Spotify responses are cached in spotify_cache.sqlite3 (artists for 12 hours),
+so repeated runs on the same day make no new API calls unless --force-refresh is given.
 
 Generated files will be saved in the current directory.
 Progress and results are logged to both console and generate_all.log.
@@ -266,6 +208,83 @@ Progress and results are logged to both console and generate_all.log.
         help='Update artist data from Spotify before generating lists (slower but more current data)'
     )
     
+    parser.add_argument(
+        '--incremental', '-i',
+        action='store_true',
+        help='Only refresh artists whose Spotify data is older than --stale-hours (new artists first)'
+    )
+    
+    parser.add_argument(
+        '--stale-hours',
+        type=float,
+        default=DEFAULT_STALE_HOURS,
+        help=f'Staleness window in hours for --incremental (default: {DEFAULT_STALE_HOURS:g})'
+    )
+    
+    parser.add_argument(
+        '--max-artists',
+        type=int,
+        default=None,
+        help='Refresh at most this many artists in one run'
+    )
+    
+    parser.add_argument(
+        '--sync-tracks', '-t',
+        action='store_true',
+        help='Sync top tracks from Spotify before generating lists (uses --incremental and --max-artists too)'
+    )
+    
+    parser.add_argument(
+        '--match-links', '-m',
+        action='store_true',
+        help='Match missing Apple Music and YouTube Music links before generating lists'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Regenerate every list even if its inputs are unchanged since the last run'
+    )
+    
+    parser.add_argument(
+        '--processes', '-p',
+        type=int,
+        default=RENDER_PROCESSES,
+        help='Render the lists from one consistent database snapshot in this many worker processes '
+             f'(default: {RENDER_PROCESSES}, set TOPPEN_RENDER_PROCESSES to change; 0 renders in-process)'
+    )
+    
+    parser.add_argument(
+        '--toplist-output',
+        choices=TOPLIST_OUTPUT_MODES,
+        default=TOPLIST_OUTPUT,
+        help='Render the toplist cards into the page (cards) or embed the toplist as JSON data rendered '
+             f'by the browser, with bios in a separate file (data) (default: {TOPLIST_OUTPUT}, '
+             'set TOPPEN_TOPLIST_OUTPUT to change)'
+    )
+    
+    parser.add_argument(
+        '--songs-output',
+        choices=SONGS_OUTPUT_MODES,
+        default=SONGS_OUTPUT,
+        help='Write the songs list as one page (single) or as an index page plus letter pages of at most '
+             f'{SONGS_SHARD_SIZE} songs under songs/ (sharded) (default: {SONGS_OUTPUT}, set TOPPEN_SONGS_OUTPUT to change)'
+    )
+    
+    parser.add_argument(
+        '--no-precompress',
+        dest='precompress',
+        action='store_false',
+        default=PRECOMPRESS,
+        help='Do not write .gz and .br siblings of the generated files (set TOPPEN_PRECOMPRESS=0 to make this the default)'
+    )
+    
+    parser.add_argument(
+        '--force-refresh', '-f',
+        action='store_true',
+        help='Ignore cached Spotify responses and fetch fresh data (use with --update-spotify)'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -291,7 +310,18 @@ Progress and results are logged to both console and generate_all.log.
         results = generate_all_lists(
             update_spotify=args.update_spotify,
             include_random_artist_list=args.include_random_artist_list,
-            verbose=args.verbose
+            verbose=args.verbose,
+            force_refresh=args.force_refresh,
+            incremental=args.incremental,
+            stale_hours=args.stale_hours,
+            max_artists=args.max_artists,
+            sync_tracks=args.sync_tracks,
+            match_links=args.match_links,
+            force=args.force,
+            processes=args.processes,
+            toplist_output=args.toplist_output,
+            songs_output=args.songs_output,
+            precompress=args.precompress
         )
         
         # Exit with appropriate code
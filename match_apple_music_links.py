@@ -12,9 +12,15 @@ import urllib.request
 import urllib.error
 from difflib import SequenceMatcher
 
+from database import connect
+
 DB_PATH = "toppen.sqlite3"
 ITUNES_SEARCH_URL = "https://itunes.apple.com/search"
 
+DEFAULT_MIN_SCORE = 0.82
+DEFAULT_COUNTRY = "SE"
+DEFAULT_DELAY = 0.12
+
 
 def fetch_json_with_retry(url: str, max_retries: int = 6):
     request = urllib.request.Request(
@@ -95,7 +101,7 @@ def get_best_apple_artist_match(artist_name: str, country: str, limit: int = 10)
 
 
 def match_all_apple_links(db_path: str, min_score: float, country: str, dry_run: bool, delay: float):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     conn.row_factory = sqlite3.Row
 
     artists = conn.execute(
@@ -158,15 +164,14 @@ def match_all_apple_links(db_path: str, min_score: float, country: str, dry_run:
                 "UPDATE artists SET apple_music_link = ? WHERE id = ?",
                 [artist_view_url, artist_id],
             )
+            # Commit each match so other writers are not locked out for the whole run
+            conn.commit()
 
         print(
             f"[{index}/{total}] MATCH {artist_name} -> {candidate_name} (score {score:.2f})"
         )
         time.sleep(delay)
 
-    if not dry_run:
-        conn.commit()
-
     conn.close()
 
     print("\nDone")
@@ -175,6 +180,13 @@ def match_all_apple_links(db_path: str, min_score: float, country: str, dry_run:
     print(f"- Skipped (low/no match): {skipped_low_score}")
     print(f"- Errors: {errors}")
 
+    return {
+        "total": total,
+        "matched": matched,
+        "skipped": skipped_low_score,
+        "errors": errors,
+    }
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -184,10 +196,10 @@ def main():
     parser.add_argument(
         "--min-score",
         type=float,
-        default=0.82,
+        default=DEFAULT_MIN_SCORE,
         help="Minimum matching score (0-1) required to update",
     )
-    parser.add_argument("--country", default="SE", help="Apple search country code")
+    parser.add_argument("--country", default=DEFAULT_COUNTRY, help="Apple search country code")
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -196,7 +208,7 @@ def main():
     parser.add_argument(
         "--delay",
         type=float,
-        default=0.12,
+        default=DEFAULT_DELAY,
         help="Delay between requests in seconds",
     )
     args = parser.parse_args()
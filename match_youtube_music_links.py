@@ -10,8 +10,13 @@ from difflib import SequenceMatcher
 
 from ytmusicapi import YTMusic
 
+from database import connect
+
 DB_PATH = "toppen.sqlite3"
 
+DEFAULT_MIN_SCORE = 0.90
+DEFAULT_DELAY = 0.25
+
 
 def normalize_name(value: str) -> str:
     value = (value or "").lower().strip()
@@ -100,7 +105,7 @@ def get_best_youtube_music_match(ytmusic: YTMusic, artist_name: str, limit: int
 
 
 def match_all_youtube_links(db_path: str, min_score: float, dry_run: bool, delay: float):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     conn.row_factory = sqlite3.Row
 
     artists = conn.execute(
@@ -158,15 +163,14 @@ def match_all_youtube_links(db_path: str, min_score: float, dry_run: bool, delay
                 "UPDATE artists SET youtube_music_link = ? WHERE id = ?",
                 [youtube_url, artist_id],
             )
+            # Commit each match so other writers are not locked out for the whole run
+            conn.commit()
 
         print(
             f"[{index}/{total}] MATCH {artist_name} -> {candidate_name} (score {score:.2f})"
         )
         time.sleep(delay)
 
-    if not dry_run:
-        conn.commit()
-
     conn.close()
 
     print("\nDone")
@@ -175,6 +179,13 @@ def match_all_youtube_links(db_path: str, min_score: float, dry_run: bool, delay
     print(f"- Skipped (low/no match): {skipped_low_score}")
     print(f"- Errors: {errors}")
 
+    return {
+        "total": total,
+        "matched": matched,
+        "skipped": skipped_low_score,
+        "errors": errors,
+    }
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -184,7 +195,7 @@ def main():
     parser.add_argument(
         "--min-score",
         type=float,
-        default=0.90,
+        default=DEFAULT_MIN_SCORE,
         help="Minimum matching score (0-1) required to update",
     )
     parser.add_argument(
@@ -195,7 +206,7 @@ def main():
     parser.add_argument(
         "--delay",
         type=float,
-        default=0.25,
+        default=DEFAULT_DELAY,
         help="Delay between requests in seconds",
     )
     args = parser.parse_args()
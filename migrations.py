@@ -0,0 +1,419 @@
+"""
+Versioned schema migrations for the toppen database.
+
+Migrations are applied in order and recorded in the schema_version table, so
+the schema only has to be checked once (a single SELECT) instead of being
+introspected by every generator run. Each migration runs in its own
+transaction and is written to also work on databases created before
+versioning existed.
+
+To change the schema, append a new migration to MIGRATIONS; never edit one
+that has already been released.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Per-artist sync metadata columns, added by migration 3 and 5
+SYNC_COLUMNS = {
+    'spotify_fetched_at': 'TEXT',
+    'spotify_payload_hash': 'TEXT',
+    'spotify_last_error': 'TEXT',
+    'tracks_fetched_at': 'TEXT',
+    'tracks_payload_hash': 'TEXT',
+}
+
+
+def _add_missing_columns(conn, table: str, columns: Dict[str, str]):
+    """Add columns to table unless they already exist (pre-versioning databases may have them)."""
+    existing = [row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    for column, column_type in columns.items():
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+
+def _create_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "artists" (
+            "id"    TEXT UNIQUE,
+            "link_to_area"  INTEGER,
+            "name"  TEXT,
+            "popularity"    INTEGER,
+            "followers"     INTEGER,
+            "link"  TEXT,
+            "picture_small" TEXT,
+            "picture_large" INTEGER,
+            "bInactivate"   INTEGER,
+            "notes" INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "tracks" (
+            "id"    TEXT,
+            "artist_id"     TEXT,
+            "name"  TEXT,
+            "popularity"    INTEGER,
+            "album_type"    TEXT,
+            "url"   TEXT,
+            "release_date"  TEXT,
+            PRIMARY KEY("id")
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "area" (
+            "id"    INTEGER UNIQUE,
+            "Name"  TEXT,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        )
+    ''')
+
+
+def _add_artist_info_columns(conn):
+    _add_missing_columns(conn, 'artists', {
+        'added_at': 'TEXT',
+        'markdown_info': 'TEXT',
+        'apple_music_link': 'TEXT',
+        'youtube_music_link': 'TEXT',
+    })
+
+
+def _add_sync_columns(conn):
+    _add_missing_columns(conn, 'artists', {
+        column: column_type for column, column_type in SYNC_COLUMNS.items() if column != 'tracks_payload_hash'
+    })
+
+
+def _create_sync_job_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "sync_jobs" (
+            "id"    INTEGER PRIMARY KEY AUTOINCREMENT,
+            "kind"  TEXT NOT NULL,
+            "status"        TEXT NOT NULL,
+            "started_at"    TEXT,
+            "updated_at"    TEXT,
+            "finished_at"   TEXT,
+            "total" INTEGER DEFAULT 0,
+            "completed"     INTEGER DEFAULT 0,
+            "error_count"   INTEGER DEFAULT 0,
+            "last_artist_id"        TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "sync_job_artists" (
+            "job_id"        INTEGER NOT NULL,
+            "artist_id"     TEXT NOT NULL,
+            "position"      INTEGER NOT NULL,
+            "status"        TEXT NOT NULL DEFAULT 'pending',
+            PRIMARY KEY("job_id", "artist_id")
+        )
+    ''')
+
+
+def _add_tracks_payload_hash(conn):
+    _add_missing_columns(conn, 'artists', {'tracks_payload_hash': SYNC_COLUMNS['tracks_payload_hash']})
+
+
+def _create_query_indexes(conn):
+    # Per-artist top tracks (toplist, artist page, track deletes by artist)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS tracks_artist_popularity
+        ON tracks (artist_id, popularity DESC, name COLLATE NOCASE)
+    ''')
+    # Songs list and /tracks sorted by name
+    conn.execute('CREATE INDEX IF NOT EXISTS tracks_name ON tracks (name)')
+    # Artist name lookups, sorting and the /tracks artist filter
+    conn.execute('CREATE INDEX IF NOT EXISTS artists_name ON artists (name)')
+    # Toplist order over active artists only; the WHERE must match the queries' filter verbatim
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS artists_active_rank
+        ON artists (popularity DESC, followers DESC)
+        WHERE bInactivate = 0 OR bInactivate IS NULL
+    ''')
+    # Incremental refreshes pick never-fetched and stale active artists
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS artists_active_spotify_fetched
+        ON artists (spotify_fetched_at)
+        WHERE bInactivate = 0 OR bInactivate IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS artists_active_tracks_fetched
+        ON artists (tracks_fetched_at)
+        WHERE bInactivate = 0 OR bInactivate IS NULL
+    ''')
+    # Remaining-artist lookups of resumable sync jobs
+    conn.execute('CREATE INDEX IF NOT EXISTS sync_job_artists_status ON sync_job_artists (job_id, status, position)')
+
+
+# Triggers keeping the external-content FTS tables in sync; only indexed columns fire updates
+SEARCH_TRIGGERS = [
+    '''
+        CREATE TRIGGER IF NOT EXISTS artists_fts_insert AFTER INSERT ON artists BEGIN
+            INSERT INTO artists_fts (rowid, name, markdown_info) VALUES (new.rowid, new.name, new.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS artists_fts_delete AFTER DELETE ON artists BEGIN
+            INSERT INTO artists_fts (artists_fts, rowid, name, markdown_info)
+            VALUES ('delete', old.rowid, old.name, old.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS artists_fts_update AFTER UPDATE OF name, markdown_info ON artists BEGIN
+            INSERT INTO artists_fts (artists_fts, rowid, name, markdown_info)
+            VALUES ('delete', old.rowid, old.name, old.markdown_info);
+            INSERT INTO artists_fts (rowid, name, markdown_info) VALUES (new.rowid, new.name, new.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN
+            INSERT INTO tracks_fts (rowid, name) VALUES (new.rowid, new.name);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN
+            INSERT INTO tracks_fts (tracks_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS tracks_fts_update AFTER UPDATE OF name ON tracks BEGIN
+            INSERT INTO tracks_fts (tracks_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+            INSERT INTO tracks_fts (rowid, name) VALUES (new.rowid, new.name);
+        END
+    ''',
+]
+
+
+def _create_search_index(conn):
+    # SQLite builds without FTS5 keep working; search falls back to LIKE
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS artists_fts USING fts5(
+                name, markdown_info,
+                content='artists', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 is not available ({e}); search will use LIKE queries")
+        return
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+            name,
+            content='tracks', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+
+    # executescript() would commit the migration's transaction, so run the triggers one by one
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO artists_fts (artists_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO tracks_fts (tracks_fts) VALUES ('rebuild')")
+
+
+# Triggers of migration 9: the FTS tables follow the tables' search_id key
+SEARCH_ID_TRIGGERS = [
+    '''
+        CREATE TRIGGER artists_fts_insert AFTER INSERT ON artists BEGIN
+            INSERT INTO artists_fts (rowid, name, markdown_info) VALUES (new.search_id, new.name, new.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER artists_fts_delete AFTER DELETE ON artists BEGIN
+            INSERT INTO artists_fts (artists_fts, rowid, name, markdown_info)
+            VALUES ('delete', old.search_id, old.name, old.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER artists_fts_update AFTER UPDATE OF search_id, name, markdown_info ON artists BEGIN
+            INSERT INTO artists_fts (artists_fts, rowid, name, markdown_info)
+            VALUES ('delete', old.search_id, old.name, old.markdown_info);
+            INSERT INTO artists_fts (rowid, name, markdown_info) VALUES (new.search_id, new.name, new.markdown_info);
+        END
+    ''',
+    '''
+        CREATE TRIGGER tracks_fts_insert AFTER INSERT ON tracks BEGIN
+            INSERT INTO tracks_fts (rowid, name) VALUES (new.search_id, new.name);
+        END
+    ''',
+    '''
+        CREATE TRIGGER tracks_fts_delete AFTER DELETE ON tracks BEGIN
+            INSERT INTO tracks_fts (tracks_fts, rowid, name) VALUES ('delete', old.search_id, old.name);
+        END
+    ''',
+    '''
+        CREATE TRIGGER tracks_fts_update AFTER UPDATE OF search_id, name ON tracks BEGIN
+            INSERT INTO tracks_fts (tracks_fts, rowid, name) VALUES ('delete', old.search_id, old.name);
+            INSERT INTO tracks_fts (rowid, name) VALUES (new.search_id, new.name);
+        END
+    ''',
+]
+
+
+def _rebuild_with_search_id(conn, table: str):
+    """Recreate table with a search_id INTEGER PRIMARY KEY, keeping its rows, rowids and indexes."""
+    columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", [table]
+    )]
+    definitions = ['"search_id" INTEGER PRIMARY KEY']
+    for _, name, column_type, not_null, default, _ in columns:
+        definition = f'"{name}" {column_type}'.rstrip()
+        if not_null:
+            definition += ' NOT NULL'
+        if name == 'id':
+            # The text id stays the key everything joins and upserts on
+            definition += ' UNIQUE'
+        elif default is not None:
+            definition += f' DEFAULT {default}'
+        definitions.append(definition)
+    column_list = ', '.join(f'"{row[1]}"' for row in columns)
+
+    conn.execute(f'CREATE TABLE "{table}_rebuild" ({", ".join(definitions)})')
+    # Keeping the rowids keeps the existing FTS entries valid until the rebuild below
+    conn.execute(f'INSERT INTO "{table}_rebuild" (search_id, {column_list}) SELECT rowid, {column_list} FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{table}_rebuild" RENAME TO "{table}"')
+    for sql in indexes:
+        conn.execute(sql)
+
+
+def _add_search_ids(conn):
+    # VACUUM may renumber implicit rowids, which the FTS tables pointed at;
+    # an INTEGER PRIMARY KEY is the rowid and keeps its value
+    for table in ('artists', 'tracks'):
+        _rebuild_with_search_id(conn, table)
+
+    fts_tables = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('artists_fts', 'tracks_fts')"
+    )}
+    if not fts_tables:
+        return
+    conn.execute('DROP TABLE IF EXISTS artists_fts')
+    conn.execute('DROP TABLE IF EXISTS tracks_fts')
+    conn.execute('''
+        CREATE VIRTUAL TABLE artists_fts USING fts5(
+            name, markdown_info,
+            content='artists', content_rowid='search_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE tracks_fts USING fts5(
+            name,
+            content='tracks', content_rowid='search_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    # Dropping the tables dropped their triggers
+    for trigger in SEARCH_ID_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO artists_fts (artists_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO tracks_fts (tracks_fts) VALUES ('rebuild')")
+
+
+def _add_rank_tiebreakers(conn):
+    # The toplist breaks popularity and follower ties by name, then id; the
+    # index covers the whole ORDER BY so the scan still needs no sort
+    conn.execute('DROP INDEX IF EXISTS artists_active_rank')
+    conn.execute('''
+        CREATE INDEX artists_active_rank
+        ON artists (popularity DESC, followers DESC, name COLLATE NOCASE, id)
+        WHERE bInactivate = 0 OR bInactivate IS NULL
+    ''')
+
+
+def _add_sync_job_options(conn):
+    # Jobs remember the options that selected their artists, so a run with
+    # other options starts a new job instead of resuming this one
+    _add_missing_columns(conn, 'sync_jobs', {'options': 'TEXT'})
+
+
+def _create_pipeline_state_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "pipeline_steps" (
+            "name"          TEXT PRIMARY KEY,
+            "fingerprint"   TEXT NOT NULL,
+            "finished_at"   TEXT
+        )
+    ''')
+
+
+# (version, description, migration) in the order they are applied
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Create artists, tracks and area tables', _create_base_tables),
+    (2, 'Add added_at, markdown_info and music link columns to artists', _add_artist_info_columns),
+    (3, 'Add Spotify sync metadata columns to artists', _add_sync_columns),
+    (4, 'Create sync job checkpoint tables', _create_sync_job_tables),
+    (5, 'Add tracks_payload_hash to artists', _add_tracks_payload_hash),
+    (6, 'Add indexes for toplist, songs, admin and sync queries', _create_query_indexes),
+    (7, 'Create FTS5 search index over artist names, bios and track names', _create_search_index),
+    (8, 'Create pipeline step state table for up-to-date checks', _create_pipeline_state_table),
+    (9, 'Key artists and tracks and their FTS5 indexes by a search_id INTEGER PRIMARY KEY', _add_search_ids),
+    (10, 'Add the toplist tiebreakers name and id to the active artist rank index', _add_rank_tiebreakers),
+    (11, 'Add the artist selection options to sync jobs', _add_sync_job_options),
+]
+
+# Schema version this code expects
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    """Return the database's schema version (0 for an unversioned database)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS "schema_version" (
+            "version"       INTEGER PRIMARY KEY,
+            "description"   TEXT,
+            "applied_at"    TEXT
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    Apply all pending migrations.
+
+    Each migration runs in an IMMEDIATE transaction together with its
+    schema_version row, so concurrent processes apply it only once and a
+    failed migration leaves the schema unchanged.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+
+    Returns:
+        The schema version after migrating
+    """
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    conn.commit()
+    for migration_version, description, migration in MIGRATIONS:
+        if migration_version <= version:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= migration_version:
+                conn.rollback()
+                continue
+            migration(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                [migration_version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Schema migration {migration_version} ({description}) failed")
+            raise
+        logger.info(f"Applied schema migration {migration_version}: {description}")
+
+    return SCHEMA_VERSION
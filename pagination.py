@@ -0,0 +1,152 @@
+"""
+Keyset (cursor) pagination for the admin list views.
+
+Instead of OFFSET, each page continues from the sort key of the last row
+shown: the query gets a WHERE condition selecting rows that sort after (or
+before, for the previous page) that key, and LIMIT page_size + 1 to tell
+whether another page exists. Every sort ends with a unique column so the
+order is total and no row is skipped or shown twice between pages.
+
+Cursors are the sort key values of the boundary row, JSON-encoded and
+base64url'd so they fit in a query string.
+"""
+
+import json
+import base64
+import binascii
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# A sort key: SQL expression and whether it sorts descending. Expressions must
+# not be NULL (wrap nullable columns in COALESCE); NULL never compares equal.
+SortKey = Tuple[str, bool]
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode a row's sort key values as a URL-safe cursor string."""
+    raw = json.dumps(list(values), separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], key_count: int) -> Optional[List]:
+    """
+    Decode a cursor made by encode_cursor().
+
+    Args:
+        cursor: Cursor string from the query string (may be empty)
+        key_count: Number of sort keys the cursor must hold
+
+    Returns:
+        List of sort key values, or None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        logger.warning("Ignoring malformed page cursor %r", cursor)
+        return None
+    if not isinstance(values, list) or len(values) != key_count:
+        return None
+    return values
+
+
+def order_clause(keys: Sequence[SortKey], reverse: bool = False) -> str:
+    """Return the ORDER BY list for keys, optionally with every direction flipped."""
+    return ', '.join(
+        f'{expr} {"DESC" if descending != reverse else "ASC"}'
+        for expr, descending in keys
+    )
+
+
+def keyset_clause(keys: Sequence[SortKey], values: Sequence, reverse: bool = False) -> Tuple[str, List]:
+    """
+    Return a WHERE fragment and parameters selecting rows after a cursor.
+
+    Keys may mix directions, so the condition is spelled out as
+    (k1 > v1) OR (k1 = v1 AND k2 < v2) OR ... rather than a row-value
+    comparison.
+
+    Args:
+        keys: Sort keys, the last one unique
+        values: Sort key values of the boundary row
+        reverse: Select rows before the cursor instead
+    """
+    terms = []
+    params: List = []
+    for index, (expr, descending) in enumerate(keys):
+        parts = [f'{keys[i][0]} = ?' for i in range(index)]
+        parts.append(f'{expr} {"<" if descending != reverse else ">"} ?')
+        terms.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:index + 1])
+    return '(' + ' OR '.join(terms) + ')', params
+
+
+def fetch_page(
+    conn,
+    columns: str,
+    from_where: str,
+    params: Sequence,
+    keys: Sequence[SortKey],
+    page_size: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None
+) -> Dict:
+    """
+    Fetch one page of a keyset-paginated query.
+
+    Args:
+        conn: Open sqlite3 connection
+        columns: SELECT list of the columns the page shows
+        from_where: FROM/JOIN/WHERE part of the query (must contain a WHERE)
+        params: Parameters for from_where
+        keys: Sort keys, the last one unique
+        page_size: Rows per page
+        after: Cursor of the row the page starts after
+        before: Cursor of the row the page ends before (previous page)
+
+    Returns:
+        Dict with rows, next_cursor and prev_cursor (None at either end)
+    """
+    before_values = decode_cursor(before, len(keys))
+    after_values = None if before_values else decode_cursor(after, len(keys))
+    reverse = before_values is not None
+    cursor_values = before_values or after_values
+
+    key_columns = ', '.join(f'{expr} AS sort_key_{index}' for index, (expr, _) in enumerate(keys))
+    query = f'SELECT {columns}, {key_columns} {from_where}'
+    query_params = list(params)
+    if cursor_values is not None:
+        clause, clause_params = keyset_clause(keys, cursor_values, reverse)
+        query += f' AND {clause}'
+        query_params.extend(clause_params)
+    query += f' ORDER BY {order_clause(keys, reverse)} LIMIT ?'
+    query_params.append(page_size + 1)
+
+    rows = conn.execute(query, query_params).fetchall()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([row[f'sort_key_{index}'] for index in range(len(keys))])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # Going forward there is a previous page whenever we started from a cursor,
+        # and a next page if the extra row came back; backwards it is the other way round
+        if has_more or reverse:
+            next_cursor = cursor_of(rows[-1])
+        if cursor_values is not None and (has_more or not reverse):
+            prev_cursor = cursor_of(rows[0])
+
+    return {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
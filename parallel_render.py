@@ -0,0 +1,174 @@
+"""
+Multi-process rendering of the generated pages.
+
+In this mode the page generators read their rows from one shared read
+snapshot and the cards of every page are rendered in a process pool:
+
+- The snapshot is a single read transaction on the database, opened when
+  the first page loads its rows and held until the run ends, so the
+  toplist, the songs list and the random list are all built from the same
+  database state even while the web admin keeps writing.
+- A page's card contexts are split into chunks of RENDER_CHUNK_SIZE cards,
+  and each chunk is rendered (through the fragment cache) in a worker
+  process. The page itself is assembled in the calling process, which
+  streams the chunks into the page template in order as they finish.
+
+Workers never inherit the parent's threads or open SQLite connections:
+they are forked from a fork server that imported the main module and this
+one once (or spawned where fork servers are not available).
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from markupsafe import Markup
+
+from database import DB_PATH, connect
+from fragment_cache import fragment_cache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Worker processes for the parallel render mode; 0 or 1 renders in-process
+RENDER_PROCESSES = int(os.getenv('TOPPEN_RENDER_PROCESSES', '0'))
+
+# Cards rendered per worker task
+RENDER_CHUNK_SIZE = 500
+
+
+def _mp_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['__main__', __name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _render_chunk(template_name: str, contexts: List[Dict]) -> List[str]:
+    """Worker task: render one chunk of cards through the fragment cache."""
+    # The parent evicts once the whole page is done; a chunk only sees part of it
+    return [str(html) for html in fragment_cache.render(template_name, contexts, evict=False)]
+
+
+class ParallelRenderer:
+    """
+    Read snapshot and process pool shared by the page generators of one run.
+
+    Page generators take an optional ParallelRenderer: they load their rows
+    with load() and pass their card contexts to render(), which has the same
+    signature as FragmentCache.render(). Both the snapshot and the pool are
+    created on first use, so a run whose pages are all up to date costs
+    nothing. Use as a context manager, or call close().
+
+    Args:
+        db_path: Database to snapshot
+        processes: Worker processes
+        chunk_size: Cards rendered per worker task
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        processes: int = RENDER_PROCESSES,
+        chunk_size: int = RENDER_CHUNK_SIZE
+    ):
+        self.db_path = db_path
+        self.processes = max(1, processes)
+        self.chunk_size = max(1, chunk_size)
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._executor = None
+
+    def _snapshot(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect(self.db_path, readonly=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # A WAL read transaction sees the database as of its first read
+            conn.execute('BEGIN')
+            conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            self._conn = conn
+            logger.info("Opened read snapshot of %s", self.db_path)
+        return self._conn
+
+    def load(self, loader: Callable[[sqlite3.Connection], Iterable]) -> List:
+        """
+        Run loader(conn) against the read snapshot and return its rows as a list.
+
+        Args:
+            loader: Row generator taking a connection, e.g. songs_list
+        """
+        with self._lock:
+            return list(loader(self._snapshot()))
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=_mp_context()
+                )
+            return self._executor
+
+    def render(self, template_name: str, contexts: Iterable[Dict]) -> Iterator[Markup]:
+        """
+        Render cards in the process pool and return an iterator over them.
+
+        Every chunk is submitted right away; the iterator yields the cards in
+        page order as soon as their chunk is done. Stale fragment cache
+        entries are evicted once every chunk has been rendered.
+
+        Args:
+            template_name: Card template path relative to templates/
+            contexts: Template variables for each card, in page order
+
+        Returns:
+            Iterator over the rendered card HTML, safe to output in an autoescaped template
+        """
+        contexts = list(contexts)
+        started = time.time()
+        pool = self._pool()
+        futures = [
+            pool.submit(_render_chunk, template_name, contexts[start:start + self.chunk_size])
+            for start in range(0, len(contexts), self.chunk_size)
+        ]
+        logger.info("Rendering %d cards of %s in %d chunks on %d processes",
+                    len(contexts), template_name, len(futures), self.processes)
+        return self._stitch(template_name, futures, started)
+
+    def _stitch(self, template_name: str, futures: List[Future], started: float) -> Iterator[Markup]:
+        try:
+            for future in futures:
+                for html in future.result():
+                    yield Markup(html)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        evicted = fragment_cache.evict_unused(template_name, started)
+        logger.info("Rendered %s in %.2fs, %d stale fragments evicted",
+                    template_name, time.time() - started, evicted)
+
+    def close(self):
+        """End the read snapshot and shut the process pool down."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.rollback()
+                self._conn.close()
+                self._conn = None
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self) -> 'ParallelRenderer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,257 @@
+"""
+Dependency-aware build pipeline for the generated lists.
+
+A generate-all run is a DAG of steps (Spotify refresh, track sync, link
+matching and the page generators). Each step names the steps it has to run
+after and declares its inputs: database columns, source files (templates,
+code, config) and plain values such as the list date. Before a step runs
+its inputs are hashed; when the fingerprint equals the one stored after the
+step's last successful run and its output files still exist, the step is
+skipped. Steps without declared inputs (the ones that fetch from remote
+services) always run.
+
+Steps whose dependencies have finished run in parallel on a thread pool. A
+failed step does not stop the steps after it: they build from whatever is
+in the database, as the serial generate-all did.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from artist_sync import sync_timestamp
+from database import DB_PATH, connect, release_connection
+from migrations import migrate
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Steps run at the same time at most
+PIPELINE_WORKERS = int(os.getenv('TOPPEN_PIPELINE_WORKERS', '4'))
+
+# Step states in run() results
+STATUS_RAN = 'ran'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+
+class Step:
+    """
+    One node of the pipeline.
+
+    Args:
+        name: Unique step name
+        run: Callable doing the work; its return value ends up in the results
+        after: Names of the steps that must finish first
+        tables: Input columns per table, e.g. {'tracks': ('id', 'name')}
+        files: Input files or directories (hashed recursively)
+        values: Other inputs, e.g. the list date; must be JSON serializable
+        outputs: Files the step writes; a missing output forces a rebuild
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Any],
+        after: Sequence[str] = (),
+        tables: Optional[Dict[str, Sequence[str]]] = None,
+        files: Sequence[str] = (),
+        values: Optional[Dict[str, Any]] = None,
+        outputs: Sequence[str] = ()
+    ):
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.tables = dict(tables or {})
+        self.files = tuple(files)
+        self.values = dict(values or {})
+        self.outputs = tuple(outputs)
+
+    @property
+    def has_inputs(self) -> bool:
+        """True if the step declares inputs and can be skipped when they are unchanged."""
+        return bool(self.tables or self.files or self.values)
+
+
+def _hash_tables(conn, tables: Dict[str, Sequence[str]], digest):
+    for table in sorted(tables):
+        columns = ', '.join(tables[table])
+        digest.update(f'table {table} ({columns})\0'.encode('utf-8'))
+        for row in conn.execute(f'SELECT {columns} FROM {table} ORDER BY rowid'):
+            digest.update(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def _walk_files(paths: Iterable[str]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files))
+        else:
+            found.append(path)
+    return found
+
+
+def _hash_files(paths: Iterable[str], digest):
+    for path in _walk_files(paths):
+        digest.update(f'file {path}\0'.encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b'missing')
+
+
+def step_fingerprint(conn, step: Step) -> str:
+    """Return a hash of everything the step declares as input."""
+    digest = hashlib.sha256()
+    _hash_tables(conn, step.tables, digest)
+    _hash_files(step.files, digest)
+    digest.update(json.dumps(step.values, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _check_graph(steps: Sequence[Step]):
+    """Raise ValueError for duplicate names, unknown dependencies or cycles."""
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate pipeline step names: {names}")
+
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [name for name in step.after if name not in by_name]
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps: {', '.join(unknown)}")
+
+    done = set()
+    remaining = list(steps)
+    while remaining:
+        ready = [step for step in remaining if all(name in done for name in step.after)]
+        if not ready:
+            raise ValueError(f"Pipeline steps form a cycle: {', '.join(step.name for step in remaining)}")
+        done.update(step.name for step in ready)
+        remaining = [step for step in remaining if step.name not in done]
+
+
+class Pipeline:
+    """
+    Run steps in dependency order, skipping the ones that are up to date.
+
+    Args:
+        steps: Steps to run; `after` may only name steps in this list
+        db_path: Database holding the inputs and the stored fingerprints
+        max_workers: Steps run at the same time at most
+        force: Run every step even if its inputs are unchanged
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[Step],
+        db_path: str = DB_PATH,
+        max_workers: int = PIPELINE_WORKERS,
+        force: bool = False
+    ):
+        _check_graph(steps)
+        self.steps = list(steps)
+        self.db_path = db_path
+        self.max_workers = max(1, max_workers)
+        self.force = force
+
+    def _check_inputs(self, step: Step) -> Tuple[str, bool]:
+        """Return the step's input fingerprint and whether the step can be skipped."""
+        conn = connect(self.db_path, readonly=True)
+        try:
+            fingerprint = step_fingerprint(conn, step)
+            row = conn.execute(
+                'SELECT fingerprint FROM pipeline_steps WHERE name = ?', [step.name]
+            ).fetchone()
+        finally:
+            conn.close()
+
+        up_to_date = (
+            not self.force
+            and row is not None
+            and row[0] == fingerprint
+            and all(os.path.exists(path) for path in step.outputs)
+        )
+        return fingerprint, up_to_date
+
+    def _store_fingerprint(self, step: Step, fingerprint: str):
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.execute('''
+                    INSERT INTO pipeline_steps (name, fingerprint, finished_at) VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        fingerprint = excluded.fingerprint,
+                        finished_at = excluded.finished_at
+                ''', [step.name, fingerprint, sync_timestamp()])
+        finally:
+            conn.close()
+
+    def _run_step(self, step: Step) -> Dict:
+        """Run one step on a worker thread; never raises."""
+        start = time.monotonic()
+        outcome = {'status': STATUS_RAN, 'result': None, 'error': None, 'elapsed': 0.0}
+        try:
+            fingerprint = None
+            if step.has_inputs:
+                # Hashed after the dependencies finished, so their writes are included
+                fingerprint, up_to_date = self._check_inputs(step)
+                if up_to_date:
+                    outcome['status'] = STATUS_SKIPPED
+                    logger.info(f"Step {step.name}: inputs unchanged, skipped")
+                    return outcome
+
+            logger.info(f"Step {step.name}: running")
+            outcome['result'] = step.run()
+            if fingerprint is not None:
+                self._store_fingerprint(step, fingerprint)
+        except Exception as e:
+            logger.exception(f"Step {step.name} failed")
+            outcome['status'] = STATUS_FAILED
+            outcome['error'] = str(e)
+        finally:
+            # Steps may have used this worker thread's pooled connections
+            release_connection()
+            outcome['elapsed'] = time.monotonic() - start
+
+        if outcome['status'] == STATUS_RAN:
+            logger.info(f"Step {step.name}: done in {outcome['elapsed']:.2f}s")
+        return outcome
+
+    def run(self) -> Dict[str, Dict]:
+        """
+        Run the pipeline.
+
+        Returns:
+            dict mapping step name to {'status', 'result', 'error', 'elapsed'},
+            where status is 'ran', 'skipped' or 'failed'
+        """
+        conn = connect(self.db_path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+
+        results: Dict[str, Dict] = {}
+        pending = list(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline') as executor:
+            while pending or running:
+                ready = [step for step in pending if all(name in results for name in step.after)]
+                for step in ready:
+                    pending.remove(step)
+                    running[executor.submit(self._run_step, step)] = step.name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[running.pop(future)] = future.result()
+
+        return results
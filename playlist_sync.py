@@ -0,0 +1,259 @@
+"""
+Diff-based Spotify playlist synchronization.
+
+The desired playlist contents are computed from the tracks table and diffed
+against the playlist's current items, so only the tracks that actually
+changed are removed or added, in chunks of PLAYLIST_CHUNK_SIZE. The
+playlist's snapshot id is checked before and after the writes so edits made
+by someone else in the meantime are detected instead of silently
+overwritten.
+"""
+
+import time
+import logging
+from typing import Dict, List, Tuple
+
+from spotipy.exceptions import SpotifyException
+
+from spotify_utils import spotify_request_with_retry
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Spotify accepts at most 100 items per playlist add/remove request
+PLAYLIST_CHUNK_SIZE = 100
+
+# Number of times the diff is recomputed when the playlist changes under us
+MAX_SYNC_ATTEMPTS = 3
+
+# Attempts at one chunk of additions that fail with a server error
+MAX_ADD_ATTEMPTS = 3
+
+# Server errors after which an addition may or may not have been applied
+SERVER_ERRORS = (500, 502, 503, 504)
+
+
+class PlaylistConflictError(Exception):
+    """Raised when a playlist keeps changing while it is being synchronized."""
+
+
+def chunked(items: List, size: int = PLAYLIST_CHUNK_SIZE):
+    """Yield consecutive slices of items with at most size elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def desired_playlist_tracks(conn) -> List[str]:
+    """
+    Return the Spotify track ids the playlist should contain.
+
+    Tracks of active artists are ordered by artist name and then popularity,
+    the same order the playlist used to be built in.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+
+    Returns:
+        List of unique Spotify track ids
+    """
+    rows = conn.execute('''
+        SELECT t.id
+        FROM tracks t
+        JOIN artists a ON a.id = t.artist_id
+        WHERE a.bInactivate = 0 OR a.bInactivate IS NULL
+        ORDER BY a.name, a.id, t.popularity DESC, t.name
+    ''').fetchall()
+
+    # Track rows are keyed '<track id>:<artist id>'; a track shared by two artists is listed once
+    track_ids = []
+    seen = set()
+    for (row_id,) in rows:
+        track_id = row_id.split(':')[0]
+        if track_id not in seen:
+            seen.add(track_id)
+            track_ids.append(track_id)
+    return track_ids
+
+
+def get_playlist_snapshot(sp, playlist_id: str) -> str:
+    """Return the playlist's current snapshot id."""
+    return spotify_request_with_retry(sp.playlist, playlist_id, fields='snapshot_id')['snapshot_id']
+
+
+def fetch_playlist_tracks(sp, playlist_id: str) -> Tuple[str, List[str]]:
+    """
+    Read the playlist's snapshot id and every track id it contains.
+
+    Args:
+        sp: Spotify client instance
+        playlist_id: Spotify playlist id
+
+    Returns:
+        (snapshot_id, track ids in playlist order); local files and episodes are skipped
+    """
+    snapshot_id = get_playlist_snapshot(sp, playlist_id)
+
+    track_ids = []
+    page = spotify_request_with_retry(
+        sp.playlist_items,
+        playlist_id,
+        fields='items(track(id,type)),next',
+        limit=100,
+        additional_types=['track'],
+    )
+    while page:
+        for item in page.get('items', []):
+            track = item.get('track')
+            if track and track.get('id') and track.get('type', 'track') == 'track':
+                track_ids.append(track['id'])
+        page = spotify_request_with_retry(sp.next, page) if page.get('next') else None
+
+    return snapshot_id, track_ids
+
+
+def diff_playlist(current: List[str], desired: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Compute the changes that turn the current playlist into the desired one.
+
+    Returns:
+        (to_remove, to_add); to_add keeps the desired order
+    """
+    desired_set = set(desired)
+    current_set = set(current)
+    to_remove = list(dict.fromkeys(track_id for track_id in current if track_id not in desired_set))
+    to_add = [track_id for track_id in desired if track_id not in current_set]
+    return to_remove, to_add
+
+
+def add_playlist_items(sp, playlist_id: str, snapshot_id: str, track_ids: List[str]) -> str:
+    """
+    Add one chunk of tracks to the playlist exactly once.
+
+    Additions are not idempotent: Spotify may apply one and still answer with
+    a server error, and a blind retry would add the tracks twice. After a
+    server error the playlist's snapshot is read again instead; if it moved
+    on from snapshot_id, the addition was applied and is not repeated.
+
+    Args:
+        sp: Spotify client instance
+        playlist_id: Spotify playlist id
+        snapshot_id: Snapshot the addition is applied to
+        track_ids: At most PLAYLIST_CHUNK_SIZE track ids
+
+    Returns:
+        The snapshot id after the addition
+    """
+    for attempt in range(1, MAX_ADD_ATTEMPTS + 1):
+        try:
+            result = spotify_request_with_retry(
+                sp.playlist_add_items, playlist_id, track_ids, retry_server_errors=False
+            )
+            return result['snapshot_id']
+        except SpotifyException as e:
+            if e.http_status not in SERVER_ERRORS or attempt == MAX_ADD_ATTEMPTS:
+                raise
+            current_snapshot = get_playlist_snapshot(sp, playlist_id)
+            if current_snapshot != snapshot_id:
+                logger.warning(
+                    f"Adding {len(track_ids)} tracks to playlist {playlist_id} returned {e.http_status}, "
+                    f"but the playlist changed; not adding them again"
+                )
+                return current_snapshot
+            delay = 2 ** attempt
+            logger.warning(
+                f"Adding {len(track_ids)} tracks to playlist {playlist_id} failed with {e.http_status}. "
+                f"Retrying in {delay} seconds. Attempt {attempt + 1}/{MAX_ADD_ATTEMPTS}"
+            )
+            time.sleep(delay)
+
+
+def apply_playlist_diff(
+    sp,
+    playlist_id: str,
+    snapshot_id: str,
+    to_remove: List[str],
+    to_add: List[str]
+) -> str:
+    """
+    Remove and add tracks in chunks of PLAYLIST_CHUNK_SIZE.
+
+    Removals are pinned to snapshot_id and safe to retry; additions are not
+    retried blindly (see add_playlist_items). Each write returns the snapshot
+    the next one is applied to.
+
+    Returns:
+        The snapshot id after the last write
+    """
+    for chunk in chunked(to_remove):
+        result = spotify_request_with_retry(
+            sp.playlist_remove_all_occurrences_of_items, playlist_id, chunk, snapshot_id=snapshot_id
+        )
+        snapshot_id = result['snapshot_id']
+
+    for chunk in chunked(to_add):
+        snapshot_id = add_playlist_items(sp, playlist_id, snapshot_id, chunk)
+
+    return snapshot_id
+
+
+def sync_playlist(sp, conn, playlist_id: str, dry_run: bool = False) -> Dict:
+    """
+    Bring a Spotify playlist in line with the tracks table.
+
+    The diff is computed against a snapshot of the playlist; if the snapshot
+    changes before the writes start, the diff is recomputed (up to
+    MAX_SYNC_ATTEMPTS times). A change detected after the writes is logged.
+
+    Args:
+        sp: Spotify client instance with playlist-modify scope
+        conn: Open sqlite3 connection to the toppen database
+        playlist_id: Spotify playlist id
+        dry_run: Only compute the diff, don't modify the playlist
+
+    Returns:
+        dict: desired, current, added, removed, snapshot_id and concurrent_edit
+
+    Raises:
+        PlaylistConflictError: If the playlist kept changing during every attempt
+    """
+    desired = desired_playlist_tracks(conn)
+
+    for attempt in range(1, MAX_SYNC_ATTEMPTS + 1):
+        snapshot_id, current = fetch_playlist_tracks(sp, playlist_id)
+        to_remove, to_add = diff_playlist(current, desired)
+        logger.info(
+            f"Playlist {playlist_id}: {len(current)} tracks, {len(desired)} wanted, "
+            f"{len(to_remove)} to remove, {len(to_add)} to add"
+        )
+
+        results = {
+            'desired': len(desired),
+            'current': len(current),
+            'added': 0,
+            'removed': 0,
+            'snapshot_id': snapshot_id,
+            'concurrent_edit': False,
+        }
+        if dry_run or (not to_remove and not to_add):
+            return results
+
+        # Reading all pages takes a while; make sure nobody edited the playlist meanwhile
+        if get_playlist_snapshot(sp, playlist_id) != snapshot_id:
+            logger.warning(f"Playlist {playlist_id} changed while reading it (attempt {attempt}/{MAX_SYNC_ATTEMPTS})")
+            continue
+
+        snapshot_id = apply_playlist_diff(sp, playlist_id, snapshot_id, to_remove, to_add)
+        results['added'] = len(to_add)
+        results['removed'] = len(to_remove)
+        results['snapshot_id'] = snapshot_id
+
+        if get_playlist_snapshot(sp, playlist_id) != snapshot_id:
+            logger.warning(f"Playlist {playlist_id} was edited concurrently; run the sync again to reconcile")
+            results['concurrent_edit'] = True
+
+        logger.info(f"Playlist {playlist_id} synced: {len(to_remove)} removed, {len(to_add)} added")
+        return results
+
+    raise PlaylistConflictError(
+        f"Playlist {playlist_id} changed during {MAX_SYNC_ATTEMPTS} sync attempts"
+    )
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Precompressed copies of the generated pages.
+
+The generated pages are large text files (the toplist around 1.5 MB, the
+songs list over 3 MB) that compress to a tenth of their size. Instead of
+having the web server compress them on every request, every HTML, JSON,
+CSS and JS output gets .gz and .br siblings, compressed once at maximum
+settings:
+
+- gzip at level 9, with no file name or time stamp in the header, so the
+  same page always compresses to the same bytes;
+- brotli at quality 11 with the largest window, when the brotli package
+  is installed (it is optional; without it only .gz files are written).
+
+A file is only compressed again when its content changed: if its .gz
+sibling decompresses to the current content (and the .br sibling exists),
+both are left as they are. The .gz file is written last, so it is only
+current once the .br file is too. Siblings whose page no longer exists
+(songs shards a later run dropped, say) are removed. Files are compressed
+in parallel on a thread pool; zlib and brotli release the GIL while they
+work.
+
+Web servers serve the siblings directly, e.g. nginx with gzip_static and
+brotli_static, or static_server.py for local testing.
+
+Usage:
+    python precompress.py topplista-2024-01-05.html songs.html songs/
+"""
+
+import os
+import gzip
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from renderer import atomic_output
+
+# brotli is optional; without it only the .gz siblings are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Write precompressed siblings after generating the lists; set TOPPEN_PRECOMPRESS=0 to disable
+PRECOMPRESS = os.getenv('TOPPEN_PRECOMPRESS', '1') != '0'
+
+# Files compressed at the same time at most
+PRECOMPRESS_WORKERS = int(os.getenv('TOPPEN_PRECOMPRESS_WORKERS', str(os.cpu_count() or 1)))
+
+# Outputs that get compressed siblings
+PRECOMPRESS_EXTENSIONS = ('.html', '.json', '.css', '.js', '.svg')
+
+# Maximum compression settings
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+BROTLI_WINDOW = 24
+
+# Content encoding of each sibling, by file suffix
+GZIP_SUFFIX = '.gz'
+BROTLI_SUFFIX = '.br'
+ENCODINGS = {GZIP_SUFFIX: 'gzip', BROTLI_SUFFIX: 'br'}
+
+
+def compressible_files(paths: Iterable[str]) -> List[str]:
+    """
+    Return the files under paths that get compressed siblings.
+
+    Args:
+        paths: Files, or directories searched recursively; missing paths are skipped
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+                found.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.endswith(PRECOMPRESS_EXTENSIONS) and not name.startswith('.'))
+        elif os.path.isfile(path) and path.endswith(PRECOMPRESS_EXTENSIONS):
+            found.append(path)
+    return found
+
+
+def _is_current(path: str, data: bytes) -> bool:
+    if brotli is not None and not os.path.exists(path + BROTLI_SUFFIX):
+        return False
+    try:
+        with open(path + GZIP_SUFFIX, 'rb') as f:
+            return gzip.decompress(f.read()) == data
+    except (OSError, EOFError):
+        return False
+
+
+def _write_sibling(path: str, suffix: str, payload: bytes, mtime: float):
+    with atomic_output(path + suffix, binary=True) as f:
+        f.write(payload)
+    # Servers take Last-Modified from the sibling; keep it equal to the page's
+    os.utime(path + suffix, (mtime, mtime))
+
+
+def precompress_file(path: str) -> Optional[Dict[str, int]]:
+    """
+    Write the .br and .gz siblings of one file, unless they are current.
+
+    Args:
+        path: File to compress
+
+    Returns:
+        Sizes in bytes of the file and its siblings, keyed by suffix ('' for
+        the file itself), or None if the siblings were already current
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    mtime = os.stat(path).st_mtime
+    if _is_current(path, data):
+        # The page may have been rewritten with the same content
+        for suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                os.utime(path + suffix, (mtime, mtime))
+        return None
+
+    sizes = {'': len(data)}
+    if brotli is not None:
+        payload = brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY, lgwin=BROTLI_WINDOW)
+        _write_sibling(path, BROTLI_SUFFIX, payload, mtime)
+        sizes[BROTLI_SUFFIX] = len(payload)
+    payload = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    _write_sibling(path, GZIP_SUFFIX, payload, mtime)
+    sizes[GZIP_SUFFIX] = len(payload)
+    return sizes
+
+
+def _remove_orphans(paths: Iterable[str]) -> int:
+    removed = 0
+    for path in paths:
+        if not os.path.isdir(path):
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                base, suffix = os.path.splitext(name)
+                if suffix in ENCODINGS and base.endswith(PRECOMPRESS_EXTENSIONS) and base not in files:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+    return removed
+
+
+def precompress_outputs(paths: Iterable[str], workers: int = PRECOMPRESS_WORKERS) -> Dict:
+    """
+    Write compressed siblings for every file under paths whose content changed.
+
+    Args:
+        paths: Files, or directories searched recursively
+        workers: Files compressed at the same time at most
+
+    Returns:
+        dict with compressed (paths of the files compressed in this run),
+        unchanged (number of files whose siblings were current), removed
+        (number of orphaned siblings deleted) and bytes (total size of the
+        compressed files and of their siblings, keyed by suffix)
+    """
+    paths = list(paths)
+    files = compressible_files(paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(precompress_file, files))
+
+    compressed = [path for path, sizes in zip(files, results) if sizes]
+    totals: Dict[str, int] = {}
+    for sizes in filter(None, results):
+        for suffix, size in sizes.items():
+            totals[suffix] = totals.get(suffix, 0) + size
+    removed = _remove_orphans(paths)
+
+    if compressed:
+        logger.info("Precompressed %d of %d files: %s", len(compressed), len(files), ', '.join(
+            f"{suffix or 'plain'} {size / 1024:.0f} kB" for suffix, size in sorted(totals.items())
+        ))
+    else:
+        logger.info("Precompressed siblings of %d files are current", len(files))
+    if brotli is None:
+        logger.info("brotli is not installed; only .gz siblings were written")
+    return {
+        'compressed': compressed,
+        'unchanged': len(files) - len(compressed),
+        'removed': removed,
+        'bytes': totals,
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Write .gz and .br siblings of generated pages')
+    parser.add_argument('paths', nargs='+', help='Files, or directories searched recursively')
+    parser.add_argument('--workers', '-w', type=int, default=PRECOMPRESS_WORKERS,
+                        help=f'Files compressed at the same time (default: {PRECOMPRESS_WORKERS})')
+    args = parser.parse_args()
+
+    result = precompress_outputs(args.paths, args.workers)
+    print(f"{len(result['compressed'])} compressed, {result['unchanged']} unchanged, "
+          f"{result['removed']} orphaned siblings removed")
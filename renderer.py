@@ -0,0 +1,174 @@
+"""
+Rendering of the generated static pages.
+
+Every page generator (the toplist, the songs list, the random artist list
+and the plain toplist and songs scripts) renders a Jinja template under
+templates/site/. The pages extend one shared layout and pull their
+stylesheets, scripts and repeated markup in from separate template files
+instead of carrying them inline in Python strings. Pages link their
+stylesheets and scripts with stylesheet() and script(), which point at the
+shared fingerprinted files of static_assets.py.
+
+Templates are compiled once per process and their bytecode is cached on
+disk, so later runs skip parsing. Batch runs never check templates for
+changes; long-running processes like the web admin turn that on with
+enable_template_auto_reload(), so edited templates are picked up. Output is streamed: the template's
+chunks are produced lazily while rows are read from the database, grouped
+into larger writes and written through a buffered file. The page is
+written to a temporary file and renamed into place, so a half-written page
+is never served.
+"""
+
+import os
+import json
+import logging
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, pass_context, select_autoescape
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Template root shared with the web admin; generated pages live under site/
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Compiled template bytecode; set TOPPEN_TEMPLATE_CACHE to an empty string to disable
+TEMPLATE_CACHE_DIR = os.getenv('TOPPEN_TEMPLATE_CACHE', '.template_cache')
+
+# Check templates for changes before every render; set TOPPEN_TEMPLATE_AUTO_RELOAD=1 to enable
+TEMPLATE_AUTO_RELOAD = os.getenv('TOPPEN_TEMPLATE_AUTO_RELOAD', '0') == '1'
+
+# Template chunks joined into one write, and the output file buffer size in bytes
+STREAM_BUFFER_CHUNKS = 64
+WRITE_BUFFER_SIZE = 256 * 1024
+
+
+def thousands(value) -> str:
+    """Format a number with comma thousands separators (0 for empty values)."""
+    return f'{value or 0:,}'
+
+
+def compact_json(value) -> Markup:
+    """Serialize a value as compact JSON that is safe inside a <script> element."""
+    return htmlsafe_json_dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+@pass_context
+def stylesheet(context, name: str) -> Markup:
+    """Template function: the element that links stylesheet asset name into the page."""
+    # static_assets imports this module
+    from static_assets import stylesheet_tag
+    return stylesheet_tag(name, context['page_file'])
+
+
+@pass_context
+def script(context, name: str) -> Markup:
+    """Template function: the element that loads script asset name into the page."""
+    from static_assets import script_tag
+    return script_tag(name, context['page_file'])
+
+
+@lru_cache(maxsize=1)
+def get_environment() -> Environment:
+    """Return the process-wide Jinja environment for the generated pages."""
+    bytecode_cache = None
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(['html']),
+        bytecode_cache=bytecode_cache,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+        # A batch run renders with the templates it started with; don't stat them on every render
+        auto_reload=TEMPLATE_AUTO_RELOAD,
+    )
+    env.filters['thousands'] = thousands
+    env.filters['compact_json'] = compact_json
+    env.globals['stylesheet'] = stylesheet
+    env.globals['script'] = script
+    return env
+
+
+def enable_template_auto_reload():
+    """Recompile templates that changed on disk before rendering them, for long-running processes."""
+    get_environment().auto_reload = True
+
+
+@contextmanager
+def atomic_output(output_file: str, binary: bool = False):
+    """
+    Open a buffered text file that replaces output_file once the block completes.
+
+    The file is written next to output_file under a temporary name and
+    removed again if the block raises, so readers only ever see a complete file.
+
+    Args:
+        output_file: File to replace
+        binary: Open the file for bytes instead of UTF-8 text
+    """
+    directory = os.path.dirname(os.path.abspath(output_file))
+    suffix = os.path.splitext(output_file)[1]
+    fd, temp_path = tempfile.mkstemp(prefix='.render-', suffix=suffix, dir=directory)
+    try:
+        if binary:
+            f = os.fdopen(fd, 'wb', buffering=WRITE_BUFFER_SIZE)
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+        with f:
+            yield f
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def write_json(data, output_file: str) -> str:
+    """
+    Write data as compact UTF-8 JSON to output_file.
+
+    Args:
+        data: JSON serializable value
+        output_file: JSON file to write
+
+    Returns:
+        output_file
+    """
+    with atomic_output(output_file) as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    return output_file
+
+
+def render_page(template_name: str, output_file: str, **context) -> str:
+    """
+    Stream a page template into output_file.
+
+    Context values may be iterators (e.g. rows straight from a cursor); they
+    are consumed while the page is written. The template gets output_file as
+    page_file, so asset links can be made relative to the page.
+
+    Args:
+        template_name: Template path relative to templates/ (e.g. 'site/songs.html')
+        output_file: HTML file to write
+        **context: Template variables
+
+    Returns:
+        output_file
+    """
+    template = get_environment().get_template(template_name)
+    stream = template.stream(page_file=output_file, **context)
+    stream.enable_buffering(STREAM_BUFFER_CHUNKS)
+
+    with atomic_output(output_file) as f:
+        stream.dump(f)
+
+    logger.info("Rendered %s to %s", template_name, output_file)
+    return output_file
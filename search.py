@@ -0,0 +1,177 @@
+"""
+Full-text search over artists and tracks.
+
+Searches use the FTS5 tables created by schema migration 7 (artist names and
+bios in artists_fts, track names in tracks_fts). Every word of the user's
+input is matched as a prefix, accents are folded and results are ranked with
+bm25, name matches weighing more than bio matches. When the SQLite build has
+no FTS5 the same functions fall back to LIKE queries.
+
+The FTS tables are keyed by the search_id INTEGER PRIMARY KEY that migration 9
+added to artists and tracks. Before, they pointed at implicit rowids, which
+VACUUM may renumber; search_id is the rowid itself and keeps its value.
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# bm25 column weights for artists_fts (name, markdown_info)
+ARTIST_NAME_WEIGHT = 10.0
+ARTIST_BIO_WEIGHT = 1.0
+
+# Default number of results returned by the JSON search endpoint
+DEFAULT_SEARCH_LIMIT = 20
+
+# Words are runs of letters and digits; everything else separates them
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available(conn) -> bool:
+    """Return True if the FTS5 search tables exist in this database."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('artists_fts', 'tracks_fts')"
+    ).fetchone()[0] == 2
+
+
+def fts_query(term: str, column: Optional[str] = None) -> Optional[str]:
+    """
+    Turn user input into an FTS5 query matching every word as a prefix.
+
+    Args:
+        term: Raw search input
+        column: Optional column filter (e.g. 'name')
+
+    Returns:
+        FTS5 MATCH expression, or None if the input contains no words
+    """
+    words = WORD_PATTERN.findall(term)
+    if not words:
+        return None
+    query = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({query})' if column else query
+
+
+def artist_rank_join(term: str, alias: str = 'a') -> Tuple[str, List]:
+    """
+    Return a JOIN clause and parameters restricting artists to FTS matches.
+
+    The join exposes the match's bm25 score as artist_match.rank for ORDER BY.
+    """
+    return (
+        f'JOIN (SELECT rowid, bm25(artists_fts, {ARTIST_NAME_WEIGHT}, {ARTIST_BIO_WEIGHT}) AS rank '
+        f'FROM artists_fts WHERE artists_fts MATCH ?) artist_match ON artist_match.rowid = {alias}.search_id',
+        [fts_query(term)]
+    )
+
+
+def track_search_clause(term: str, use_fts: bool, track_alias: str = 't', artist_alias: str = 'a') -> Tuple[str, List]:
+    """Return a WHERE fragment and parameters matching tracks by track or artist name."""
+    if use_fts:
+        return (
+            f'({track_alias}.search_id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?) '
+            f'OR {artist_alias}.search_id IN (SELECT rowid FROM artists_fts WHERE artists_fts MATCH ?))',
+            [fts_query(term), fts_query(term, 'name')]
+        )
+    return (
+        f'({track_alias}.name LIKE ? COLLATE NOCASE OR {artist_alias}.name LIKE ? COLLATE NOCASE)',
+        [f'%{term}%', f'%{term}%']
+    )
+
+
+def search_artists(conn, term: str, include_inactive: bool = True, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict]:
+    """
+    Search artists by name and bio, best matches first.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        term: Raw search input
+        include_inactive: Also return deactivated artists
+        limit: Maximum number of results
+
+    Returns:
+        List of dicts with id, name, popularity, followers and inactive
+    """
+    if not WORD_PATTERN.search(term):
+        return []
+
+    active_filter = '' if include_inactive else ' AND (a.bInactivate = 0 OR a.bInactivate IS NULL)'
+    if fts_available(conn):
+        rows = conn.execute(f'''
+            SELECT a.id, a.name, a.popularity, a.followers, a.bInactivate
+            FROM artists_fts
+            JOIN artists a ON a.search_id = artists_fts.rowid
+            WHERE artists_fts MATCH ?{active_filter}
+            ORDER BY bm25(artists_fts, {ARTIST_NAME_WEIGHT}, {ARTIST_BIO_WEIGHT}), a.popularity DESC
+            LIMIT ?
+        ''', [fts_query(term), limit]).fetchall()
+    else:
+        rows = conn.execute(f'''
+            SELECT a.id, a.name, a.popularity, a.followers, a.bInactivate
+            FROM artists a
+            WHERE (a.name LIKE ? COLLATE NOCASE OR a.markdown_info LIKE ? COLLATE NOCASE){active_filter}
+            ORDER BY a.popularity DESC
+            LIMIT ?
+        ''', [f'%{term}%', f'%{term}%', limit]).fetchall()
+
+    return [
+        {
+            'id': row[0],
+            'name': row[1],
+            'popularity': row[2],
+            'followers': row[3],
+            'inactive': bool(row[4]),
+        }
+        for row in rows
+    ]
+
+
+def search_tracks(conn, term: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict]:
+    """
+    Search tracks by track name, best matches first.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        term: Raw search input
+        limit: Maximum number of results
+
+    Returns:
+        List of dicts with id, name, artist_id, artist_name, popularity and url
+    """
+    if not WORD_PATTERN.search(term):
+        return []
+
+    if fts_available(conn):
+        rows = conn.execute('''
+            SELECT t.id, t.name, t.artist_id, a.name, t.popularity, t.url
+            FROM tracks_fts
+            JOIN tracks t ON t.search_id = tracks_fts.rowid
+            LEFT JOIN artists a ON a.id = t.artist_id
+            WHERE tracks_fts MATCH ?
+            ORDER BY bm25(tracks_fts), t.popularity DESC
+            LIMIT ?
+        ''', [fts_query(term), limit]).fetchall()
+    else:
+        rows = conn.execute('''
+            SELECT t.id, t.name, t.artist_id, a.name, t.popularity, t.url
+            FROM tracks t
+            LEFT JOIN artists a ON a.id = t.artist_id
+            WHERE t.name LIKE ? COLLATE NOCASE
+            ORDER BY t.popularity DESC
+            LIMIT ?
+        ''', [f'%{term}%', limit]).fetchall()
+
+    return [
+        {
+            'id': row[0],
+            'name': row[1],
+            'artist_id': row[2],
+            'artist_name': row[3],
+            'popularity': row[4],
+            'url': row[5],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,117 @@
+"""
+Prebuilt search indexes for the generated pages.
+
+The search boxes of the generated pages used to walk every card on every
+keystroke and test its name with includes(), which is DOM work over
+thousands of nodes per key. Instead, each page now carries a word index of
+its items, built by the generator while the cards are rendered:
+
+- Item texts (artist names, song and artist names) are folded: lowercased
+  and stripped of diacritics, so å and ä match a and ö matches o, and split
+  into words of letters and digits.
+- Every distinct word maps to the numbers of the items containing it, in
+  page order. The words are sorted, so the page script finds every word
+  starting with a query word by binary search, and the postings are
+  delta-encoded to keep the JSON small.
+
+A query matches the items that have a word starting with each of its words.
+The page script (templates/site/assets/search_index.js) folds queries the
+same way as fold() below, and only shows or hides the cards whose match
+state changes.
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, Iterable, Iterator, List
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Words are runs of letters and digits after folding
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def fold(text: str) -> str:
+    """Lowercase text and strip its diacritics (Å, Ä and É become a, a and e)."""
+    decomposed = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(char for char in decomposed if not unicodedata.category(char).startswith('M'))
+
+
+def words(text: str) -> List[str]:
+    """Return the folded words of text."""
+    return WORD_PATTERN.findall(fold(text))
+
+
+class SearchIndex:
+    """
+    Word index of one page's items, in page order.
+
+    Items are added as the page renders, with add() or by passing the
+    page's rows through collect(); the page template serializes the index
+    with to_json() after its list of cards.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._postings: Dict[str, List[int]] = {}
+
+    def add(self, *texts: str) -> int:
+        """
+        Add the next item of the page.
+
+        Args:
+            *texts: Searchable texts of the item
+
+        Returns:
+            The item's number
+        """
+        item = self.size
+        for word in set(words(' '.join(text or '' for text in texts))):
+            self._postings.setdefault(word, []).append(item)
+        self.size += 1
+        return item
+
+    def collect(self, items: Iterable[Dict], *keys: str) -> Iterator[Dict]:
+        """
+        Yield items unchanged, adding each to the index on the way.
+
+        Args:
+            items: Template values of the page's items, in page order
+            *keys: Keys of the searchable texts of an item
+        """
+        for item in items:
+            self.add(*(item[key] for key in keys))
+            yield item
+
+    def to_json(self) -> Dict:
+        """
+        Return the index as a JSON-serializable dict.
+
+        Returns:
+            dict with size (number of items), terms (sorted words) and
+            postings (for each term, the numbers of its items as gaps from
+            the previous number)
+        """
+        # In UTF-16 code unit order, the order of JavaScript string comparison
+        terms = sorted(self._postings, key=lambda term: term.encode('utf-16-be'))
+        postings = []
+        for term in terms:
+            items = self._postings[term]
+            postings.append([items[0]] + [item - previous for previous, item in zip(items, items[1:])])
+        logger.debug("Search index of %d items with %d terms", self.size, len(terms))
+        return {'size': self.size, 'terms': terms, 'postings': postings}
+
+
+def build_search_index(items: Iterable[Dict], *keys: str) -> SearchIndex:
+    """
+    Build the search index of a complete list of items.
+
+    Args:
+        items: Template values of the items, in page order
+        *keys: Keys of the searchable texts of an item
+    """
+    index = SearchIndex()
+    for _ in index.collect(items, *keys):
+        pass
+    return index
@@ -0,0 +1,204 @@
+"""
+Sharded output mode for the songs list.
+
+The single songs.html carries every track as a card (over 3 MB), and the
+browser has to parse all of it before the search and sort work. In the
+sharded mode the tracks are split by the first letter of the song name, and
+letters with many songs are split further into pages of at most
+SONGS_SHARD_SIZE songs:
+
+- songs.html becomes a small index page listing the letters and their
+  pages, with a search across every song.
+- songs/<letter>.html, songs/<letter>-2.html, ... hold the song cards of
+  one shard each, with links to the previous and next shard and the same
+  in-page search and sort as the single page.
+- songs/<letter>.json is the search data of one shard: the song and
+  artist names of its cards and their prebuilt search index (see
+  search_index.py). The index page only fetches these when somebody
+  searches, so a visitor downloads one shard page and, at most, the
+  compact names and indexes of the others.
+
+Shard files that a later run no longer writes (a letter that lost its
+second page, say) are removed.
+"""
+
+import os
+import logging
+import unicodedata
+from itertools import islice
+from typing import Dict, Iterator, List, Sequence
+
+from renderer import render_page, write_json
+from search_index import build_search_index
+from sort_orders import SONG_SORT_KEYS, build_sort_orders
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Songs list output modes
+SONGS_OUTPUT_SINGLE = 'single'
+SONGS_OUTPUT_SHARDED = 'sharded'
+SONGS_OUTPUT_MODES = (SONGS_OUTPUT_SINGLE, SONGS_OUTPUT_SHARDED)
+
+# Default output mode of the songs list
+SONGS_OUTPUT = os.getenv('TOPPEN_SONGS_OUTPUT', SONGS_OUTPUT_SINGLE)
+
+# Songs per shard page at most, and the directory the shards are written to
+SONGS_SHARD_SIZE = int(os.getenv('TOPPEN_SONGS_SHARD_SIZE', '250'))
+SONGS_SHARD_DIR = 'songs'
+
+# Shard letters in page order, with the file name used for each
+DIGITS = '0-9'
+OTHER = '#'
+SHARD_LETTERS = [DIGITS] + [chr(code) for code in range(ord('A'), ord('Z') + 1)] + ['Å', 'Ä', 'Ö', OTHER]
+LETTER_SLUGS = {DIGITS: '0-9', 'Å': 'aa', 'Ä': 'ae', 'Ö': 'oe', OTHER: 'ovriga'}
+
+
+def shard_letter(name: str) -> str:
+    """
+    Return the shard letter of a song name.
+
+    Leading punctuation is skipped, accents other than Å, Ä and Ö are
+    dropped (É files under E), digits share one shard and names without a
+    letter or digit go to the '#' shard.
+    """
+    for char in name or '':
+        if not char.isalnum():
+            continue
+        char = char.upper()
+        if char in 'ÅÄÖ':
+            return char
+        base = unicodedata.normalize('NFKD', char)[0]
+        if base.isdigit():
+            return DIGITS
+        if 'A' <= base <= 'Z':
+            return base
+        return OTHER
+    return OTHER
+
+
+def plan_shards(songs: Sequence[Dict], shard_size: int = SONGS_SHARD_SIZE) -> List[Dict]:
+    """
+    Split songs into shards by first letter and at most shard_size songs each.
+
+    Songs keep their order within a letter.
+
+    Args:
+        songs: Template values of every track (see web_admin.songs_list)
+        shard_size: Songs per shard at most
+
+    Returns:
+        List of shards in page order, each a dict with letter, page, pages,
+        slug, label, file, index_file and songs
+    """
+    shard_size = max(1, shard_size)
+    by_letter: Dict[str, List[Dict]] = {letter: [] for letter in SHARD_LETTERS}
+    for song in songs:
+        by_letter[shard_letter(song['name'])].append(song)
+
+    shards = []
+    for letter in SHARD_LETTERS:
+        letter_songs = by_letter[letter]
+        pages = (len(letter_songs) + shard_size - 1) // shard_size
+        for page in range(1, pages + 1):
+            slug = LETTER_SLUGS.get(letter, letter.lower())
+            if page > 1:
+                slug = f'{slug}-{page}'
+            shards.append({
+                'letter': letter,
+                'page': page,
+                'pages': pages,
+                'slug': slug,
+                'label': letter if pages == 1 else f'{letter} {page}/{pages}',
+                'file': f'{slug}.html',
+                'index_file': f'{slug}.json',
+                'songs': letter_songs[(page - 1) * shard_size:page * shard_size],
+            })
+    return shards
+
+
+def _remove_stale_shards(shard_dir: str, written: Sequence[str]):
+    keep = set(written)
+    for name in os.listdir(shard_dir):
+        if name.endswith(('.html', '.json')) and name not in keep:
+            os.remove(os.path.join(shard_dir, name))
+            logger.info("Removed stale songs shard %s", name)
+
+
+def write_sharded_songs(
+    songs: Sequence[Dict],
+    cards,
+    index_file: str = 'songs.html',
+    shard_dir: str = SONGS_SHARD_DIR,
+    shard_size: int = SONGS_SHARD_SIZE,
+    **context
+) -> str:
+    """
+    Write the songs list as an index page plus one page and search index per shard.
+
+    Args:
+        songs: Template values of every track, in list order
+        cards: Card renderer with a FragmentCache.render() signature (the
+            fragment cache or a ParallelRenderer)
+        index_file: Index page to write
+        shard_dir: Directory for the shard pages and search indexes, next to index_file
+        shard_size: Songs per shard at most
+        **context: Template variables shared by every page (list_date, generated_at)
+
+    Returns:
+        index_file
+    """
+    shards = plan_shards(songs, shard_size)
+    shard_path = os.path.join(os.path.dirname(index_file), shard_dir)
+    os.makedirs(shard_path, exist_ok=True)
+    nav = [{key: shard[key] for key in ('letter', 'page', 'slug', 'label', 'file')} for shard in shards]
+
+    # One render call for every card keeps the whole list in one cache run;
+    # each shard page takes its share of the iterator
+    card_iter: Iterator = cards.render(
+        'site/cards/song.html',
+        ({'song': song} for shard in shards for song in shard['songs'])
+    )
+
+    written = []
+    for number, shard in enumerate(shards):
+        search_index = build_search_index(shard['songs'], 'name', 'artist_name')
+        render_page(
+            'site/songs_shard.html',
+            os.path.join(shard_path, shard['file']),
+            shard=shard,
+            shards=nav,
+            prev_shard=nav[number - 1] if number > 0 else None,
+            next_shard=nav[number + 1] if number + 1 < len(nav) else None,
+            index_page=os.path.basename(index_file),
+            song_cards=islice(card_iter, len(shard['songs'])),
+            search_index=search_index,
+            sort_orders=build_sort_orders(shard['songs'], SONG_SORT_KEYS),
+            **context
+        )
+        write_json(
+            {
+                'songs': [[song['name'], song['artist_name']] for song in shard['songs']],
+                'index': search_index.to_json(),
+            },
+            os.path.join(shard_path, shard['index_file'])
+        )
+        written += [shard['file'], shard['index_file']]
+
+    # Run the renderer to its end so it evicts stale cache entries
+    for _ in card_iter:
+        pass
+
+    render_page(
+        'site/songs_index.html',
+        index_file,
+        shard_dir=shard_dir,
+        shards=[dict(entry, count=len(shard['songs']), index_file=shard['index_file'])
+                for entry, shard in zip(nav, shards)],
+        song_count=len(songs),
+        **context
+    )
+    _remove_stale_shards(shard_path, written)
+
+    logger.info("Wrote %d songs in %d shards to %s", len(songs), len(shards), shard_path)
+    return index_file
@@ -0,0 +1,188 @@
+"""
+Precomputed sort orders for the generated pages.
+
+The songs list and the toplist offer sort buttons, and their page scripts
+used to sort the cards with localeCompare(..., 'sv') or numeric
+comparisons and then move them one by one. Instead, each page now carries
+the order of its items for every offered sort key, computed by the
+generator while the cards are rendered:
+
+- Text keys are compared with swedish_key(), a Swedish collation in the
+  spirit of the browser's: case and accents only break ties, and å, ä and
+  ö sort as letters of their own after z.
+- Each order is a list of item numbers in ascending order. Items that tie
+  with the item before them are written as ~number (the bitwise not, a
+  negative number), so the page script can build the descending order too:
+  the runs of tied items in reverse, each run kept in page order, which is
+  what a stable descending sort gives.
+
+The page script (templates/site/assets/sort_orders.js) turns an order into
+one reorder of the list.
+"""
+
+import logging
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Swedish alphabet in collation order
+SWEDISH_ALPHABET = 'abcdefghijklmnopqrstuvwxyzåäö'
+LETTER_WEIGHTS = {letter: weight for weight, letter in enumerate(SWEDISH_ALPHABET)}
+
+# Letters Swedish collation sorts as accented variants of another letter
+LETTER_VARIANTS = {
+    'æ': 'ä', 'ę': 'ä',
+    'ø': 'ö', 'ǿ': 'ö', 'ő': 'ö', 'œ': 'ö', 'ô': 'ö',
+    'ü': 'y', 'ű': 'y',
+    'đ': 'd', 'ð': 'd',
+}
+
+# Letters Swedish collation sorts as two letters
+LETTER_EXPANSIONS = {'ß': 'ss', 'þ': 'th'}
+
+# Punctuation and symbols in collation order (the Unicode collation
+# algorithm's); others follow in code point order
+SYMBOL_ORDER = '_-‐‑‒–—―,;:!¡?¿.…·\'‘’‚‛‹›"“”„‟«»()[]{}§¶@*/\\&#%‰†‡•`´˜^¯¨°©®+±÷×<=>¬|¦~¤¢$£¥€'
+SYMBOL_WEIGHTS = {symbol: weight for weight, symbol in enumerate(SYMBOL_ORDER)}
+# Typographic quotes only differ from the plain ones by accent
+SYMBOL_VARIANTS = {'‘': "'", '’': "'", '“': '"', '”': '"', '„': '"'}
+SYMBOL_WEIGHTS.update({variant: SYMBOL_WEIGHTS[symbol] for variant, symbol in SYMBOL_VARIANTS.items()})
+
+# Character groups in collation order: whitespace, punctuation and symbols,
+# digits, letters of the Swedish alphabet, other letters
+GROUP_SPACE, GROUP_SYMBOL, GROUP_DIGIT, GROUP_LETTER, GROUP_OTHER_LETTER = range(5)
+
+# Sort key callables take the template values of an item; None sorts by page order
+SortKey = Optional[Callable[[Dict], Any]]
+
+
+def _char_weights(char: str) -> Iterator[Tuple[Tuple[int, int], int]]:
+    lower = char.lower()
+    if lower in LETTER_WEIGHTS:
+        yield (GROUP_LETTER, LETTER_WEIGHTS[lower]), 0
+        return
+    if lower in LETTER_VARIANTS:
+        yield (GROUP_LETTER, LETTER_WEIGHTS[LETTER_VARIANTS[lower]]), 1
+        return
+    if lower in LETTER_EXPANSIONS:
+        for letter in LETTER_EXPANSIONS[lower]:
+            yield (GROUP_LETTER, LETTER_WEIGHTS[letter]), 1
+        return
+
+    # Canonical decomposition only: compatibility forms would turn ´ into a space
+    decomposed = unicodedata.normalize('NFD', lower)
+    accent = sum(ord(mark) for mark in decomposed if unicodedata.category(mark).startswith('M'))
+    for base in decomposed:
+        if unicodedata.category(base).startswith('M'):
+            continue
+        if base in LETTER_WEIGHTS:
+            group = (GROUP_LETTER, LETTER_WEIGHTS[base])
+        elif base.isdigit():
+            group = (GROUP_DIGIT, unicodedata.digit(base, 0))
+        elif base.isalpha():
+            group = (GROUP_OTHER_LETTER, ord(base))
+        elif base.isspace():
+            group = (GROUP_SPACE, 0)
+        else:
+            group = (GROUP_SYMBOL, SYMBOL_WEIGHTS.get(base, len(SYMBOL_ORDER) + ord(base)))
+        yield group, accent
+
+
+def swedish_key(text: str) -> Tuple:
+    """
+    Return a sort key that orders text the way Swedish collation does.
+
+    Letters compare first, case-insensitively and without accents, with å,
+    ä and ö after z (æ and ø as ä and ö, ü as y and so on). Punctuation
+    and symbols sort before digits and digits before letters. Accents break
+    ties, then case, lowercase first.
+    """
+    primary, secondary, tertiary = [], [], []
+    for char in text or '':
+        for weight, accent in _char_weights(char):
+            primary.append(weight)
+            secondary.append(accent)
+            tertiary.append(0 if char == char.lower() else 1)
+    return tuple(primary), tuple(secondary), tuple(tertiary)
+
+
+class SortOrders:
+    """
+    Sort orders of one page's items, in page order.
+
+    Items are passed through collect() as the page renders; the page
+    template serializes the orders with to_json() after its list of cards.
+
+    Args:
+        keys: Sort key callable of each sort button, by the button's
+            data-sort value; None sorts by page order
+    """
+
+    def __init__(self, keys: Dict[str, SortKey]):
+        self.keys = keys
+        self._values: Dict[str, List] = {name: [] for name in keys}
+        self.size = 0
+
+    def add(self, item: Dict) -> int:
+        """Add the next item of the page and return its number."""
+        for name, key in self.keys.items():
+            self._values[name].append(self.size if key is None else key(item))
+        self.size += 1
+        return self.size - 1
+
+    def collect(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield items unchanged, adding each to the sort orders on the way."""
+        for item in items:
+            self.add(item)
+            yield item
+
+    def order(self, name: str) -> List[int]:
+        """
+        Return the ascending order of a sort key.
+
+        Returns:
+            Item numbers in ascending order, ties in page order, with ~number
+            for an item that ties with the one before it
+        """
+        values = self._values[name]
+        numbers = sorted(range(self.size), key=values.__getitem__)
+        return [
+            ~number if position and values[number] == values[numbers[position - 1]] else number
+            for position, number in enumerate(numbers)
+        ]
+
+    def to_json(self) -> Dict[str, List[int]]:
+        """Return the order of every sort key, by key name."""
+        return {name: self.order(name) for name in self.keys}
+
+
+def build_sort_orders(items: Iterable[Dict], keys: Dict[str, SortKey]) -> SortOrders:
+    """
+    Build the sort orders of a complete list of items.
+
+    Args:
+        items: Template values of the items, in page order
+        keys: Sort key callable of each sort button; None sorts by page order
+    """
+    orders = SortOrders(keys)
+    for _ in orders.collect(items):
+        pass
+    return orders
+
+
+# Sort buttons of the songs list: song, artist and release date
+SONG_SORT_KEYS: Dict[str, SortKey] = {
+    'song': lambda song: swedish_key(song['name']),
+    'artist': lambda song: swedish_key(song['artist_name']),
+    'date': lambda song: swedish_key(song['release_date']),
+}
+
+# Sort buttons of the toplist; its page order is the toplist position
+TOPLIST_SORT_KEYS: Dict[str, SortKey] = {
+    'position': None,
+    'name': lambda artist: swedish_key(artist['name']),
+    'popularity': lambda artist: artist['popularity'],
+    'followers': lambda artist: artist['followers'],
+}
@@ -0,0 +1,160 @@
+"""
+Persistent SQLite-backed cache for Spotify API responses.
+
+Responses are keyed on the spotipy endpoint name and its arguments and kept
+for a per-endpoint time-to-live. Endpoints without a TTL (e.g. playlist
+writes) are never cached. The cache is bounded in size and evicts the least
+recently used entries first.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cache database location; set TOPPEN_SPOTIFY_CACHE to an empty string to disable caching
+SPOTIFY_CACHE_PATH = os.getenv('TOPPEN_SPOTIFY_CACHE', 'spotify_cache.sqlite3')
+
+# Set TOPPEN_SPOTIFY_CACHE_REFRESH=true to ignore cached responses (fresh responses are still stored)
+SPOTIFY_CACHE_FORCE_REFRESH = os.getenv('TOPPEN_SPOTIFY_CACHE_REFRESH', 'false').lower() == 'true'
+
+# Time-to-live in seconds per spotipy endpoint; endpoints not listed are not cached
+SPOTIFY_CACHE_TTLS = {
+    'artist': 12 * 3600,
+    'artists': 12 * 3600,
+    'artist_top_tracks': 24 * 3600,
+    'search': 3600,
+}
+
+# Maximum number of cached responses before least recently used entries are evicted
+SPOTIFY_CACHE_MAX_ENTRIES = 20000
+
+# Check the size bound every N stores instead of on every write
+EVICTION_INTERVAL = 100
+
+
+def make_cache_key(endpoint: str, args: tuple, kwargs: Dict) -> str:
+    """Build a stable cache key from an endpoint name and its arguments."""
+    payload = json.dumps([endpoint, list(args), kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SpotifyResponseCache:
+    """
+    Thread-safe on-disk cache of Spotify responses.
+
+    Args:
+        path: SQLite file used for the cache
+        ttls: Time-to-live in seconds per endpoint name
+        max_entries: Size bound enforced by LRU eviction
+        force_refresh: Ignore cached responses but keep storing fresh ones
+    """
+
+    def __init__(
+        self,
+        path: str = SPOTIFY_CACHE_PATH,
+        ttls: Optional[Dict[str, int]] = None,
+        max_entries: int = SPOTIFY_CACHE_MAX_ENTRIES,
+        force_refresh: bool = SPOTIFY_CACHE_FORCE_REFRESH
+    ):
+        self.path = path
+        self.ttls = dict(SPOTIFY_CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.force_refresh = force_refresh
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stores = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+            self._conn.commit()
+        return self._conn
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        """Return True if responses from endpoint are cached."""
+        return bool(self.path) and self.ttls.get(endpoint, 0) > 0
+
+    def get(self, endpoint: str, key: str) -> Optional[Any]:
+        """Return the cached response for key, or None on a miss or forced refresh."""
+        if self.force_refresh or not self.is_cacheable(endpoint):
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    'SELECT payload, expires_at FROM responses WHERE key = ?', [key]
+                ).fetchone()
+                if not row:
+                    return None
+                if row[1] < now:
+                    conn.execute('DELETE FROM responses WHERE key = ?', [key])
+                    conn.commit()
+                    return None
+                conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', [now, key])
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Spotify cache read failed: {e}")
+            return None
+
+        return json.loads(row[0])
+
+    def set(self, endpoint: str, key: str, value: Any):
+        """Store a response for key using the endpoint's TTL."""
+        if value is None or not self.is_cacheable(endpoint):
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute('''
+                    INSERT OR REPLACE INTO responses (key, endpoint, payload, expires_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [key, endpoint, json.dumps(value), now + self.ttls[endpoint], now])
+                self._stores += 1
+                if self._stores % EVICTION_INTERVAL == 0:
+                    self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Spotify cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then least recently used ones beyond max_entries."""
+        conn.execute('DELETE FROM responses WHERE expires_at < ?', [now])
+        conn.execute('''
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', [self.max_entries])
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+
+
+# Shared by every Spotify request in this process
+spotify_response_cache = SpotifyResponseCache()
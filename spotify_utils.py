@@ -1,24 +1,154 @@
 """
 Spotify API utilities with proper rate limiting and retry handling.
 Implements Spotify's recommended retry-after behavior for 429 responses.
+
+Read-only requests are served from the persistent response cache in
+spotify_cache when a fresh entry exists. Every request that reaches Spotify
+through spotify_request_with_retry, cache misses included, is paced by the
+process-wide adaptive rate limiter spotify_rate_limiter, so concurrent
+callers (web sync thread, CLI, admin search) draw from the same request
+budget.
 """
 
 import time
 import logging
-from typing import Any, Callable, Dict, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import spotipy
 from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyClientCredentials
+
+from spotify_cache import SpotifyResponseCache, make_cache_key, spotify_response_cache
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 MAX_RETRY_DELAY = 60
 
+# Adaptive rate limiter configuration (requests per second)
+RATE_LIMIT_INITIAL_RATE = 5.0         # Starting request rate
+RATE_LIMIT_MIN_RATE = 0.5             # Never slow down below this rate
+RATE_LIMIT_MAX_RATE = 25.0            # Never speed up beyond this rate
+RATE_LIMIT_BURST = 5                  # Token bucket capacity
+RATE_LIMIT_ADDITIVE_INCREASE = 0.05   # Rate increase per clean response
+RATE_LIMIT_MULTIPLICATIVE_DECREASE = 0.5  # Rate factor applied on 429 responses
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket whose refill rate adapts with AIMD.
+    
+    Every clean response increases the rate additively; every 429 response
+    halves it (multiplicative decrease) and, when Spotify sends a Retry-After
+    value, blocks all callers until that time has passed.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_INITIAL_RATE,
+        min_rate: float = RATE_LIMIT_MIN_RATE,
+        max_rate: float = RATE_LIMIT_MAX_RATE,
+        burst: int = RATE_LIMIT_BURST,
+        additive_increase: float = RATE_LIMIT_ADDITIVE_INCREASE,
+        multiplicative_decrease: float = RATE_LIMIT_MULTIPLICATIVE_DECREASE
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+
+        self._lock = threading.Lock()
+        self._rate = max(min_rate, min(rate, max_rate))
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Current request rate in requests per second."""
+        return self._rate
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self._rate)
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def record_success(self):
+        """Additive increase after a clean response."""
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.additive_increase)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """
+        Multiplicative decrease after a 429 response.
+        
+        Args:
+            retry_after: Seconds all callers must wait before the next request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._rate = max(self.min_rate, self._rate * self.multiplicative_decrease)
+            self._tokens = 0.0
+            self._last_refill = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+        logger.info(f"Spotify rate limiter backed off to {self._rate:.2f} requests/second")
+
+
+# Shared by every Spotify request in this process
+spotify_rate_limiter = AdaptiveRateLimiter()
+
+
+def create_spotify_client(auth: Optional[str] = None) -> spotipy.Spotify:
+    """
+    Create a Spotify client that leaves retries to spotify_request_with_retry.
+
+    spotipy's own urllib3 retries would sleep through 429 responses before
+    spotify_rate_limiter sees them, and would repeat POSTs after 5xx responses
+    (adding playlist tracks twice), so the client does not retry at all.
+
+    Args:
+        auth: OAuth user token; None authenticates with the client credentials
+            in SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET
+
+    Returns:
+        spotipy.Spotify client
+    """
+    if auth:
+        return spotipy.Spotify(auth=auth, retries=0, status_retries=0)
+    return spotipy.Spotify(
+        client_credentials_manager=SpotifyClientCredentials(),
+        retries=0,
+        status_retries=0,
+    )
+
+
 def spotify_request_with_retry(
     spotify_func: Callable, 
     *args, 
     max_retries: int = 3,
     base_delay: float = 1.0,
     max_retry_delay: float = MAX_RETRY_DELAY,
+    rate_limiter: Optional[AdaptiveRateLimiter] = spotify_rate_limiter,
+    cache: Optional[SpotifyResponseCache] = spotify_response_cache,
+    retry_server_errors: bool = True,
     **kwargs
 ) -> Any:
     """
@@ -28,12 +158,18 @@ def spotify_request_with_retry(
     - When a 429 error is received, wait for the time specified in Retry-After header
     - Use exponential backoff for other transient errors
     - Respect Spotify's rate limiting guidelines
+    - Pace every attempt through the shared adaptive rate limiter
+    - Serve cacheable endpoints from the persistent response cache
     
     Args:
         spotify_func: The spotipy function to call (e.g., sp.artist, sp.search)
         *args: Positional arguments for the function
         max_retries: Maximum number of retry attempts (default: 3)
         base_delay: Base delay for exponential backoff (default: 1.0 seconds)
+        rate_limiter: Rate limiter to pace requests with (default: spotify_rate_limiter, None disables)
+        cache: Response cache to read and fill (default: spotify_response_cache, None disables)
+        retry_server_errors: Retry 5xx responses; pass False for writes that
+            may have been applied despite the error (429s are always retried)
         **kwargs: Keyword arguments for the function
         
     Returns:
@@ -43,15 +179,33 @@ def spotify_request_with_retry(
         SpotifyException: If all retries are exhausted or for non-retryable errors
     """
     last_exception = None
+
+    # Serve from the response cache when a fresh entry exists
+    endpoint = getattr(spotify_func, '__name__', '')
+    cache_key = None
+    if cache and cache.is_cacheable(endpoint):
+        cache_key = make_cache_key(endpoint, args, kwargs)
+        cached = cache.get(endpoint, cache_key)
+        if cached is not None:
+            logger.debug(f"Spotify cache hit for {endpoint}")
+            return cached
     
     for attempt in range(max_retries + 1):
         try:
+            if rate_limiter:
+                rate_limiter.acquire()
+
             # Execute the Spotify API call
             result = spotify_func(*args, **kwargs)
             
-            # Success - reset any rate limiting state
+            # Success - let the rate limiter speed up again
+            if rate_limiter:
+                rate_limiter.record_success()
             if attempt > 0:
                 logger.info(f"Spotify API call succeeded after {attempt} retries")
+
+            if cache_key:
+                cache.set(endpoint, cache_key, result)
             
             return result
             
@@ -80,7 +234,11 @@ def spotify_request_with_retry(
                             )
                             raise
                         logger.warning(f"Rate limited by Spotify. Waiting {retry_seconds} seconds as specified in Retry-After header")
-                        time.sleep(retry_seconds)
+                        if rate_limiter:
+                            # Blocks every caller sharing the limiter, including this one
+                            rate_limiter.record_throttle(retry_seconds)
+                        else:
+                            time.sleep(retry_seconds)
                         continue
                     except (ValueError, TypeError):
                         logger.warning(f"Invalid Retry-After header value: {retry_after}")
@@ -88,13 +246,16 @@ def spotify_request_with_retry(
                 # If no valid Retry-After header, use exponential backoff
                 delay = base_delay * (2 ** attempt)
                 logger.warning(f"Rate limited by Spotify. No valid Retry-After header. Using exponential backoff: {delay} seconds")
-                time.sleep(delay)
+                if rate_limiter:
+                    rate_limiter.record_throttle(delay)
+                else:
+                    time.sleep(delay)
                 continue
                 
             # Check for other potentially retryable errors
             elif e.http_status in [500, 502, 503, 504]:
                 # Server errors - use exponential backoff
-                if attempt < max_retries:
+                if retry_server_errors and attempt < max_retries:
                     delay = base_delay * (2 ** attempt)
                     logger.warning(f"Server error {e.http_status}. Retrying in {delay} seconds. Attempt {attempt + 1}/{max_retries}")
                     time.sleep(delay)
@@ -138,6 +299,67 @@ def safe_spotify_artist(sp, artist_id: str, **kwargs) -> Optional[Dict]:
         return None
 
 
+# Spotify's "Get Several Artists" endpoint accepts at most 50 ids per request
+MAX_ARTISTS_PER_REQUEST = 50
+
+
+def safe_spotify_artists(
+    sp,
+    artist_ids: List[str],
+    cache: Optional[SpotifyResponseCache] = spotify_response_cache,
+    **kwargs
+) -> Optional[List[Optional[Dict]]]:
+    """
+    Safely get information for several artists in one request with retry handling.
+    
+    Args:
+        sp: Spotify client instance
+        artist_ids: Up to MAX_ARTISTS_PER_REQUEST artist Spotify IDs
+        cache: Response cache the artists are looked up in and stored to one by
+            one (default: spotify_response_cache, None disables)
+        **kwargs: Additional arguments for sp.artists()
+        
+    Returns:
+        List of artist dicts in the same order as artist_ids (None for unknown
+        ids), or None if the request failed
+    """
+    if len(artist_ids) > MAX_ARTISTS_PER_REQUEST:
+        raise ValueError(f"At most {MAX_ARTISTS_PER_REQUEST} artist ids can be fetched per request")
+
+    # Artists cached individually (e.g. by an earlier batch) need no request
+    artists = {}
+    use_cache = bool(cache) and not kwargs and cache.is_cacheable('artist')
+    if use_cache:
+        for artist_id in artist_ids:
+            cached = cache.get('artist', make_cache_key('artist', (artist_id,), {}))
+            if cached is not None:
+                artists[artist_id] = cached
+    missing = [artist_id for artist_id in artist_ids if artist_id not in artists]
+
+    if missing:
+        try:
+            result = spotify_request_with_retry(sp.artists, missing, cache=None, **kwargs)
+        except SpotifyException as e:
+            logger.error(f"Failed to get {len(missing)} artists: {e.http_status} - {e.msg}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error getting {len(missing)} artists: {e}")
+            return None
+
+        fetched = result.get('artists', []) if result else []
+        if len(fetched) != len(missing):
+            logger.error(f"Expected {len(missing)} artists from Spotify, got {len(fetched)}")
+            return None
+
+        for artist_id, artist in zip(missing, fetched):
+            artists[artist_id] = artist
+            # Cache per artist so later single lookups are served without a request
+            if artist and use_cache:
+                cache.set('artist', make_cache_key('artist', (artist_id,), {}), artist)
+
+    return [artists.get(artist_id) for artist_id in artist_ids]
+
+
 def safe_spotify_artist_top_tracks(sp, artist_id: str, country: str = 'SE', **kwargs) -> Optional[Dict]:
     """
     Safely get artist's top tracks with retry handling.
@@ -208,17 +430,3 @@ def get_retry_delay_from_headers(headers: Dict) -> Optional[int]:
             logger.warning(f"Invalid Retry-After header value: {retry_after}")
     
     return None
-
-
-# Rate limiting configuration
-DEFAULT_RATE_LIMIT_DELAY = 0.1  # Default delay between requests (100ms)
-RATE_LIMIT_BURST_DELAY = 1.0    # Delay after hitting rate limits
-
-def rate_limit_delay(delay: float = DEFAULT_RATE_LIMIT_DELAY):
-    """
-    Add a small delay to respect Spotify's rate limits proactively.
-    
-    Args:
-        delay: Number of seconds to delay (default: 0.1)
-    """
-    time.sleep(delay)
\ No newline at end of file
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Shared, fingerprinted stylesheets and scripts of the generated pages.
+
+The page templates used to include their stylesheets and scripts from
+templates/site/assets/ inline, so every page (and every weekly toplist in
+the archive) carried its own copy of the same card styles, search and
+sort scripts and artist detail and tip form code. Instead, the pages now
+link to shared files under assets/:
+
+- Every asset is written once under a name with a hash of its content
+  (toplist.3f9a1c0b2e.css), so browsers and proxies may cache it forever;
+  a changed asset gets a new name and the pages link to that one. Assets
+  that are always loaded together are bundled into one file (search.js).
+- Old versions are never removed: archived pages keep linking to the
+  assets they were generated with.
+- Files are written on first use, while the pages render, and by the
+  assets step of the generate-all pipeline, so precompress.py covers them.
+
+Links are relative to the page, so the pages can be served from any
+directory; TOPPEN_ASSET_URL points them at a fixed location instead (for
+pages that are copied elsewhere, like the archive). TOPPEN_STATIC_ASSETS=0
+includes the assets inline again, for pages that must be self-contained.
+
+Usage:
+    python static_assets.py
+"""
+
+import os
+import re
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from markupsafe import Markup
+
+from renderer import TEMPLATE_DIR, atomic_output
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Link to the shared asset files; set TOPPEN_STATIC_ASSETS=0 to include them inline
+STATIC_ASSETS = os.getenv('TOPPEN_STATIC_ASSETS', '1') != '0'
+
+# Directory the asset files are written to
+ASSET_DIR = os.getenv('TOPPEN_ASSET_DIR', 'assets')
+
+# Base URL of the asset files (e.g. /toppen/assets/); empty links relative to each page
+ASSET_URL = os.getenv('TOPPEN_ASSET_URL', '')
+
+# Stylesheets and scripts the asset files are built from
+ASSET_SOURCE_DIR = os.path.join(TEMPLATE_DIR, 'site', 'assets')
+
+# Hex digits of the content hash in asset file names
+ASSET_HASH_LENGTH = 10
+
+# Asset file names with a content hash, which are never modified
+HASHED_ASSET_PATTERN = re.compile(r'\.[0-9a-f]{%d}\.(?:css|js)$' % ASSET_HASH_LENGTH)
+
+# Bundles of sources always loaded together; any other source is an asset of its own
+ASSET_BUNDLES: Dict[str, Tuple[str, ...]] = {
+    'search.js': ('search_index.js', 'sort_orders.js'),
+}
+
+
+def bundle_sources(name: str) -> Tuple[str, ...]:
+    """Return the source files of an asset, relative to ASSET_SOURCE_DIR."""
+    return ASSET_BUNDLES.get(name, (name,))
+
+
+@lru_cache(maxsize=None)
+def asset_content(name: str) -> str:
+    """Return the content of an asset: its sources, joined by blank lines."""
+    parts = []
+    for source in bundle_sources(name):
+        with open(os.path.join(ASSET_SOURCE_DIR, source), encoding='utf-8') as f:
+            parts.append(f.read())
+    return '\n'.join(parts)
+
+
+def fingerprinted_name(name: str) -> str:
+    """Return the file name of an asset with its content hash, e.g. 'toplist.3f9a1c0b2e.css'."""
+    data = asset_content(name).encode('utf-8')
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:ASSET_HASH_LENGTH]}{extension}'
+
+
+def asset_file(name: str, asset_dir: str = ASSET_DIR) -> str:
+    """
+    Write an asset under its fingerprinted name, unless it already exists.
+
+    Args:
+        name: Asset name, e.g. 'toplist.css' or 'search.js'
+        asset_dir: Directory to write the asset file to
+
+    Returns:
+        Fingerprinted file name, e.g. 'toplist.3f9a1c0b2e.css'
+    """
+    data = asset_content(name).encode('utf-8')
+    file_name = fingerprinted_name(name)
+    path = os.path.join(asset_dir, file_name)
+    if not os.path.exists(path):
+        os.makedirs(asset_dir, exist_ok=True)
+        with atomic_output(path, binary=True) as f:
+            f.write(data)
+        logger.info("Wrote asset %s", path)
+    return file_name
+
+
+def asset_url(name: str, page_file: str) -> str:
+    """
+    Return the URL a page links an asset with.
+
+    Args:
+        name: Asset name
+        page_file: Path of the page, to link the asset relative to it
+    """
+    file_name = asset_file(name)
+    if ASSET_URL:
+        return ASSET_URL.rstrip('/') + '/' + file_name
+    page_dir = os.path.dirname(os.path.abspath(page_file))
+    directory = os.path.relpath(os.path.abspath(ASSET_DIR), page_dir)
+    return f'{directory}/{file_name}'.replace(os.sep, '/')
+
+
+def stylesheet_tag(name: str, page_file: str) -> Markup:
+    """Return the <link> element of a stylesheet asset, or a <style> element with its content."""
+    if not STATIC_ASSETS:
+        return Markup('<style>\n{}</style>').format(Markup(asset_content(name)))
+    return Markup('<link rel="stylesheet" href="{}">').format(asset_url(name, page_file))
+
+
+def script_tag(name: str, page_file: str) -> Markup:
+    """Return the <script> element of a script asset, with its content when assets are inline."""
+    if not STATIC_ASSETS:
+        return Markup('<script>\n{}</script>').format(Markup(asset_content(name)))
+    return Markup('<script src="{}"></script>').format(asset_url(name, page_file))
+
+
+def asset_names() -> List[str]:
+    """Return the name of every asset: the bundles and the sources outside them."""
+    bundled = {source for sources in ASSET_BUNDLES.values() for source in sources}
+    return sorted(ASSET_BUNDLES) + sorted(
+        name for name in os.listdir(ASSET_SOURCE_DIR)
+        if name.endswith(('.css', '.js')) and name not in bundled
+    )
+
+
+def asset_manifest() -> Dict:
+    """
+    Return everything that decides how pages link their assets.
+
+    Pages only change with it when the asset links change, so the
+    generate-all pipeline adds it to the page steps' inputs.
+
+    Returns:
+        dict with the fingerprinted name of every asset (by asset name), the
+        asset URL and directory, and whether assets are linked at all
+    """
+    return {
+        'files': {name: fingerprinted_name(name) for name in asset_names()},
+        'asset_url': ASSET_URL,
+        'asset_dir': ASSET_DIR,
+        'static_assets': STATIC_ASSETS,
+    }
+
+
+def build_assets(asset_dir: str = ASSET_DIR) -> List[str]:
+    """
+    Write every asset file that does not exist yet.
+
+    Args:
+        asset_dir: Directory to write the asset files to
+
+    Returns:
+        Paths of the current asset files
+    """
+    return [os.path.join(asset_dir, asset_file(name, asset_dir)) for name in asset_names()]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for path in build_assets():
+        print(path)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Local static file server for the generated pages.
+
+Works like `python -m http.server`, but serves the precompressed siblings
+written by precompress.py: a request for songs.html from a browser that
+accepts brotli gets songs.html.br with Content-Encoding: br, otherwise
+songs.html.gz with Content-Encoding: gzip, and the plain file only when
+the client accepts neither or no current sibling exists. Nothing is
+compressed per request. The fingerprinted asset files of static_assets.py
+are sent with headers that let browsers cache them for a year without
+revalidating.
+
+Usage:
+    python static_server.py [--port 8000] [--directory .]
+"""
+
+import os
+import argparse
+import logging
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from precompress import BROTLI_SUFFIX, ENCODINGS, GZIP_SUFFIX
+from static_assets import HASHED_ASSET_PATTERN
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Default port of the local server
+STATIC_SERVER_PORT = int(os.getenv('TOPPEN_STATIC_PORT', '8000'))
+
+# Siblings in order of preference
+SIBLING_PREFERENCE = (BROTLI_SUFFIX, GZIP_SUFFIX)
+
+# Fingerprinted assets never change under the same name
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Return the content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = []
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedHandler(SimpleHTTPRequestHandler):
+    """Request handler that serves .br and .gz siblings when the client accepts them."""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+            for suffix in SIBLING_PREFERENCE:
+                if ENCODINGS[suffix] in accepted or '*' in accepted:
+                    sibling = path + suffix
+                    # A sibling older than its page is left over from an earlier run
+                    if os.path.isfile(sibling) and os.stat(sibling).st_mtime >= os.stat(path).st_mtime:
+                        return self._send_sibling(path, sibling, ENCODINGS[suffix])
+        return super().send_head()
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        # Errors stay uncached: the asset may only be missing for now
+        if self._status < 400 and HASHED_ASSET_PATTERN.search(self.path.split('?', 1)[0]):
+            self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+        super().end_headers()
+
+    def _send_sibling(self, path: str, sibling: str, encoding: str):
+        f = open(sibling, 'rb')
+        try:
+            stat = os.fstat(f.fileno())
+            self.send_response(200)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return f
+        except BaseException:
+            f.close()
+            raise
+
+
+def serve(directory: str = '.', port: int = STATIC_SERVER_PORT, bind: str = '127.0.0.1'):
+    """
+    Serve directory over HTTP until interrupted.
+
+    Args:
+        directory: Directory with the generated pages
+        port: Port to listen on
+        bind: Address to listen on
+    """
+    handler = partial(PrecompressedHandler, directory=directory)
+    with ThreadingHTTPServer((bind, port), handler) as server:
+        logger.info("Serving %s at http://%s:%d/", os.path.abspath(directory), bind, port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Serve the generated pages with their precompressed siblings')
+    parser.add_argument('--port', type=int, default=STATIC_SERVER_PORT,
+                        help=f'Port to listen on (default: {STATIC_SERVER_PORT})')
+    parser.add_argument('--bind', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--directory', '-d', default='.', help='Directory to serve (default: current directory)')
+    args = parser.parse_args()
+
+    serve(args.directory, args.port, args.bind)
@@ -0,0 +1,281 @@
+const artistDetailModal = document.getElementById('artistDetailModal');
+const artistDetailClose = document.getElementById('artistDetailClose');
+const artistDetailTitle = document.getElementById('artistDetailTitle');
+const artistDetailStats = document.getElementById('artistDetailStats');
+const artistDetailLinks = document.getElementById('artistDetailLinks');
+const artistDetailInfo = document.getElementById('artistDetailInfo');
+const artistDetailMarkdown = document.getElementById('artistDetailMarkdown');
+const artistDetailImageWrap = document.getElementById('artistDetailImageWrap');
+
+if (artistDetailModal && artistDetailModal.parentElement !== document.body) {
+  document.body.appendChild(artistDetailModal);
+}
+
+function openArtistDetail(artistItem) {
+  if (!artistItem || !artistDetailModal) return;
+
+  const name = artistItem.dataset.artistNameDisplay || artistItem.dataset.artistName || '';
+  const artistName = name || 'Artistinformation';
+  const artistImage = artistItem.querySelector('.artist-image');
+  const spotifyLink = artistItem.querySelector('.spotify-btn');
+  const appleMusicLink = artistItem.querySelector('.apple-music-btn');
+  const youtubeMusicLink = artistItem.querySelector('.youtube-music-btn');
+  const source = artistItem.querySelector('.artist-markdown-source');
+  const added = artistItem.querySelector('.artist-added');
+  const rowid = artistItem.dataset.artistRowid || '';
+  const spotifyId = artistItem.dataset.artistSpotifyId || '';
+  const statusText = artistItem.dataset.artistInactivate === '1' ? 'Inaktiv' : 'Aktiv';
+  const popularityText = artistItem.dataset.artistPopularity || '';
+  const followersText = artistItem.dataset.artistFollowers || '';
+
+  artistDetailTitle.textContent = artistName;
+
+  if (artistImage && artistImage.getAttribute('src')) {
+    artistDetailImageWrap.innerHTML = '<img class="artist-detail-hero-image" src="' + artistImage.getAttribute('src') + '" alt="' + artistName.replace(/"/g, '&quot;') + '">';
+  } else {
+    artistDetailImageWrap.innerHTML = '<div class="artist-detail-hero-placeholder"><i class="fas fa-user fa-2x" aria-hidden="true"></i></div>';
+  }
+
+  artistDetailStats.innerHTML = ''
+    + '<span class="artist-stat-pill">' + statusText + '</span>'
+    + (popularityText ? '<span class="artist-stat-pill"><i class="fas fa-fire" aria-hidden="true"></i>' + popularityText + ' popularitet</span>' : '')
+    + (followersText ? '<span class="artist-stat-pill"><i class="fas fa-users" aria-hidden="true"></i>' + followersText + ' följare</span>' : '')
+    + (added && added.textContent ? '<span class="artist-stat-pill"><i class="fas fa-calendar" aria-hidden="true"></i>' + added.textContent.replace('Tillagd: ', '') + '</span>' : '')
+    + (spotifyId ? '<span class="artist-stat-pill">Spotify ID ' + spotifyId + '</span>' : (rowid ? '<span class="artist-stat-pill">ID ' + rowid + '</span>' : ''));
+
+  const links = [];
+  if (spotifyLink) {
+    links.push('<a class="artist-detail-link spotify" href="' + spotifyLink.href + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-spotify" aria-hidden="true"></i>Spotify</a>');
+  }
+  if (appleMusicLink) {
+    links.push('<a class="artist-detail-link apple" href="' + appleMusicLink.href + '" target="_blank" rel="noopener noreferrer"><i class="fas fa-music" aria-hidden="true"></i>Apple Music</a>');
+  }
+  if (youtubeMusicLink) {
+    links.push('<a class="artist-detail-link youtube" href="' + youtubeMusicLink.href + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-youtube" aria-hidden="true"></i>YouTube Music</a>');
+  }
+  artistDetailLinks.innerHTML = links.join('');
+
+  artistDetailInfo.innerHTML = ''
+    + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-fingerprint" aria-hidden="true"></i>Spotify ID</span><span><code>' + (spotifyId || 'Okänt') + '</code></span></div>'
+    + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-fire" aria-hidden="true"></i>Popularitet</span><span>' + (popularityText || 'Okänt') + '</span></div>'
+    + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-users" aria-hidden="true"></i>Följare</span><span>' + (followersText || 'Okänt') + '</span></div>'
+    + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-link" aria-hidden="true"></i>Spotify-länk</span><span>' + (spotifyLink ? 'Ja' : 'Nej') + '</span></div>'
+    + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-calendar" aria-hidden="true"></i>Tillagd</span><span>' + (added && added.textContent ? added.textContent.replace('Tillagd: ', '') : 'Okänt') + '</span></div>';
+
+  const markdownText = source ? (source.value || '').trim() : '';
+  if (window.marked && typeof window.marked.parse === 'function') {
+    artistDetailMarkdown.innerHTML = markdownText ? window.marked.parse(markdownText) : '<p class="text-muted mb-0">Ingen artistinformation tillagd ännu.</p>';
+  } else {
+    artistDetailMarkdown.textContent = markdownText || 'Ingen artistinformation tillagd ännu.';
+  }
+
+  artistDetailModal.scrollTop = 0;
+  const artistDetailBody = artistDetailModal.querySelector('.artist-detail-body');
+  if (artistDetailBody) {
+    artistDetailBody.scrollTop = 0;
+  }
+
+  artistDetailModal.classList.add('open');
+  artistDetailModal.setAttribute('aria-hidden', 'false');
+  document.body.style.overflow = 'hidden';
+}
+
+function closeArtistDetail() {
+  if (!artistDetailModal) return;
+  artistDetailModal.classList.remove('open');
+  artistDetailModal.setAttribute('aria-hidden', 'true');
+  document.body.style.overflow = '';
+}
+
+document.querySelectorAll('.artist-detail-trigger').forEach(function(button) {
+  button.addEventListener('click', function() {
+    openArtistDetail(button.closest('.artist-item'));
+  });
+});
+
+if (artistDetailClose) {
+  artistDetailClose.addEventListener('click', closeArtistDetail);
+}
+
+if (artistDetailModal) {
+  artistDetailModal.addEventListener('click', function(event) {
+    if (event.target === artistDetailModal) {
+      closeArtistDetail();
+    }
+  });
+}
+
+document.addEventListener('keydown', function(event) {
+  if (event.key === 'Escape') {
+    closeArtistDetail();
+  }
+});
+
+document.querySelectorAll('.toggle-tip-form').forEach(function(button) {
+  button.addEventListener('click', function() {
+    const form = document.getElementById(button.dataset.formId);
+    if (!form) return;
+    form.classList.toggle('open');
+  });
+});
+
+document.querySelectorAll('.toggle-artist-info').forEach(function(button) {
+  button.addEventListener('click', function() {
+    const panel = document.getElementById(button.dataset.infoId);
+    if (!panel) return;
+
+    const content = panel.querySelector('.artist-info-content');
+    const source = panel.querySelector('.artist-markdown-source');
+    if (content && source && content.dataset.rendered !== 'true') {
+      const markdownText = source.value || '';
+      if (window.marked && typeof window.marked.parse === 'function') {
+        content.innerHTML = window.marked.parse(markdownText);
+      } else {
+        content.textContent = markdownText;
+      }
+      content.dataset.rendered = 'true';
+    }
+
+    panel.classList.toggle('open');
+  });
+});
+
+document.querySelectorAll('.close-tip-form').forEach(function(button) {
+  button.addEventListener('click', function() {
+    const form = document.getElementById(button.dataset.formId);
+    if (!form) return;
+    form.classList.remove('open');
+  });
+});
+
+function fallbackToMailto(formData) {
+  const recipient = 'toppen@grodansparadis.com';
+  const artist = formData.get('artist') || '';
+  const senderName = formData.get('namn') || '';
+  const senderEmail = formData.get('epost') || '';
+  const halsinglandConnection = formData.get('halsingland_connection') || '';
+  const spotifyLink = formData.get('spotify_link') || '';
+  const appleMusicLink = formData.get('apple_music_link') || '';
+  const youtubeMusicLink = formData.get('youtube_music_link') || '';
+  const info = formData.get('information') || '';
+  const sourceUrl = formData.get('source_url') || window.location.href;
+
+  const subject = 'Artisttips: ' + artist;
+  const body = [
+    'Artist: ' + artist,
+    'Namn: ' + senderName,
+    'E-post: ' + senderEmail,
+    'Källa: ' + sourceUrl,
+    'Koppling till Hälsingland: ' + (halsinglandConnection || '-'),
+    'Spotify-länk: ' + (spotifyLink || '-'),
+    'Apple Music-länk: ' + (appleMusicLink || '-'),
+    'YouTube Music-länk: ' + (youtubeMusicLink || '-'),
+    '',
+    'Information:',
+    info
+  ].join('\n');
+
+  window.location.href = 'mailto:' + encodeURIComponent(recipient)
+    + '?subject=' + encodeURIComponent(subject)
+    + '&body=' + encodeURIComponent(body);
+}
+
+document.querySelectorAll('.tip-form').forEach(function(form) {
+  form.addEventListener('submit', async function(event) {
+    event.preventDefault();
+    const formData = new FormData(form);
+
+    try {
+      const response = await fetch('/api/artist-tip', {
+        method: 'POST',
+        body: formData
+      });
+
+      if (!response.ok) {
+        fallbackToMailto(formData);
+        return;
+      }
+
+      alert('Tack! Ditt tips har skickats.');
+      form.reset();
+      form.querySelectorAll('.source-url-field').forEach(function(field) {
+        field.value = window.location.href;
+      });
+      form.classList.remove('open');
+    } catch (error) {
+      fallbackToMailto(formData);
+    }
+  });
+});
+
+const searchInput = document.getElementById('artistSearch');
+const clearSearchButton = document.getElementById('clearSearch');
+const showLatestButton = document.getElementById('showLatest');
+const randomizeButton = document.getElementById('randomizeList');
+const searchStatus = document.getElementById('searchStatus');
+const artistList = document.querySelector('.artist-list');
+const artistItems = Array.from(document.querySelectorAll('.artist-item'));
+
+function shuffleVisibleArtists() {
+  const visibleItems = artistItems.filter(function(item) {
+    return item.style.display !== 'none';
+  });
+
+  for (let i = visibleItems.length - 1; i > 0; i -= 1) {
+    const j = Math.floor(Math.random() * (i + 1));
+    const temp = visibleItems[i];
+    visibleItems[i] = visibleItems[j];
+    visibleItems[j] = temp;
+  }
+
+  visibleItems.forEach(function(item) {
+    artistList.appendChild(item);
+  });
+}
+
+function showLatestVisibleArtists() {
+  const visibleItems = artistItems.filter(function(item) {
+    return item.style.display !== 'none';
+  });
+
+  visibleItems.sort(function(a, b) {
+    return Number(b.dataset.artistRowid) - Number(a.dataset.artistRowid);
+  });
+
+  visibleItems.forEach(function(item) {
+    artistList.appendChild(item);
+  });
+}
+
+function updateSearchStatus(visibleCount) {
+  searchStatus.textContent = 'Visar ' + visibleCount + ' av ' + artistItems.length + ' artister';
+}
+
+// The search index numbers the artists in page order, as the list items are
+const searchArtists = createSearchFilter(loadSearchIndex('searchIndex'), function(item, visible) {
+  artistItems[item].style.display = visible ? 'block' : 'none';
+});
+
+function filterArtists() {
+  updateSearchStatus(searchArtists(searchInput.value).length);
+}
+
+searchInput.addEventListener('input', filterArtists);
+searchInput.addEventListener('keydown', function(event) {
+  if (event.key === 'Escape') {
+    searchInput.value = '';
+    filterArtists();
+  }
+});
+clearSearchButton.addEventListener('click', function() {
+  searchInput.value = '';
+  filterArtists();
+  searchInput.focus();
+});
+randomizeButton.addEventListener('click', function() {
+  shuffleVisibleArtists();
+});
+showLatestButton.addEventListener('click', function() {
+  showLatestVisibleArtists();
+});
+updateSearchStatus(artistItems.length);
@@ -0,0 +1,84 @@
+// Prebuilt search index of the page's items (see search_index.py): sorted folded
+// words, each with the numbers of the items containing it as gaps
+function createSearchIndex(data) {
+    const terms = data.terms;
+    const postings = data.postings.map(gaps => {
+        let item = 0;
+        return gaps.map(gap => (item += gap));
+    });
+
+    // Lowercase and strip diacritics the same way as search_index.fold()
+    function fold(text) {
+        return (text || '').toLowerCase().normalize('NFKD').replace(/\p{M}/gu, '');
+    }
+
+    function firstTermFrom(prefix) {
+        let low = 0;
+        let high = terms.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (terms[middle] < prefix) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    function prefixItems(prefix) {
+        const items = new Set();
+        for (let term = firstTermFrom(prefix); term < terms.length && terms[term].startsWith(prefix); term++) {
+            postings[term].forEach(item => items.add(item));
+        }
+        return items;
+    }
+
+    // Sorted numbers of the items with a word starting with every word of
+    // the query, or null when the query has no words
+    function search(query) {
+        const words = Array.from(new Set(fold(query).match(/[\p{L}\p{N}]+/gu) || []));
+        if (!words.length) return null;
+
+        let matches = null;
+        for (const word of words) {
+            const items = prefixItems(word);
+            matches = matches ? matches.filter(item => items.has(item)) : Array.from(items);
+            if (!matches.length) break;
+        }
+        return matches.sort((a, b) => a - b);
+    }
+
+    return { size: data.size, search: search };
+}
+
+function loadSearchIndex(elementId) {
+    return createSearchIndex(JSON.parse(document.getElementById(elementId).textContent));
+}
+
+// Filter for a list of items shown in page order: returns a function that
+// takes a query and calls setVisible(item, visible) only for the items whose
+// visibility changes, then returns the matching item numbers
+function createSearchFilter(index, setVisible) {
+    const allItems = Array.from({ length: index.size }, (_, item) => item);
+    let shown = allItems;
+
+    return function(query) {
+        const matches = index.search(query) || allItems;
+        let i = 0;
+        let j = 0;
+        // Both lists are sorted, so one merge pass finds the changes
+        while (i < shown.length || j < matches.length) {
+            if (j >= matches.length || (i < shown.length && shown[i] < matches[j])) {
+                setVisible(shown[i++], false);
+            } else if (i >= shown.length || matches[j] < shown[i]) {
+                setVisible(matches[j++], true);
+            } else {
+                i++;
+                j++;
+            }
+        }
+        shown = matches;
+        return matches;
+    };
+}
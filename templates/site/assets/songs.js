@@ -0,0 +1,118 @@
+// Application state
+let currentSort = 'song';
+let sortDirection = 'asc';
+let songs = [];
+let filterSongs = null;
+let sortOrders = null;
+// The page defines totalSongs
+
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    initializeSongs();
+    setupEventListeners();
+    updateSongCount();
+    applySearchFromHash();
+    hideLoading();
+});
+
+function showLoading() {
+    document.getElementById('loadingOverlay').style.display = 'flex';
+}
+
+function hideLoading() {
+    document.getElementById('loadingOverlay').style.display = 'none';
+}
+
+function initializeSongs() {
+    const songCards = document.querySelectorAll('.song-card');
+    // Sorting uses the precomputed orders, so the cards' sort values are not read here
+    songs = Array.from(songCards).map(card => ({ element: card }));
+
+    // The search index numbers the songs in page order, as the cards are
+    filterSongs = createSearchFilter(loadSearchIndex('searchIndex'), (item, visible) => {
+        songs[item].element.style.display = visible ? 'block' : 'none';
+    });
+    sortOrders = loadSortOrders('sortOrders');
+}
+
+function applySearchFromHash() {
+    // Search results on the songs index link to a shard page as #q=<song name>
+    if (!location.hash.startsWith('#q=')) return;
+    const searchInput = document.getElementById('searchInput');
+    searchInput.value = decodeURIComponent(location.hash.slice(3));
+    searchInput.dispatchEvent(new Event('input'));
+}
+
+function setupEventListeners() {
+    // Search functionality
+    const searchInput = document.getElementById('searchInput');
+    searchInput.addEventListener('input', handleSearch);
+
+    // Sort buttons
+    const sortButtons = document.querySelectorAll('[data-sort]');
+    sortButtons.forEach(button => {
+        button.addEventListener('click', handleSort);
+    });
+
+    updateSortButtonsState(currentSort, sortDirection);
+}
+
+function updateSortButtonsState(sortType, direction) {
+    document.querySelectorAll('[data-sort]').forEach(btn => {
+        const isActive = btn.dataset.sort === sortType;
+        btn.classList.toggle('active', isActive);
+        if (isActive) {
+            btn.setAttribute('data-direction', direction);
+        } else {
+            btn.removeAttribute('data-direction');
+        }
+    });
+}
+
+function handleSearch(e) {
+    updateSongCount(filterSongs(e.target.value).length);
+}
+
+function handleSort(e) {
+    showLoading();
+
+    const sortType = e.target.closest('[data-sort]').dataset.sort;
+
+    // Toggle direction if same sort
+    if (currentSort === sortType) {
+        sortDirection = sortDirection === 'asc' ? 'desc' : 'asc';
+    } else {
+        sortDirection = 'asc';
+    }
+
+    currentSort = sortType;
+    updateSortButtonsState(currentSort, sortDirection);
+
+    setTimeout(() => {
+        sortSongs(sortType, sortDirection);
+        hideLoading();
+    }, 100);
+}
+
+function sortSongs(sortBy, direction) {
+    // Hidden songs move along, so they are in place when the search changes
+    reorderElements(document.getElementById('songsList'), sortOrders.order(sortBy, direction),
+        item => songs[item].element);
+}
+
+function updateSongCount(visible = null) {
+    const count = visible !== null ? visible : totalSongs;
+    const text = visible !== null ? 
+        `Visar ${count} av ${totalSongs} låtar` : 
+        `${totalSongs} låtar totalt`;
+
+    document.getElementById('songCount').textContent = text;
+}
+
+// Add loading animation to external links
+document.querySelectorAll('a[target="_blank"]').forEach(link => {
+    link.addEventListener('click', function() {
+        showLoading();
+        setTimeout(hideLoading, 2000);
+    });
+});
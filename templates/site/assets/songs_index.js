@@ -0,0 +1,86 @@
+// The page defines shards, shardDir and totalSongs
+const maxResults = 100;
+let shardIndexes = null;
+let searchTimer = null;
+
+function loadShardIndexes() {
+    if (!shardIndexes) {
+        shardIndexes = Promise.all(shards.map(shard =>
+            fetch(`${shardDir}/${shard.index_file}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(response.statusText);
+                    return response.json();
+                })
+                .then(data => ({
+                    shard: shard,
+                    songs: data.songs,
+                    index: createSearchIndex(data.index)
+                }))
+        ));
+        // Try again on the next search if a shard index could not be loaded
+        shardIndexes.catch(() => { shardIndexes = null; });
+    }
+    return shardIndexes;
+}
+
+function searchShards(term, shardList) {
+    const matches = [];
+    shardList.forEach(({ shard, songs, index }) => {
+        (index.search(term) || []).forEach(item => {
+            const [song, artist] = songs[item];
+            matches.push({ shard: shard, song: song, artist: artist });
+        });
+    });
+    return matches;
+}
+
+function showResults(term, matches) {
+    const results = document.getElementById('searchResults');
+    results.replaceChildren();
+    if (!term) {
+        document.getElementById('songCount').textContent = `${totalSongs} låtar totalt`;
+        return;
+    }
+
+    matches.slice(0, maxResults).forEach(match => {
+        const link = document.createElement('a');
+        link.className = 'list-group-item list-group-item-action';
+        link.href = `${shardDir}/${match.shard.file}#q=${encodeURIComponent(match.song)}`;
+
+        const title = document.createElement('span');
+        title.textContent = `${match.song} – ${match.artist}`;
+        const badge = document.createElement('span');
+        badge.className = 'badge bg-secondary';
+        badge.textContent = match.shard.label;
+
+        link.append(title, badge);
+        results.appendChild(link);
+    });
+
+    const shown = Math.min(matches.length, maxResults);
+    document.getElementById('songCount').textContent = matches.length > shown ?
+        `Visar ${shown} av ${matches.length} träffar` :
+        `${matches.length} träffar av ${totalSongs} låtar`;
+}
+
+function handleSearch(e) {
+    const term = e.target.value.trim();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        if (!term) {
+            showResults('', []);
+            return;
+        }
+        loadShardIndexes()
+            .then(shardList => {
+                if (document.getElementById('searchInput').value.trim() === term) {
+                    showResults(term, searchShards(term, shardList));
+                }
+            })
+            .catch(() => {
+                document.getElementById('songCount').textContent = 'Sökningen kunde inte laddas';
+            });
+    }, 150);
+}
+
+document.getElementById('searchInput').addEventListener('input', handleSearch);
@@ -0,0 +1,44 @@
+// Precomputed sort orders of the page's items (see sort_orders.py): for each
+// sort key, the item numbers in ascending order, with ~number marking an item
+// that ties with the one before it
+function createSortOrders(data) {
+    const cache = {};
+
+    // Runs of tied items, in ascending order
+    function runs(key) {
+        const result = [];
+        data[key].forEach(entry => {
+            if (entry < 0) {
+                result[result.length - 1].push(~entry);
+            } else {
+                result.push([entry]);
+            }
+        });
+        return result;
+    }
+
+    // Item numbers sorted by key; descending keeps tied items in page order,
+    // like a stable sort
+    function order(key, direction) {
+        const name = key + ':' + direction;
+        if (!cache[name]) {
+            const keyRuns = runs(key);
+            if (direction === 'desc') keyRuns.reverse();
+            cache[name] = keyRuns.flat();
+        }
+        return cache[name];
+    }
+
+    return { order: order };
+}
+
+function loadSortOrders(elementId) {
+    return createSortOrders(JSON.parse(document.getElementById(elementId).textContent));
+}
+
+// Move the items' elements into the container in the given order with one insertion
+function reorderElements(container, order, elementOf) {
+    const fragment = document.createDocumentFragment();
+    order.forEach(item => fragment.appendChild(elementOf(item)));
+    container.appendChild(fragment);
+}
@@ -0,0 +1,120 @@
+// Application state
+let currentSort = 'position';
+let sortDirection = 'asc';
+let artists = [];
+let filterArtists = null;
+let sortOrders = null;
+
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    initializeArtists();
+    setupEventListeners();
+    setupInfoButtons();
+    setupNewArtistTip();
+    hideLoading();
+});
+
+function initializeArtists() {
+    const artistCards = document.querySelectorAll('.artist-card');
+    // Sorting uses the precomputed orders, so the cards' sort values are not read here
+    artists = Array.from(artistCards).map(card => ({ element: card }));
+
+    // The search index numbers the artists in toplist order, as the cards are
+    filterArtists = createSearchFilter(loadSearchIndex('searchIndex'), (item, visible) => {
+        artists[item].element.style.display = visible ? 'block' : 'none';
+    });
+    sortOrders = loadSortOrders('sortOrders');
+}
+
+// The detail values of an artist card, read from its data attributes
+function cardArtist(card) {
+    const image = card.querySelector('.artist-image');
+    const appleMusicAnchor = card.querySelector('.apple-music-btn');
+    const youtubeMusicAnchor = card.querySelector('.youtube-music-btn');
+    let topTracks = [];
+
+    try {
+        topTracks = JSON.parse(card.dataset.topTracks || '[]');
+    } catch (error) {
+        topTracks = [];
+    }
+
+    return {
+        name: card.dataset.nameDisplay || card.dataset.name,
+        popularity: card.dataset.popularity || '',
+        followers: card.dataset.followers || '',
+        addedAt: card.dataset.addedAt || '',
+        spotifyUrl: card.dataset.spfLink || '',
+        appleMusicLink: appleMusicAnchor ? appleMusicAnchor.href : '',
+        youtubeMusicLink: youtubeMusicAnchor ? youtubeMusicAnchor.href : '',
+        imageUrl: image ? image.getAttribute('src') : '',
+        topTracks: topTracks,
+        markdownInfo: card.dataset.markdownInfo || ''
+    };
+}
+
+function setupInfoButtons() {
+    document.querySelectorAll('.toggle-artist-detail').forEach(function(button) {
+        button.addEventListener('click', function() {
+            openArtistDetail(cardArtist(button.closest('.artist-card')));
+        });
+    });
+}
+
+function setupEventListeners() {
+    // Search functionality
+    const searchInput = document.getElementById('searchInput');
+    searchInput.addEventListener('input', handleSearch);
+
+    // Sort buttons
+    const sortButtons = document.querySelectorAll('[data-sort]');
+    sortButtons.forEach(button => {
+        button.addEventListener('click', handleSort);
+    });
+
+    updateSortButtonsState(currentSort, sortDirection);
+}
+
+function handleSearch(e) {
+    filterArtists(e.target.value);
+    updatePositionNumbers();
+}
+
+function handleSort(e) {
+    showLoading();
+
+    const sortType = e.target.closest('[data-sort]').dataset.sort;
+
+    // Toggle direction if same sort
+    if (currentSort === sortType) {
+        sortDirection = sortDirection === 'asc' ? 'desc' : 'asc';
+    } else {
+        sortDirection = sortType === 'name' ? 'asc' : 'desc';
+    }
+
+    currentSort = sortType;
+    updateSortButtonsState(currentSort, sortDirection);
+
+    setTimeout(() => {
+        sortArtists(sortType, sortDirection);
+        hideLoading();
+    }, 100);
+}
+
+function sortArtists(sortBy, direction) {
+    // Hidden artists move along, so they are in place when the search changes
+    reorderElements(document.getElementById('artistsList'), sortOrders.order(sortBy, direction),
+        item => artists[item].element);
+
+    updatePositionNumbers();
+}
+
+function updatePositionNumbers() {
+    const visibleCards = Array.from(document.querySelectorAll('.artist-card'))
+        .filter(card => card.style.display !== 'none');
+
+    visibleCards.forEach((card, index) => {
+        const positionElement = card.querySelector('.position-number');
+        positionElement.textContent = `#${index + 1}`;
+    });
+}
@@ -0,0 +1,209 @@
+// Toplist data: one row per artist in toplist order, with the columns listed in fields
+const toplistData = JSON.parse(document.getElementById('toplistData').textContent);
+const artists = toplistData.artists.map((row, index) => {
+    const artist = {};
+    toplistData.fields.forEach((field, column) => { artist[field] = row[column]; });
+    artist.position = index + 1;
+    artist.spotifyUrl = expandUrl(artist.spotifyUrl);
+    artist.imageUrl = expandUrl(artist.imageUrl);
+    artist.topTracks = artist.topTracks.map(([name, popularity, url]) => ({ name, popularity, url: expandUrl(url) }));
+    return artist;
+});
+
+// URLs in the data start with a one-letter prefix code instead of the common prefix
+function expandUrl(url) {
+    const match = /^([a-z]):/.exec(url || '');
+    return match && toplistData.urlPrefixes[match[1]] ? toplistData.urlPrefixes[match[1]] + url.slice(2) : url;
+}
+
+// Application state
+let currentSort = 'position';
+let sortDirection = 'asc';
+let searchTerm = '';
+const searchIndex = loadSearchIndex('searchIndex');
+const sortOrders = loadSortOrders('sortOrders');
+let order = artists.map((artist, index) => index);
+
+// Virtual list: only the cards in and near the viewport are in the DOM
+const OVERSCAN = 8;
+const artistsList = document.getElementById('artistsList');
+let cardHeight = 0;
+let renderedRange = null;
+let scrollScheduled = false;
+
+// Artist information is only loaded when the first detail view opens
+let artistInfo = null;
+let detailArtist = null;
+
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    setupEventListeners();
+    setupNewArtistTip();
+    renderWindow();
+    hideLoading();
+});
+
+function cardHtml(artist, position) {
+    const name = escapeHtml(artist.name);
+    const image = artist.imageUrl
+        ? '<img src="' + escapeHtml(artist.imageUrl) + '" alt="' + name + '" class="artist-image">'
+        : '<div class="artist-image bg-light d-flex align-items-center justify-content-center"><i class="fas fa-user fa-2x text-muted"></i></div>';
+    const links = '<a href="' + escapeHtml(artist.spotifyUrl) + '" target="_blank" class="btn btn-sm btn-success me-1 spotify-btn"><i class="fab fa-spotify me-1"></i>Spotify</a>'
+        + (artist.appleMusicLink ? '<a href="' + escapeHtml(artist.appleMusicLink) + '" target="_blank" class="btn btn-sm btn-dark me-1 apple-music-btn"><i class="fab fa-apple me-1"></i>Apple Music</a>' : '')
+        + (artist.youtubeMusicLink ? '<a href="' + escapeHtml(artist.youtubeMusicLink) + '" target="_blank" class="btn btn-sm btn-danger me-1 youtube-music-btn"><i class="fab fa-youtube me-1"></i>YouTube</a>' : '');
+
+    return '<div class="artist-card" data-index="' + (artist.position - 1) + '">'
+        + '<div class="d-flex align-items-center">'
+        + '<div class="position-badge"><span class="position-number">#' + position + '</span></div>'
+        + '<div class="p-3">' + image + '</div>'
+        + '<div class="artist-info flex-grow-1">'
+        + '<div class="d-flex align-items-center mb-1">'
+        + '<button type="button" class="artist-name-trigger toggle-artist-detail">' + name + '</button>'
+        + '<button type="button" class="info-btn toggle-artist-detail ms-2" aria-label="Visa artistinfo" title="Visa artistinfo"><i class="fas fa-info"></i></button>'
+        + '</div>'
+        + '<div class="stats-container mb-2">'
+        + '<div class="stat-item popularity-stat"><i class="fas fa-fire"></i><span>' + artist.popularity + '% popularitet</span></div>'
+        + '<div class="stat-item followers-stat"><i class="fas fa-users"></i><span>' + artist.followers.toLocaleString('en-US') + ' följare</span></div>'
+        + '</div>'
+        + '<div class="music-links">' + links + '</div>'
+        + '</div>'
+        + '</div>'
+        + '</div>';
+}
+
+function measureCardHeight() {
+    // Distance between two rendered cards, so the card margin is included
+    artistsList.style.paddingTop = artistsList.style.paddingBottom = '0px';
+    artistsList.innerHTML = order.slice(0, 2).map(index => cardHtml(artists[index], 1)).join('');
+    const cards = artistsList.children;
+    cardHeight = cards.length > 1 ? cards[1].offsetTop - cards[0].offsetTop : cards[0].offsetHeight;
+    renderedRange = null;
+}
+
+function renderWindow() {
+    if (!order.length) {
+        artistsList.style.paddingTop = artistsList.style.paddingBottom = '0px';
+        artistsList.innerHTML = '<p class="text-center text-muted">Inga artister hittades.</p>';
+        renderedRange = null;
+        return;
+    }
+    if (!cardHeight) {
+        measureCardHeight();
+    }
+
+    const listTop = artistsList.getBoundingClientRect().top + window.scrollY;
+    const first = Math.max(0, Math.min(order.length - 1,
+        Math.floor((window.scrollY - listTop) / cardHeight) - OVERSCAN));
+    const last = Math.min(order.length,
+        Math.ceil((window.scrollY + window.innerHeight - listTop) / cardHeight) + OVERSCAN);
+    if (renderedRange && renderedRange[0] === first && renderedRange[1] === last) return;
+
+    renderedRange = [first, last];
+    artistsList.style.paddingTop = (first * cardHeight) + 'px';
+    artistsList.style.paddingBottom = ((order.length - Math.max(last, first + 1)) * cardHeight) + 'px';
+    artistsList.innerHTML = order.slice(first, Math.max(last, first + 1))
+        .map((index, offset) => cardHtml(artists[index], first + offset + 1))
+        .join('');
+}
+
+function scheduleRender() {
+    if (scrollScheduled) return;
+    scrollScheduled = true;
+    requestAnimationFrame(() => {
+        scrollScheduled = false;
+        renderWindow();
+    });
+}
+
+function loadArtistInfo() {
+    if (!artistInfo) {
+        artistInfo = fetch(toplistData.infoFile)
+            .then(response => {
+                if (!response.ok) throw new Error(response.statusText);
+                return response.json();
+            });
+        artistInfo.catch(() => { artistInfo = null; });
+    }
+    return artistInfo;
+}
+
+function openArtistInfo(artist) {
+    detailArtist = artist;
+    openArtistDetail(artist);
+    artistDetailMarkdown.innerHTML = '<p class="text-muted mb-0">Laddar artistinformation...</p>';
+
+    loadArtistInfo()
+        .then(info => {
+            if (detailArtist === artist) showArtistMarkdown(info[artist.id] || '');
+        })
+        .catch(() => {
+            if (detailArtist === artist) {
+                artistDetailMarkdown.innerHTML = '<p class="text-muted mb-0">Artistinformationen kunde inte laddas.</p>';
+            }
+        });
+}
+
+function setupEventListeners() {
+    // Search functionality
+    const searchInput = document.getElementById('searchInput');
+    searchInput.addEventListener('input', handleSearch);
+
+    // Sort buttons
+    const sortButtons = document.querySelectorAll('[data-sort]');
+    sortButtons.forEach(button => {
+        button.addEventListener('click', handleSort);
+    });
+
+    updateSortButtonsState(currentSort, sortDirection);
+
+    // One listener for the detail buttons of every card, rendered or not
+    artistsList.addEventListener('click', function(event) {
+        const button = event.target.closest('.toggle-artist-detail');
+        if (button) {
+            openArtistInfo(artists[parseInt(button.closest('.artist-card').dataset.index)]);
+        }
+    });
+
+    window.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', function() {
+        cardHeight = 0;
+        scheduleRender();
+    });
+}
+
+function handleSearch(e) {
+    searchTerm = e.target.value;
+    updateOrder();
+}
+
+function handleSort(e) {
+    const sortType = e.target.closest('[data-sort]').dataset.sort;
+
+    // Toggle direction if same sort
+    if (currentSort === sortType) {
+        sortDirection = sortDirection === 'asc' ? 'desc' : 'asc';
+    } else {
+        sortDirection = sortType === 'name' ? 'asc' : 'desc';
+    }
+
+    currentSort = sortType;
+    updateSortButtonsState(currentSort, sortDirection);
+    updateOrder();
+}
+
+function updateOrder() {
+    // The search index and the sort orders number the artists in toplist
+    // order, as the data rows are
+    const sorted = sortOrders.order(currentSort, sortDirection);
+    const matches = searchIndex.search(searchTerm);
+    if (matches) {
+        const isMatch = new Uint8Array(artists.length);
+        matches.forEach(index => { isMatch[index] = 1; });
+        order = sorted.filter(index => isMatch[index]);
+    } else {
+        order = sorted.slice();
+    }
+
+    renderedRange = null;
+    renderWindow();
+}
@@ -0,0 +1,210 @@
+// Artist detail modal, artist tips and controls shared by the toplist pages
+const artistDetailModal = document.getElementById('artistDetailModal');
+const artistDetailClose = document.getElementById('artistDetailClose');
+const artistDetailTitle = document.getElementById('artistDetailTitle');
+const artistDetailStats = document.getElementById('artistDetailStats');
+const artistDetailLinks = document.getElementById('artistDetailLinks');
+const artistDetailInfo = document.getElementById('artistDetailInfo');
+const artistDetailMarkdown = document.getElementById('artistDetailMarkdown');
+const artistDetailImageWrap = document.getElementById('artistDetailImageWrap');
+
+if (artistDetailModal && artistDetailModal.parentElement !== document.body) {
+    document.body.appendChild(artistDetailModal);
+}
+
+function showLoading() {
+    document.getElementById('loadingOverlay').style.display = 'flex';
+}
+
+function hideLoading() {
+    document.getElementById('loadingOverlay').style.display = 'none';
+}
+
+function escapeHtml(value) {
+    return String(value === undefined || value === null ? '' : value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+// artist: {name, popularity, followers, addedAt, spotifyUrl, appleMusicLink,
+// youtubeMusicLink, imageUrl, topTracks, markdownInfo}
+function openArtistDetail(artist) {
+    if (!artist || !artistDetailModal) return;
+
+    const artistName = artist.name || 'Artistinformation';
+    const popularity = artist.popularity === undefined || artist.popularity === null ? '' : String(artist.popularity);
+    const followers = artist.followers === undefined || artist.followers === null ? '' : String(artist.followers);
+    const addedAt = artist.addedAt || '';
+    const spotifyLink = artist.spotifyUrl || '';
+    const topTracks = artist.topTracks || [];
+
+    artistDetailTitle.textContent = artistName;
+
+    if (artist.imageUrl) {
+        artistDetailImageWrap.innerHTML = '<img class="artist-detail-hero-image" src="' + escapeHtml(artist.imageUrl) + '" alt="' + escapeHtml(artistName) + '">';
+    } else {
+        artistDetailImageWrap.innerHTML = '<div class="artist-detail-hero-placeholder"><i class="fas fa-user fa-2x" aria-hidden="true"></i></div>';
+    }
+
+    artistDetailStats.innerHTML = ''
+        + '<span class="artist-stat-pill">Aktiv</span>'
+        + (popularity ? '<span class="artist-stat-pill"><i class="fas fa-fire" aria-hidden="true"></i>' + popularity + '% popularitet</span>' : '')
+        + (followers ? '<span class="artist-stat-pill"><i class="fas fa-users" aria-hidden="true"></i>' + followers + ' följare</span>' : '')
+        + (addedAt ? '<span class="artist-stat-pill"><i class="fas fa-calendar" aria-hidden="true"></i>' + addedAt + '</span>' : '');
+
+    const links = [];
+    if (spotifyLink) {
+        links.push('<a class="artist-detail-link spotify" href="' + escapeHtml(spotifyLink) + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-spotify" aria-hidden="true"></i>Spotify</a>');
+    }
+    if (artist.appleMusicLink) {
+        links.push('<a class="artist-detail-link apple" href="' + escapeHtml(artist.appleMusicLink) + '" target="_blank" rel="noopener noreferrer"><i class="fas fa-music" aria-hidden="true"></i>Apple Music</a>');
+    }
+    if (artist.youtubeMusicLink) {
+        links.push('<a class="artist-detail-link youtube" href="' + escapeHtml(artist.youtubeMusicLink) + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-youtube" aria-hidden="true"></i>YouTube Music</a>');
+    }
+    artistDetailLinks.innerHTML = links.join('');
+
+    artistDetailInfo.innerHTML = ''
+        + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-fire" aria-hidden="true"></i>Popularitet</span><span>' + (popularity || 'Okänt') + '</span></div>'
+        + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-users" aria-hidden="true"></i>Följare</span><span>' + (followers || 'Okänt') + '</span></div>'
+        + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-link" aria-hidden="true"></i>Spotify-länk</span><span>' + (spotifyLink ? 'Ja' : 'Nej') + '</span></div>'
+        + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-calendar" aria-hidden="true"></i>Tillagd</span><span>' + (addedAt || 'Okänt') + '</span></div>';
+
+    const topTracksHtml = topTracks.length
+        ? '<div class="artist-top-tracks">'
+            + '<div class="artist-detail-label"><i class="fas fa-music" aria-hidden="true"></i>Fem mest populära låtar</div>'
+            + '<ol class="artist-top-tracks-list">'
+            + topTracks.map(function(track) {
+                const trackName = escapeHtml(track && track.name ? track.name : 'Okänd låt');
+                const trackPopularity = track && track.popularity !== undefined && track.popularity !== null ? track.popularity : 'Okänt';
+                const trackUrl = track && track.url ? String(track.url) : '';
+                const titlePart = trackUrl
+                    ? '<a class="artist-top-track-link" href="' + escapeHtml(trackUrl) + '" target="_blank" rel="noopener noreferrer">' + trackName + '</a>'
+                    : '<span>' + trackName + '</span>';
+                return '<li>' + titlePart + ' <span class="text-muted">(' + trackPopularity + ')</span></li>';
+            }).join('')
+            + '</ol>'
+        + '</div>'
+        : '<div class="artist-top-tracks"><div class="artist-detail-label"><i class="fas fa-music" aria-hidden="true"></i>Fem mest populära låtar</div><p class="text-muted mb-0 mt-2">Inga låtar hittades för artisten.</p></div>';
+
+    artistDetailInfo.innerHTML += topTracksHtml;
+
+    showArtistMarkdown(artist.markdownInfo);
+
+    artistDetailModal.scrollTop = 0;
+    const artistDetailBody = artistDetailModal.querySelector('.artist-detail-body');
+    if (artistDetailBody) {
+        artistDetailBody.scrollTop = 0;
+    }
+
+    artistDetailModal.classList.add('open');
+    artistDetailModal.setAttribute('aria-hidden', 'false');
+    document.body.style.overflow = 'hidden';
+}
+
+function closeArtistDetail() {
+    if (!artistDetailModal) return;
+    artistDetailModal.classList.remove('open');
+    artistDetailModal.setAttribute('aria-hidden', 'true');
+    document.body.style.overflow = '';
+}
+
+function showArtistMarkdown(markdownText) {
+    if (window.marked && typeof window.marked.parse === 'function') {
+        artistDetailMarkdown.innerHTML = markdownText ? window.marked.parse(markdownText) : '<p class="text-muted mb-0">Ingen artistinformation tillagd ännu.</p>';
+    } else {
+        artistDetailMarkdown.textContent = markdownText || 'Ingen artistinformation tillagd ännu.';
+    }
+}
+
+function setupNewArtistTip() {
+    const form = document.getElementById('newArtistTipForm');
+    if (!form) return;
+
+    form.elements.source_url.value = window.location.href;
+    form.addEventListener('submit', async function(event) {
+        event.preventDefault();
+        const formData = new FormData(form);
+
+        try {
+            const response = await fetch('/api/artist-tip', {
+                method: 'POST',
+                body: formData
+            });
+            if (!response.ok) throw new Error('Kunde inte skicka tipset');
+
+            alert('Tack! Ditt tips har skickats.');
+            form.reset();
+            form.elements.source_url.value = window.location.href;
+            form.closest('details').open = false;
+        } catch (error) {
+            const subject = 'Artisttips: ' + (formData.get('artist') || '');
+            const body = [
+                'Artist: ' + (formData.get('artist') || ''),
+                'Koppling till Hälsingland: ' + (formData.get('halsingland_connection') || '-'),
+                'Spotify-länk: ' + (formData.get('spotify_link') || '-'),
+                'Apple Music-länk: ' + (formData.get('apple_music_link') || '-'),
+                'YouTube Music-länk: ' + (formData.get('youtube_music_link') || '-'),
+                'Namn: ' + (formData.get('namn') || ''),
+                'E-post: ' + (formData.get('epost') || ''),
+                'Källa: ' + (formData.get('source_url') || window.location.href),
+                '',
+                'Information:',
+                formData.get('information') || ''
+            ].join('\n');
+            window.location.href = 'mailto:toppen@grodansparadis.com?subject=' + encodeURIComponent(subject) + '&body=' + encodeURIComponent(body);
+        }
+    });
+}
+
+function updateSortButtonsState(sortType, direction) {
+    document.querySelectorAll('[data-sort]').forEach(btn => {
+        const isActive = btn.dataset.sort === sortType;
+        btn.classList.toggle('active', isActive);
+        if (isActive) {
+            btn.setAttribute('data-direction', direction);
+        } else {
+            btn.removeAttribute('data-direction');
+        }
+    });
+}
+
+// Smooth scrolling for internal links
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function (e) {
+        e.preventDefault();
+        const target = document.querySelector(this.getAttribute('href'));
+        if (target) {
+            target.scrollIntoView({ behavior: 'smooth' });
+        }
+    });
+});
+
+// Add loading animation to external links
+document.querySelectorAll('a[target="_blank"]').forEach(link => {
+    link.addEventListener('click', function() {
+        showLoading();
+        setTimeout(hideLoading, 2000);
+    });
+});
+
+if (artistDetailClose) {
+    artistDetailClose.addEventListener('click', closeArtistDetail);
+}
+
+if (artistDetailModal) {
+    artistDetailModal.addEventListener('click', function(event) {
+        if (event.target === artistDetailModal) {
+            closeArtistDetail();
+        }
+    });
+}
+
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        closeArtistDetail();
+    }
+});
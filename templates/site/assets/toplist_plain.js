@@ -0,0 +1,32 @@
+const searchInput = document.getElementById('artistSearch');
+const clearSearchButton = document.getElementById('clearSearch');
+const searchStatus = document.getElementById('searchStatus');
+const artistList = document.querySelector('.artist-list');
+const artistItems = Array.from(document.querySelectorAll('.artist-item'));
+
+function updateSearchStatus(visibleCount) {
+  searchStatus.textContent = 'Visar ' + visibleCount + ' av ' + artistItems.length + ' artister';
+}
+
+// The search index numbers the artists in page order, as the list items are
+const searchArtists = createSearchFilter(loadSearchIndex('searchIndex'), function(item, visible) {
+  artistItems[item].style.display = visible ? 'block' : 'none';
+});
+
+function filterArtists() {
+  updateSearchStatus(searchArtists(searchInput.value).length);
+}
+
+searchInput.addEventListener('input', filterArtists);
+searchInput.addEventListener('keydown', function(event) {
+  if (event.key === 'Escape') {
+    searchInput.value = '';
+    filterArtists();
+  }
+});
+clearSearchButton.addEventListener('click', function() {
+  searchInput.value = '';
+  filterArtists();
+  searchInput.focus();
+});
+updateSearchStatus(artistItems.length);
@@ -0,0 +1,136 @@
+"""
+Data output mode for the toplist.
+
+The card toplist renders every artist as a card whose data attributes carry
+the artist's markdown bio and top tracks, escaped into HTML. The page ends
+up around 1.5 MB and the browser has to build the whole DOM before it
+becomes interactive. In the data mode the page instead carries:
+
+- one compact JSON data island (<script type="application/json">) with the
+  ranking, stats, links and top tracks of every artist, one array row per
+  artist with the columns listed in TOPLIST_FIELDS, and the common Spotify
+  URL prefixes replaced by the short codes in URL_PREFIXES;
+- a virtualized list: the page script renders only the cards in and near
+  the viewport from that data, and search and sort work on the data
+  instead of on DOM nodes, with the same prebuilt search index and sort
+  orders as the card page (see search_index.py and sort_orders.py).
+
+The markdown bios go to a separate <page>-info.json next to the page,
+keyed by artist id, which the page fetches the first time somebody opens
+an artist's detail view.
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Sequence
+
+from renderer import render_page, write_json
+from search_index import build_search_index
+from sort_orders import TOPLIST_SORT_KEYS, build_sort_orders
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Toplist output modes
+TOPLIST_OUTPUT_CARDS = 'cards'
+TOPLIST_OUTPUT_DATA = 'data'
+TOPLIST_OUTPUT_MODES = (TOPLIST_OUTPUT_CARDS, TOPLIST_OUTPUT_DATA)
+
+# Default output mode of the toplist
+TOPLIST_OUTPUT = os.getenv('TOPPEN_TOPLIST_OUTPUT', TOPLIST_OUTPUT_CARDS)
+
+# Columns of a data row: name in the page script and key in the toplist_artists() values
+TOPLIST_FIELDS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('popularity', 'popularity'),
+    ('followers', 'followers'),
+    ('spotifyUrl', 'spotify_url'),
+    ('imageUrl', 'image_url'),
+    ('appleMusicLink', 'apple_music_link'),
+    ('youtubeMusicLink', 'youtube_music_link'),
+    ('addedAt', 'added_at'),
+    ('topTracks', 'top_tracks_json'),
+)
+
+# URL prefixes written as '<code>:' in the data; the page script expands them
+URL_PREFIXES = {
+    'a': 'https://open.spotify.com/artist/',
+    't': 'https://open.spotify.com/track/',
+    'i': 'https://i.scdn.co/image/',
+}
+URL_FIELDS = ('spotifyUrl', 'imageUrl')
+
+
+def shorten_url(url: str) -> str:
+    """Replace a known URL prefix by its code (no URL scheme is one letter long)."""
+    for code, prefix in URL_PREFIXES.items():
+        if url and url.startswith(prefix):
+            return f'{code}:{url[len(prefix):]}'
+    return url
+
+
+def info_file_for(output_file: str) -> str:
+    """Return the path of the artist information file written next to a toplist page."""
+    return f'{os.path.splitext(output_file)[0]}-info.json'
+
+
+def toplist_rows(artists: Sequence[Dict]) -> List[List]:
+    """
+    Build the data rows of the toplist, one per artist in toplist order.
+
+    Top tracks become [name, popularity, url] rows; URLs are shortened
+    with shorten_url().
+
+    Args:
+        artists: Template values of every artist (see web_admin.toplist_artists)
+    """
+    rows = []
+    for artist in artists:
+        row = [
+            shorten_url(artist[key]) if field in URL_FIELDS else artist[key]
+            for field, key in TOPLIST_FIELDS[:-1]
+        ]
+        row.append([
+            [track['name'], track['popularity'], shorten_url(track['url'])]
+            for track in json.loads(artist['top_tracks_json'])
+        ])
+        rows.append(row)
+    return rows
+
+
+def write_toplist_data(artists: Sequence[Dict], output_file: str, **context) -> str:
+    """
+    Write the toplist as a data island page plus its artist information file.
+
+    Args:
+        artists: Template values of every artist, in toplist order
+        output_file: HTML file to write
+        **context: Template variables of the page (list_date, generated_at)
+
+    Returns:
+        output_file
+    """
+    info_file = info_file_for(output_file)
+    write_json(
+        {artist['id']: artist['markdown_info'] for artist in artists if artist['markdown_info']},
+        info_file
+    )
+
+    render_page(
+        'site/toplist_data.html',
+        output_file,
+        toplist_data={
+            'fields': [field for field, _ in TOPLIST_FIELDS],
+            'urlPrefixes': URL_PREFIXES,
+            'artists': toplist_rows(artists),
+            'infoFile': os.path.basename(info_file),
+        },
+        search_index=build_search_index(artists, 'name'),
+        sort_orders=build_sort_orders(artists, TOPLIST_SORT_KEYS),
+        **context
+    )
+
+    logger.info("Wrote %d artists as toplist data to %s", len(artists), output_file)
+    return output_file
@@ -1,15 +1,21 @@
+# usage: python topp_songs.py [--live]
+#
+# Artist names and links are read from the artists table, so the songs list is
+# generated offline. --live looks each artist up on Spotify instead (once per
+# artist) for when the artists table is known to be out of date.
+
 from datetime import date
-import time
-import spotipy
-import sqlite3
+import argparse
 import logging
-from spotipy.oauth2 import SpotifyClientCredentials
 
 # Import our Spotify utilities
 from spotify_utils import (
-    safe_spotify_artist,
-    rate_limit_delay
+    create_spotify_client,
+    safe_spotify_artist
 )
+from database import DB_PATH, connect
+from fragment_cache import fragment_cache
+from renderer import render_page
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,91 +28,65 @@ TBL_POPULARITY = 3
 TBL_ALBUM_TYPE = 4
 TBL_URL = 5
 TBL_RELEASE_DATE = 6
-
-sp = spotipy.Spotify(client_credentials_manager=SpotifyClientCredentials())
-
-con = sqlite3.connect('toppen.sqlite3')
+TBL_ARTIST_NAME = 7
+TBL_ARTIST_LINK = 8
+
+parser = argparse.ArgumentParser(description='Generate songs.html from the tracks table')
+parser.add_argument('--live', action='store_true',
+                    help='Look up artist names and links on Spotify instead of the database')
+args = parser.parse_args()
+
+sp = None
+if args.live:
+  sp = create_spotify_client()
+
+# Live artist lookups, memoized so each artist is fetched once per run
+artist_memo = {}
+
+def live_artist(urn):
+  if urn not in artist_memo:
+    artist = safe_spotify_artist(sp, urn)
+    artist_memo[urn] = (artist['name'], artist['external_urls']['spotify']) if artist else None
+  return artist_memo[urn]
+
+con = connect(DB_PATH, readonly=True)
+
+def song_rows():
+  """Yield the template values of every track in name order"""
+  global idx
+  query = '''SELECT t.id, t.artist_id, t.name, t.popularity, t.album_type, t.url, t.release_date, a.name, a.link
+             FROM tracks t JOIN artists a ON a.id = t.artist_id
+             ORDER BY t.name'''
+  for row in con.execute(query):
+    urn = row[TBL_ARTIST_ID]
+
+    if args.live:
+      artist = live_artist(urn)
+      if not artist:
+        logger.error(f"Failed to get artist data for URN: {urn}")
+        continue
+      artist_name, artist_link = artist
+    else:
+      artist_name, artist_link = row[TBL_ARTIST_NAME], row[TBL_ARTIST_LINK]
+      if not artist_link:
+        logger.error(f"No Spotify link stored for artist URN: {urn}")
+        continue
+
+    idx = idx + 1
+
+    yield {
+      'name': row[TBL_NAME],
+      'url': row[TBL_URL],
+      'album_type': row[TBL_ALBUM_TYPE],
+      'release_date': row[TBL_RELEASE_DATE],
+      'artist_name': artist_name,
+      'artist_link': artist_link,
+    }
 
 print("Topp songs")
-f = open('songs.html', 'w')
-f.write('<html><head>\n') 
-f.write('<!-- Global site tag (gtag.js) - Google Analytics -->')
-f.write('<script async src="https://www.googletagmanager.com/gtag/js?id=G-SNRXECZNJX"></script>')
-f.write('<script>')
-f.write('  window.dataLayer = window.dataLayer || [];')
-f.write('  function gtag(){dataLayer.push(arguments);}')
-f.write("  gtag('js', new Date());")
-f.write('                                 ')
-f.write("  gtag('config', 'G-SNRXECZNJX');")
-f.write('</script>')
-f.write('<meta charset="utf-8"/>\n')
-f.write('<style>\n')
-f.write('  table, th, td {\n')
-f.write('  border: 1px solid black;\n')
-f.write('  padding: 10px;\n')
-f.write('  border-collapse: collapse;}\n')
-f.write('p {\n')
-f.write(' border-bottom:1px dotted;\n')
-f.write(' margin-left:auto;\n')
-f.write(' margin-right:auto;\n')
-f.write(' text-align:left;\n')
-f.write(' width: 60%;\n')
-f.write('}\n')
-f.write('h1 {\n')
-f.write(' text-align:center;\n')
-f.write('}\n')
-f.write('</style>\n')
-f.write('</head><body>\n') 
-f.write('<h1>Topplista Hälsingland - Mest lyssnade spår i alfabetisk ordning</h1>\n')
-
-f.write('<p>Här listas topplistans alla artisters mest lyssnade spår (max tio spår per artist). Eftersom Spotify inte delar antal lysningar per låt listas låtarna i alfabetisk ordning. Spår som finns både som singel och i ett album listas separat om båda är bland de mest avlyssnade.</p>\n')
-
-f.write('<p>Spellista med alla spår finns <a href="https://open.spotify.com/playlist/7zXnbJOPoNFnQmp8JfiwZ4">här</a>.</p>')
-
-f.write('<p><a href="index.html">Gå tillbaks till huvudsida.</a></p>\n')
-
-f.write('<p><table border="1">\n')
-f.write('<tr><th>Track</th><th>Artist</th><th>Info</th></tr>\n')
-
-cur = con.cursor()
-cur_write = con.cursor()
-
-idx = 0;
-for row in cur.execute('SELECT * FROM tracks ORDER BY name'):  
-  urn = row[TBL_ARTIST_ID]
-  
-  print(urn,row[TBL_NAME])
-  
-  # Use safe Spotify call with retry handling
-  artist = safe_spotify_artist(sp, urn)
-  if not artist:
-    logger.error(f"Failed to get artist data for URN: {urn}")
-    continue
-    
-  print(row[TBL_NAME]," - ",artist['name'],",",row[TBL_ALBUM_TYPE],",",row[TBL_RELEASE_DATE],row[TBL_URL])
-  idx = idx + 1
-
-  f.write('<tr><td><a href="')
-  f.write(row[TBL_URL])
-  f.write('" target="main">')
-  f.write(row[TBL_NAME])
-  f.write('</a></td><td><a href="')
-  f.write(artist['external_urls']['spotify'])
-  f.write('" target="main">')
-  f.write(artist['name'])
-  f.write('</a></td><td>')
-  f.write(row[TBL_ALBUM_TYPE])
-  f.write(",")
-  f.write(row[TBL_RELEASE_DATE])
-  f.write('</td></tr>\n')
-
-  # Add rate limiting delay between requests
-  rate_limit_delay()
-
-f.write('</table></p>\n')
-
-f.write('<p>Listan sammanställd av <a href="https://www.akehedman.se/">Åke Hedman</a></p>')
-
-f.write('</body></html>\n') 
-f.close()
-con.close()
\ No newline at end of file
+idx = 0
+render_page('site/songs_table.html', 'songs.html',
+            track_rows=fragment_cache.render('site/cards/song_row.html',
+                                             ({'track': track} for track in song_rows())))
+con.close()
+print(idx, "tracks written to songs.html")
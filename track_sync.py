@@ -0,0 +1,513 @@
+"""
+Concurrent top-tracks synchronization engine.
+
+Spotify top-track requests run on a bounded thread pool while a single
+writer thread applies every database change, so SQLite only ever sees one
+writer. The writer groups finished artists into batches and commits each
+batch in one transaction. All requests share the process-wide Spotify rate
+limiter.
+
+The rows built from each artist's top tracks are hashed and compared with
+the hash stored in artists.tracks_payload_hash; unchanged artists only get
+their fetch time updated and are left out of the run's changed_ids set.
+
+Sync jobs are checkpointed in the sync_jobs and sync_job_artists tables:
+artists are marked done in the same transaction that stores their tracks,
+so an interrupted job can be resumed with only the remaining artists.
+Artists whose fetch failed count as finished, so one artist that always
+fails cannot keep its job open; the next job picks it up again. A job is
+only resumed by a run with the same incremental and cap options.
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from spotify_utils import safe_spotify_artist_top_tracks
+from artist_sync import (
+    load_payload_hashes,
+    payload_hash,
+    select_artists_to_sync,
+    sync_timestamp
+)
+from database import WRITE_BATCH_SIZE, connect, store_artist_tracks
+from migrations import migrate
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of concurrent Spotify requests; the shared rate limiter still caps the request rate
+DEFAULT_SYNC_CONCURRENCY = int(os.getenv('TOPPEN_SYNC_CONCURRENCY', '8'))
+
+# Log progress every N artists
+PROGRESS_INTERVAL = 50
+
+# Longest time the writer waits to fill a batch before committing what it has
+WRITE_BATCH_INTERVAL = 2.0
+
+# Job kind used for top-track sync jobs in the sync_jobs table
+JOB_KIND_TRACKS = 'tracks'
+
+
+def job_options(stale_hours: Optional[float] = None, max_artists: Optional[int] = None) -> str:
+    """Return the artist selection options of a job, as stored in sync_jobs.options."""
+    return json.dumps({'stale_hours': stale_hours, 'max_artists': max_artists}, sort_keys=True)
+
+
+def create_sync_job(conn, kind: str, artists: List[Tuple[str, str]], options: Optional[str] = None) -> int:
+    """
+    Create a checkpointed sync job for the given artists.
+
+    Any older unfinished job of the same kind is marked abandoned.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        kind: Job kind, e.g. JOB_KIND_TRACKS
+        artists: (id, name) of the artists to sync, in order
+        options: Options the artists were selected with, see job_options()
+
+    Returns:
+        The new job id
+    """
+    now = sync_timestamp()
+    with conn:
+        conn.execute(
+            "UPDATE sync_jobs SET status = 'abandoned', finished_at = ? WHERE kind = ? AND status IN ('running', 'interrupted')",
+            [now, kind]
+        )
+        cur = conn.execute(
+            "INSERT INTO sync_jobs (kind, status, started_at, updated_at, total, options) VALUES (?, 'running', ?, ?, ?, ?)",
+            [kind, now, now, len(artists), options]
+        )
+        job_id = cur.lastrowid
+        conn.executemany(
+            'INSERT INTO sync_job_artists (job_id, artist_id, position) VALUES (?, ?, ?)',
+            [(job_id, artist_id, position) for position, (artist_id, _) in enumerate(artists)]
+        )
+    return job_id
+
+
+def get_sync_job(conn, job_id: Optional[int] = None, kind: str = JOB_KIND_TRACKS) -> Optional[Dict]:
+    """
+    Return a sync job with its remaining artist count.
+
+    Failed artists are not remaining: the job is finished once every
+    artist is done or failed.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        job_id: Job to load; defaults to the latest job of the given kind
+        kind: Job kind used when job_id is not given
+
+    Returns:
+        dict with the sync_jobs columns plus 'remaining' and 'failed', or None if there is no job
+    """
+    migrate(conn)
+    columns = ['id', 'kind', 'status', 'started_at', 'updated_at', 'finished_at',
+               'total', 'completed', 'error_count', 'last_artist_id', 'options']
+    query = f'SELECT {", ".join(columns)} FROM sync_jobs'
+    if job_id is not None:
+        row = conn.execute(query + ' WHERE id = ?', [job_id]).fetchone()
+    else:
+        row = conn.execute(query + ' WHERE kind = ? ORDER BY id DESC LIMIT 1', [kind]).fetchone()
+    if not row:
+        return None
+
+    job = dict(zip(columns, tuple(row)))
+    counts = dict(conn.execute(
+        'SELECT status, COUNT(*) FROM sync_job_artists WHERE job_id = ? GROUP BY status', [job['id']]
+    ).fetchall())
+    job['remaining'] = counts.get('pending', 0)
+    job['failed'] = counts.get('failed', 0)
+    return job
+
+
+def find_resumable_job(conn, kind: str = JOB_KIND_TRACKS, options: Optional[str] = None) -> Optional[Dict]:
+    """
+    Return the latest running or interrupted job of the given kind, if any.
+
+    Args:
+        conn: Open sqlite3 connection to the toppen database
+        kind: Job kind
+        options: Only return a job started with these options (see job_options());
+            None returns the job whatever its options
+    """
+    job = get_sync_job(conn, kind=kind)
+    if not job or job['status'] not in ('running', 'interrupted') or job['remaining'] == 0:
+        return None
+    if options is not None and job['options'] != options:
+        return None
+    return job
+
+
+def remaining_job_artists(conn, job_id: int) -> List[Tuple[str, str]]:
+    """Return (id, name) for the artists of a job that are neither done nor failed, in job order."""
+    rows = conn.execute('''
+        SELECT j.artist_id, a.name
+        FROM sync_job_artists j
+        LEFT JOIN artists a ON a.id = j.artist_id
+        WHERE j.job_id = ? AND j.status = 'pending'
+        ORDER BY j.position
+    ''', [job_id]).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+def finish_sync_job(conn, job_id: int) -> Dict:
+    """Mark a job completed, or interrupted if artists remain, and return it."""
+    job = get_sync_job(conn, job_id)
+    status = 'completed' if job['remaining'] == 0 else 'interrupted'
+    now = sync_timestamp()
+    with conn:
+        conn.execute(
+            'UPDATE sync_jobs SET status = ?, updated_at = ?, finished_at = ? WHERE id = ?',
+            [status, now, now if status == 'completed' else None, job_id]
+        )
+    job['status'] = status
+    return job
+
+
+def track_rows_from_payload(artist_id: str, tracks: Dict) -> List[Tuple]:
+    """
+    Map a Spotify top-tracks payload to rows for the tracks table.
+
+    Args:
+        artist_id: Spotify artist id the tracks belong to
+        tracks: Top tracks dict as returned by the Spotify API
+
+    Returns:
+        List of (id, artist_id, name, popularity, album_type, url, release_date) tuples
+    """
+    return [
+        (
+            f"{item['id']}:{artist_id}",
+            artist_id,
+            item['name'],
+            item['popularity'],
+            item['album']['album_type'],
+            item['external_urls']['spotify'],
+            item['album']['release_date'],
+        )
+        for item in tracks.get('tracks', []) if item
+    ]
+
+
+class TrackSyncEngine:
+    """
+    Fetch top tracks for many artists concurrently and store them in the database.
+
+    Args:
+        sp: Spotify client instance
+        db_path: Path to the toppen SQLite database
+        concurrency: Maximum number of Spotify requests in flight
+        country: Market used for the top tracks lookup
+        on_artist_synced: Optional callback(artist_id, track_ids) run by the
+            writer thread after an artist's tracks have been committed
+        write_batch_size: Track rows collected before the writer commits a batch
+    """
+
+    def __init__(
+        self,
+        sp,
+        db_path: str,
+        concurrency: int = DEFAULT_SYNC_CONCURRENCY,
+        country: str = 'SE',
+        on_artist_synced: Optional[Callable[[str, List[str]], None]] = None,
+        write_batch_size: int = WRITE_BATCH_SIZE
+    ):
+        self.sp = sp
+        self.db_path = db_path
+        self.concurrency = max(1, concurrency)
+        self.country = country
+        self.on_artist_synced = on_artist_synced
+        self.write_batch_size = max(1, write_batch_size)
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+        self.job_id = None
+        self._stored_hashes = {}
+
+    def load_artists(
+        self,
+        stale_hours: Optional[float] = None,
+        max_artists: Optional[int] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Return (id, name) for active artists with a Spotify id.
+
+        Args:
+            stale_hours: Incremental mode; only artists whose tracks were fetched
+                longer ago than this many hours (never-fetched artists first)
+            max_artists: Optional cap on the number of artists returned
+        """
+        conn = connect(self.db_path)
+        try:
+            migrate(conn)
+            return select_artists_to_sync(conn, 'tracks_fetched_at', stale_hours, max_artists)
+        finally:
+            conn.close()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _fetch(self, artist_id: str) -> Optional[Dict]:
+        return safe_spotify_artist_top_tracks(self.sp, artist_id, country=self.country)
+
+    def _checkpoint(self, conn, artist_ids: List[str], failed: bool = False):
+        """Record the outcome of several artists in the current job (if any), inside the caller's transaction."""
+        if self.job_id is None or not artist_ids:
+            return
+        conn.executemany(
+            'UPDATE sync_job_artists SET status = ? WHERE job_id = ? AND artist_id = ?',
+            [('failed' if failed else 'done', self.job_id, artist_id) for artist_id in artist_ids]
+        )
+        conn.execute(f'''
+            UPDATE sync_jobs
+            SET {'error_count' if failed else 'completed'} = {'error_count' if failed else 'completed'} + ?,
+                last_artist_id = ?, updated_at = ?
+            WHERE id = ?
+        ''', [len(artist_ids), artist_ids[-1], sync_timestamp(), self.job_id])
+
+    def _next_batch(self) -> Tuple[List[Tuple], bool]:
+        """
+        Collect queued results until the batch holds write_batch_size track rows
+        or WRITE_BATCH_INTERVAL seconds have passed.
+
+        Returns:
+            (items, done) where done is True once the end-of-work marker was seen
+        """
+        items = []
+        row_count = 0
+        deadline = None
+        while row_count < self.write_batch_size:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+            row_count += len(item[2] or [])
+            if deadline is None:
+                deadline = time.monotonic() + WRITE_BATCH_INTERVAL
+        return items, False
+
+    def _write_batch(self, conn, items: List[Tuple]):
+        """Store a batch of artists' tracks and checkpoints in one transaction."""
+        failed = [item[0] for item in items if item[2] is None]
+        synced = {item[0]: item[2] for item in items if item[2] is not None}
+        changed = {item[0]: item[3] for item in items if item[2] is not None and item[4]}
+        fetched_at = sync_timestamp()
+
+        try:
+            with conn:
+                store_artist_tracks(conn, {artist_id: synced[artist_id] for artist_id in changed}, fetched_at)
+                conn.executemany(
+                    'UPDATE artists SET tracks_payload_hash = ? WHERE id = ?',
+                    [(tracks_hash, artist_id) for artist_id, tracks_hash in changed.items()]
+                )
+                conn.executemany(
+                    'UPDATE artists SET tracks_fetched_at = ? WHERE id = ?',
+                    [(fetched_at, artist_id) for artist_id in synced if artist_id not in changed]
+                )
+                self._checkpoint(conn, list(synced))
+                self._checkpoint(conn, failed, failed=True)
+        except sqlite3.Error:
+            if len(items) == 1:
+                artist_id, name = items[0][:2]
+                logger.exception("Failed to store top tracks for %s (%s)", name, artist_id)
+                if artist_id in synced:
+                    self._count('error_count')
+                return
+            # Retry one artist at a time so a single bad row doesn't cost the whole batch
+            for item in items:
+                self._write_batch(conn, [item])
+            return
+
+        with self._stats_lock:
+            self.stats['changed_ids'].update(changed)
+
+        for artist_id, rows in synced.items():
+            self._count('artists_synced')
+            self._count('track_count', len(rows))
+
+            if self.on_artist_synced:
+                try:
+                    self.on_artist_synced(artist_id, [row[0].split(':')[0] for row in rows])
+                except Exception:
+                    logger.exception("on_artist_synced callback failed for %s", artist_id)
+
+    def _writer(self):
+        """Apply queued track updates in batches; the only thread that writes to the database."""
+        conn = connect(self.db_path)
+        try:
+            done = False
+            while not done:
+                items, done = self._next_batch()
+                if items:
+                    self._write_batch(conn, items)
+        finally:
+            conn.close()
+
+    def _collect(self, executor: ThreadPoolExecutor, artists: List[Tuple[str, str]], start: float):
+        """Submit all fetches and hand each result to the writer thread as it completes."""
+        futures = {
+            executor.submit(self._fetch, artist_id): (artist_id, name)
+            for artist_id, name in artists
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            artist_id, name = futures[future]
+            tracks = future.result()
+            if not tracks:
+                logger.error(f"Failed to get top tracks for {name} ({artist_id})")
+                self._count('error_count')
+                self._queue.put((artist_id, name, None, None, False))
+            else:
+                rows = track_rows_from_payload(artist_id, tracks)
+                tracks_hash = payload_hash(sorted(rows))
+                changed = self._stored_hashes.get(artist_id) != tracks_hash
+                self._queue.put((artist_id, name, rows, tracks_hash, changed))
+
+            if done % PROGRESS_INTERVAL == 0:
+                elapsed = time.monotonic() - start
+                logger.info(f"Progress: {done}/{len(artists)} artists fetched ({done / elapsed:.1f} artists/s)")
+
+    def run(
+        self,
+        artists: Optional[List[Tuple[str, str]]] = None,
+        stale_hours: Optional[float] = None,
+        max_artists: Optional[int] = None
+    ) -> Dict:
+        """
+        Synchronize top tracks for the given artists.
+
+        Args:
+            artists: (id, name) tuples; defaults to every active artist, or the
+                stale ones when stale_hours is given
+            stale_hours: Incremental mode, see load_artists()
+            max_artists: Optional cap on the number of artists synced
+
+        Returns:
+            dict: artist_count, artists_synced, track_count, error_count,
+            changed_ids (artists whose top tracks changed), elapsed and
+            artists_per_second
+        """
+        if artists is None:
+            artists = self.load_artists(stale_hours, max_artists)
+
+        self.stats = {
+            'artist_count': len(artists),
+            'artists_synced': 0,
+            'track_count': 0,
+            'error_count': 0,
+            'changed_ids': set(),
+            'elapsed': 0.0,
+            'artists_per_second': 0.0,
+        }
+
+        conn = connect(self.db_path)
+        try:
+            migrate(conn)
+            self._stored_hashes = load_payload_hashes(conn, 'tracks_payload_hash')
+        finally:
+            conn.close()
+
+        logger.info(f"Syncing top tracks for {len(artists)} artists with {self.concurrency} workers...")
+        start = time.monotonic()
+
+        writer = threading.Thread(target=self._writer, name='track-sync-writer', daemon=True)
+        writer.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='track-sync') as executor:
+                try:
+                    self._collect(executor, artists, start)
+                except BaseException:
+                    # Don't start queued fetches when interrupted; finished ones are still written
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        finally:
+            self._queue.put(None)
+            writer.join()
+
+        elapsed = time.monotonic() - start
+        self.stats['elapsed'] = elapsed
+        self.stats['artists_per_second'] = len(artists) / elapsed if elapsed > 0 else 0.0
+
+        logger.info(
+            f"Track sync completed: {self.stats['artists_synced']}/{len(artists)} artists, "
+            f"{self.stats['track_count']} tracks, {len(self.stats['changed_ids'])} artists changed, "
+            f"{self.stats['error_count']} errors "
+            f"in {elapsed:.1f}s ({self.stats['artists_per_second']:.1f} artists/s)"
+        )
+        return self.stats
+
+    def run_job(
+        self,
+        resume: bool = True,
+        stale_hours: Optional[float] = None,
+        max_artists: Optional[int] = None
+    ) -> Dict:
+        """
+        Run a checkpointed sync job, resuming the latest unfinished job if there is one.
+
+        The unfinished job is only resumed when it was started with the same
+        stale_hours and max_artists; otherwise a new job replaces it.
+
+        Args:
+            resume: Continue the latest running or interrupted job instead of starting over
+            stale_hours: Incremental mode, see load_artists()
+            max_artists: Optional cap on the number of artists in the job
+
+        Returns:
+            dict: the run() statistics plus job_id, job_status and remaining
+        """
+        conn = connect(self.db_path)
+        try:
+            migrate(conn)
+
+            options = job_options(stale_hours, max_artists)
+            job = find_resumable_job(conn, JOB_KIND_TRACKS, options) if resume else None
+            if job:
+                job_id = job['id']
+                artists = remaining_job_artists(conn, job_id)
+                with conn:
+                    conn.execute(
+                        "UPDATE sync_jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                        [sync_timestamp(), job_id]
+                    )
+                logger.info(f"Resuming track sync job {job_id}: {len(artists)} of {job['total']} artists remaining")
+            else:
+                artists = select_artists_to_sync(conn, 'tracks_fetched_at', stale_hours, max_artists)
+                job_id = create_sync_job(conn, JOB_KIND_TRACKS, artists, options)
+                logger.info(f"Started track sync job {job_id} for {len(artists)} artists")
+        finally:
+            conn.close()
+
+        self.job_id = job_id
+        try:
+            stats = self.run(artists)
+        finally:
+            self.job_id = None
+            conn = connect(self.db_path)
+            try:
+                job = finish_sync_job(conn, job_id)
+            finally:
+                conn.close()
+
+        stats['job_id'] = job_id
+        stats['job_status'] = job['status']
+        stats['remaining'] = job['remaining']
+        if job['remaining']:
+            logger.info(f"Track sync job {job_id} has {job['remaining']} artists remaining; run again to resume")
+        return stats
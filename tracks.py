@@ -2,47 +2,29 @@
 # https://stackoverflow.com/questions/60958514/spotify-api-authorization-to-create-a-playlist
 # https://medium.com/@ethanj129/building-a-cli-spotify-playlist-generator-using-python-spotipy-3b32b63a25da
 
-# usage: python tracks.py userid
+# usage: python tracks.py userid [--restart] [--dry-run]
 
 import datetime
 import sys
-import time
-import sqlite3
-import spotipy
 import spotipy.util as util
 import logging
-from spotipy.oauth2 import SpotifyClientCredentials
 
-# Import our Spotify utilities
-from spotify_utils import (
-    safe_spotify_artist,
-    safe_spotify_artist_top_tracks,
-    rate_limit_delay
-)
+# Import our Spotify sync utilities
+from spotify_utils import create_spotify_client
+from track_sync import TrackSyncEngine
+from playlist_sync import PlaylistConflictError, sync_playlist
+from database import DB_PATH, connect
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-TBL_ID = 0
-TBL_LINK_AREA = 1
-TBL_NAME = 2
-TBL_POPULARITY = 3
-TBL_FOLLOWERS = 4
-TBL_LINK = 5
-TBL_PICTURE_SMALL = 6
-TBL_PICTURE_LARGE = 7
-TBL_BINACTIVATE = 8
-TBL_NOTE = 9
-
 TOPPEN_ID = '7zXnbJOPoNFnQmp8JfiwZ4'
 
-track_add_lst = []
-
 if len(sys.argv) > 1:
   username = sys.argv[1]
 else:
-  print("Usage: %s username" % (sys.argv[0],))
+  print("Usage: %s username [--restart] [--dry-run]" % (sys.argv[0],))
   sys.exit()
 
 token = util.prompt_for_user_token(
@@ -50,14 +32,9 @@ token = util.prompt_for_user_token(
     scope='playlist-modify-private',     
     redirect_uri="http://localhost:8888/callback"
 )
-sp = spotipy.Spotify(auth=token)
-
-# Remove all tracks from playlist
-try:
-  sp.playlist_replace_items(TOPPEN_ID, track_add_lst)
-except:
-  print("Failed to remove old list items!")
-  exit()
+# No urllib3 retries: a retried POST after a 5xx could add the same tracks twice;
+# sync_playlist checks the playlist before it retries an addition itself
+sp = create_spotify_client(auth=token)
 
 scope = 'playlist-modify-public'
 try:
@@ -78,67 +55,31 @@ except:
 #   else:
 #       playlists = None
 
-con = sqlite3.connect('toppen.sqlite3')
+con = connect(DB_PATH)
 
 #for album in albums:
 #  print(album['name'])
 
-cur = con.cursor()
-cur_write = con.cursor()
+# Fetch top tracks for all active artists concurrently; one writer thread stores them.
+# The sync is checkpointed: an interrupted run is resumed where it stopped unless --restart is given
+engine = TrackSyncEngine(sp, DB_PATH)
+stats = engine.run_job(resume='--restart' not in sys.argv)
+if stats['remaining']:
+  print("Track sync job %s has %s artists remaining, run again to resume" % (stats['job_id'], stats['remaining']))
 
-for row in cur.execute('SELECT * FROM artists WHERE bInactivate = 0 OR bInactivate IS NULL ORDER BY name,id'):
-  
-  # Get artist id
-  urn = row[TBL_ID]
-
-  # Use safe Spotify calls with retry handling
-  artist = safe_spotify_artist(sp, urn)
-  if not artist:
-    logger.error(f"Failed to get artist data for URN: {urn}")
-    continue
-  
-  # Get top tracks for artist
-  tracks = safe_spotify_artist_top_tracks(sp, urn)
-  if not tracks:
-    logger.error(f"Failed to get top tracks for {artist['name']} (URN: {urn})")
-    continue
-
-  track_items = [item for item in tracks.get('tracks', []) if item]
-  track_add_lst = [item['id'] for item in track_items]
-
-  try:
-    with con:
-      cur_write.execute('DELETE FROM tracks WHERE artist_id = ?', [urn])
-      for item in track_items:
-        cur_write.execute('''
-          INSERT INTO tracks (id, artist_id, name, popularity, album_type, url, release_date)
-          VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', [
-          f"{item['id']}:{urn}",
-          urn,
-          item['name'],
-          item['popularity'],
-          item['album']['album_type'],
-          item['external_urls']['spotify'],
-          item['album']['release_date']
-        ])
-  except sqlite3.Error as er:
-    logger.error("Failed to store tracks for %s: %s", artist['name'], er)
-    continue
-
-  # Add tracks to playlist -  pp['id']
-  if (len(track_add_lst) > 0):
-    try:
-      sp.user_playlist_add_tracks(username, TOPPEN_ID, track_add_lst, position=None)
-    except Exception as error:
-      print("* * * * * * * ------> Failed to add tracks to playlist " + list_name + " for " + artist['name'] + " - '" + item['name'] + "'")
-      logger.error("Failed to add tracks to playlist: %s", error)
-      #print(pp['id'])
-      print(track_add_lst, len(track_add_lst))
-      continue
-
-  # Add rate limiting delay between artists
-  rate_limit_delay()
+# Update the playlist with only the tracks that changed. The desired set comes from
+# the tracks table, so artists synced in an earlier (resumed) run are included too
+try:
+  result = sync_playlist(sp, con, TOPPEN_ID, dry_run='--dry-run' in sys.argv)
+  print("Playlist %s: %s tracks removed, %s tracks added (%s wanted)" % (list_name, result['removed'], result['added'], result['desired']))
+except PlaylistConflictError as error:
+  print("* * * * * * * ------> Playlist " + list_name + " is being edited by someone else, try again later")
+  logger.error("Playlist sync conflict: %s", error)
+except Exception as error:
+  print("* * * * * * * ------> Failed to update playlist " + list_name)
+  logger.error("Failed to update playlist: %s", error)
+
+con.close()
 
 # try:
 #   print(track_add_lst)
@@ -6,8 +6,6 @@ A Flask-based web interface for managing the artists and tracks database.
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
 import sqlite3
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from spotipy.exceptions import SpotifyException
 from datetime import datetime, date
 from email.message import EmailMessage
@@ -20,11 +18,36 @@ from threading import Lock, Thread
 
 # Import our Spotify utilities
 from spotify_utils import (
+    create_spotify_client,
     spotify_request_with_retry,
     safe_spotify_artist,
-    safe_spotify_artist_top_tracks,
-    safe_spotify_search,
-    rate_limit_delay
+    safe_spotify_search
+)
+from artist_sync import DEFAULT_STALE_HOURS, refresh_artists_from_spotify
+from track_sync import TrackSyncEngine, find_resumable_job, get_sync_job
+from config import ITEMS_PER_PAGE
+from database import DB_PATH, get_connection, load_top_tracks, release_connection
+from fragment_cache import fragment_cache
+from generate_random_artist_list import OUTPUT_FILE as RANDOM_ARTIST_FILE, generate_random_artist_list
+from migrations import migrate
+from pagination import fetch_page
+from parallel_render import RENDER_PROCESSES, ParallelRenderer
+from pipeline import STATUS_FAILED, STATUS_SKIPPED, Pipeline, Step
+from precompress import PRECOMPRESS, precompress_outputs
+from renderer import TEMPLATE_DIR, enable_template_auto_reload, render_page
+from search_index import SearchIndex
+from sort_orders import SONG_SORT_KEYS, TOPLIST_SORT_KEYS, SortOrders
+from static_assets import ASSET_DIR, STATIC_ASSETS, asset_manifest, build_assets
+from song_shards import SONGS_OUTPUT, SONGS_OUTPUT_SHARDED, SONGS_SHARD_DIR, SONGS_SHARD_SIZE, write_sharded_songs
+from toplist_data import TOPLIST_OUTPUT, TOPLIST_OUTPUT_DATA, info_file_for, write_toplist_data
+from search import (
+    DEFAULT_SEARCH_LIMIT,
+    artist_rank_join,
+    fts_available,
+    fts_query,
+    search_artists,
+    search_tracks,
+    track_search_clause
 )
 
 app = Flask(__name__)
@@ -37,105 +60,80 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database path
-DB_PATH = 'toppen.sqlite3'
-
 # Initialize Spotify client
 sp = None
 try:
-    sp = spotipy.Spotify(
-        client_credentials_manager=SpotifyClientCredentials(),
-        retries=0,
-        status_retries=0,
-    )
+    sp = create_spotify_client()
     logger.info("Spotify client initialized successfully")
 except Exception as e:
     logger.warning(f"Spotify credentials not configured: {e}. Some features may not work.")
 
 sync_tracks_lock = Lock()
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Columns the artist and track list templates render
+ARTIST_LIST_COLUMNS = (
+    'a.id, a.name, a.popularity, a.followers, a.link, a.picture_small, '
+    'a.apple_music_link, a.youtube_music_link, a.bInactivate, a.markdown_info'
+)
+TRACK_LIST_COLUMNS = (
+    't.id, t.artist_id, t.name, t.popularity, t.album_type, t.url, t.release_date, '
+    'a.name AS artist_name'
+)
+
+def get_db_connection(readonly=False):
+    """
+    Get this thread's pooled database connection.
+    
+    The connection is returned to the pool when the request ends, so routes
+    that return early without closing it don't leak it.
+    
+    Args:
+        readonly: Use the read-only connection (never takes a write lock)
+    """
+    return get_connection(DB_PATH, readonly=readonly)
+
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Return the request's database connections to the pool"""
+    release_connection()
 
 
-def sync_tracks_from_spotify():
-    """Fetch Spotify top tracks for all active artists and store them in the database."""
+def sync_tracks_from_spotify(stale_hours=None, resume=True):
+    """
+    Fetch Spotify top tracks for active artists and store them in the database.
+    
+    Args:
+        stale_hours: Only sync artists whose tracks are older than this many hours (None syncs all)
+        resume: Continue the latest interrupted sync job instead of starting a new one
+    """
     if not sync_tracks_lock.acquire(blocking=False):
         logger.warning("Track synchronization is already running")
         return
 
     try:
-        _sync_tracks_from_spotify()
+        _sync_tracks_from_spotify(stale_hours, resume)
     finally:
+        release_connection()
         sync_tracks_lock.release()
 
 
-def _sync_tracks_from_spotify():
-    """Run one Spotify track synchronization job."""
+def _sync_tracks_from_spotify(stale_hours=None, resume=True):
+    """Run one checkpointed Spotify track synchronization job."""
     if not sp:
         logger.error("Spotify client is not configured; cannot sync tracks")
         return
 
-    conn = get_db_connection()
     try:
-        artist_rows = conn.execute(
-            'SELECT * FROM artists WHERE bInactivate = 0 OR bInactivate IS NULL ORDER BY name, id'
-        ).fetchall()
-
-        track_count = 0
-        error_count = 0
-
-        for row in artist_rows:
-            urn = row['id']
-
-            artist = safe_spotify_artist(sp, urn)
-            if not artist:
-                logger.error(f"Failed to get artist data for {urn}")
-                error_count += 1
-                continue
-
-            tracks = safe_spotify_artist_top_tracks(sp, urn)
-            if not tracks:
-                logger.error(f"Failed to get top tracks for {urn}")
-                error_count += 1
-                continue
-
-            track_items = [item for item in tracks.get('tracks', []) if item]
-            try:
-                with conn:
-                    conn.execute('DELETE FROM tracks WHERE artist_id = ?', [urn])
-                    for item in track_items:
-                        conn.execute('''
-                            INSERT INTO tracks (id, artist_id, name, popularity, album_type, url, release_date)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', [
-                            f"{item['id']}:{urn}",
-                            urn,
-                            item['name'],
-                            item['popularity'],
-                            item['album']['album_type'],
-                            item['external_urls']['spotify'],
-                            item['album']['release_date']
-                        ])
-                track_count += len(track_items)
-            except sqlite3.Error:
-                logger.exception("Failed to store top tracks for %s", urn)
-                error_count += 1
-
-            rate_limit_delay()
-
+        stats = TrackSyncEngine(sp, DB_PATH).run_job(resume=resume, stale_hours=stale_hours)
         logger.info(
-            "Synced %s tracks from Spotify with %s errors",
-            track_count,
-            error_count,
+            "Synced %s tracks from Spotify with %s errors (%s artists remaining)",
+            stats['track_count'],
+            stats['error_count'],
+            stats['remaining'],
         )
     except Exception:
         logger.exception("Error syncing tracks from Spotify")
-    finally:
-        conn.close()
 
 
 def send_artist_tip_email(
@@ -189,66 +187,17 @@ def send_artist_tip_email(
         smtp.send_message(message)
 
 def init_database():
-    """Initialize database tables if they don't exist"""
+    """Create or upgrade the database schema through the versioned migrations"""
     conn = get_db_connection()
-    
-    # Create artists table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS "artists" (
-            "id"    TEXT UNIQUE,
-            "link_to_area"  INTEGER,
-            "name"  TEXT,
-            "popularity"    INTEGER,
-            "followers"     INTEGER,
-            "link"  TEXT,
-            "picture_small" TEXT,
-            "picture_large" INTEGER,
-            "bInactivate"   INTEGER,
-            "notes" INTEGER
-        )
-    ''')
-
-    # Ensure artists table has added_at column for tracking when artists were added
-    artist_columns = [row[1] for row in conn.execute('PRAGMA table_info(artists)').fetchall()]
-    if 'added_at' not in artist_columns:
-        conn.execute('ALTER TABLE artists ADD COLUMN added_at TEXT')
-    if 'markdown_info' not in artist_columns:
-        conn.execute('ALTER TABLE artists ADD COLUMN markdown_info TEXT')
-    if 'apple_music_link' not in artist_columns:
-        conn.execute('ALTER TABLE artists ADD COLUMN apple_music_link TEXT')
-    if 'youtube_music_link' not in artist_columns:
-        conn.execute('ALTER TABLE artists ADD COLUMN youtube_music_link TEXT')
-    
-    # Create tracks table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS "tracks" (
-            "id"    TEXT,
-            "artist_id"     TEXT,
-            "name"  TEXT,
-            "popularity"    INTEGER,
-            "album_type"    TEXT,
-            "url"   TEXT,
-            "release_date"  TEXT,
-            PRIMARY KEY("id")
-        )
-    ''')
-    
-    # Create area table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS "area" (
-            "id"    INTEGER UNIQUE,
-            "Name"  TEXT,
-            PRIMARY KEY("id" AUTOINCREMENT)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 @app.route('/')
 def index():
     """Main dashboard"""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
     
     # Get statistics
     artist_count = conn.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
@@ -273,35 +222,61 @@ def index():
 
 @app.route('/artists')
 def artists():
-    """List all artists"""
-    conn = get_db_connection()
+    """List artists, one keyset-paginated page at a time"""
+    conn = get_db_connection(readonly=True)
     
     # Get search and filter parameters
     search = request.args.get('search', '').strip()
     show_inactive = request.args.get('show_inactive', 'false') == 'true'
-    sort_by = request.args.get('sort', 'popularity')
+    sort_by = request.args.get('sort', 'relevance')
     order = request.args.get('order', 'desc')
     
-    # Build query
-    query = 'SELECT * FROM artists WHERE 1=1'
+    # Build query; names and bios are searched through the FTS5 index when available
+    use_fts = bool(search) and fts_available(conn) and fts_query(search) is not None
+    from_where = 'FROM artists a'
     params = []
     
-    if search:
-        query += ' AND name LIKE ? COLLATE NOCASE'
-        params.append(f'%{search}%')
-    
-    if not show_inactive:
-        query += ' AND (bInactivate = 0 OR bInactivate IS NULL)'
+    if use_fts:
+        join, join_params = artist_rank_join(search)
+        from_where += f' {join}'
+        params.extend(join_params)
+    from_where += ' WHERE 1=1'
     
-    # Add sorting
-    if sort_by in ['name', 'popularity', 'followers']:
-        query += f' ORDER BY {sort_by} {order.upper()}'
+    if search and not use_fts:
+        from_where += ' AND (a.name LIKE ? COLLATE NOCASE OR a.markdown_info LIKE ? COLLATE NOCASE)'
+        params.extend([f'%{search}%', f'%{search}%'])
     
-    artists_list = conn.execute(query, params).fetchall()
+    if not show_inactive:
+        from_where += ' AND (a.bInactivate = 0 OR a.bInactivate IS NULL)'
+    
+    # Sort keys end with the unique id; relevance needs a search and otherwise means popularity
+    descending = order != 'asc'
+    if sort_by == 'relevance' and use_fts:
+        keys = [('artist_match.rank', False), ('COALESCE(a.popularity, 0)', True)]
+    elif sort_by == 'name':
+        keys = [("COALESCE(a.name, '')", descending)]
+    elif sort_by == 'followers':
+        keys = [('COALESCE(a.followers, 0)', descending)]
+    else:
+        keys = [('COALESCE(a.popularity, 0)', descending)]
+    keys.append(('a.id', descending))
+    
+    page = fetch_page(
+        conn,
+        ARTIST_LIST_COLUMNS,
+        from_where,
+        params,
+        keys,
+        ITEMS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
     conn.close()
     
     return render_template('artists.html', 
-                         artists=artists_list,
+                         artists=page['rows'],
+                         next_cursor=page['next_cursor'],
+                         prev_cursor=page['prev_cursor'],
                          search=search,
                          show_inactive=show_inactive,
                          sort_by=sort_by,
@@ -434,10 +409,13 @@ def edit_artist(artist_id):
             return render_template('edit_artist.html', artist=artist)
         
         try:
+            # Forgetting the stored payload hash lets the next refresh overwrite the
+            # Spotify fields again, as it did before refreshes skipped unchanged artists
             conn.execute('''
                 UPDATE artists 
                 SET name = ?, popularity = ?, followers = ?, link_to_area = ?, link = ?, 
-                    apple_music_link = ?, youtube_music_link = ?, picture_small = ?, picture_large = ?, added_at = ?, markdown_info = ?, bInactivate = ?
+                    apple_music_link = ?, youtube_music_link = ?, picture_small = ?, picture_large = ?, added_at = ?, markdown_info = ?, bInactivate = ?,
+                    spotify_payload_hash = NULL
                 WHERE id = ?
             ''', [
                 name,
@@ -493,49 +471,68 @@ def delete_artist(artist_id):
 
 @app.route('/tracks')
 def tracks():
-    """List all tracks"""
-    conn = get_db_connection()
+    """List tracks, one keyset-paginated page at a time"""
+    conn = get_db_connection(readonly=True)
     
     # Get search and filter parameters
     search = request.args.get('search', '').strip()
     artist_filter = request.args.get('artist', '').strip()
-    sort_by = request.args.get('sort', 'popularity')
+    sort_by = request.args.get('sort', 'relevance')
     order = request.args.get('order', 'desc')
+    use_fts = bool(search) and fts_available(conn) and fts_query(search) is not None
     
     # Build query with JOIN to get artist name
-    query = '''
-        SELECT t.*, a.name as artist_name 
-        FROM tracks t 
-        LEFT JOIN artists a ON t.artist_id = a.id 
-        WHERE 1=1
-    '''
+    from_where = 'FROM tracks t LEFT JOIN artists a ON t.artist_id = a.id'
     params = []
     
+    if sort_by == 'relevance' and use_fts:
+        # Relevance puts track-name matches before artist-name matches
+        from_where += (
+            ' LEFT JOIN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?) track_match'
+            ' ON track_match.rowid = t.search_id'
+        )
+        params.append(fts_query(search))
+    from_where += ' WHERE 1=1'
+    
     if search:
-        query += ' AND (t.name LIKE ? COLLATE NOCASE OR a.name LIKE ? COLLATE NOCASE)'
-        params.extend([f'%{search}%', f'%{search}%'])
+        clause, clause_params = track_search_clause(search, use_fts)
+        from_where += f' AND {clause}'
+        params.extend(clause_params)
     
     if artist_filter:
-        query += ' AND a.name LIKE ? COLLATE NOCASE'
+        from_where += ' AND a.name LIKE ? COLLATE NOCASE'
         params.append(f'%{artist_filter}%')
     
-    # Add sorting
-    if sort_by in ['name', 'popularity', 'release_date', 'artist_name']:
-        if sort_by == 'artist_name':
-            query += f' ORDER BY a.name {order.upper()}'
-        else:
-            query += f' ORDER BY t.{sort_by} {order.upper()}'
-    
-    tracks_list = conn.execute(query, params).fetchall()
-    
-    # Get all artists for filter dropdown
-    artists_list = conn.execute('SELECT DISTINCT name FROM artists ORDER BY name').fetchall()
-    
+    # Sort keys end with the unique id
+    descending = order != 'asc'
+    if sort_by == 'relevance' and use_fts:
+        keys = [('track_match.rowid IS NULL', False), ('COALESCE(t.popularity, 0)', True)]
+    elif sort_by == 'artist_name':
+        keys = [("COALESCE(a.name, '')", descending)]
+    elif sort_by == 'name':
+        keys = [("COALESCE(t.name, '')", descending)]
+    elif sort_by == 'release_date':
+        keys = [("COALESCE(t.release_date, '')", descending)]
+    else:
+        keys = [('COALESCE(t.popularity, 0)', descending)]
+    keys.append(('t.id', descending))
+    
+    page = fetch_page(
+        conn,
+        TRACK_LIST_COLUMNS,
+        from_where,
+        params,
+        keys,
+        ITEMS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
     conn.close()
     
     return render_template('tracks.html', 
-                         tracks=tracks_list,
-                         artists=artists_list,
+                         tracks=page['rows'],
+                         next_cursor=page['next_cursor'],
+                         prev_cursor=page['prev_cursor'],
                          search=search,
                          artist_filter=artist_filter,
                          sort_by=sort_by,
@@ -575,6 +572,11 @@ def edit_track(track_id):
                 SET name = ?, popularity = ?, album_type = ?, url = ?, release_date = ?
                 WHERE id = ?
             ''', [name, popularity, album_type, url, release_date, track_id])
+            # Forget the stored payload hash so the next sync rewrites this artist's tracks
+            conn.execute(
+                'UPDATE artists SET tracks_payload_hash = NULL WHERE id = (SELECT artist_id FROM tracks WHERE id = ?)',
+                [track_id]
+            )
             conn.commit()
             
             flash(f'Track "{name}" updated successfully!', 'success')
@@ -598,6 +600,11 @@ def delete_track(track_id):
         return redirect(url_for('tracks'))
     
     try:
+        # Forget the stored payload hash so the next sync restores this artist's tracks
+        conn.execute(
+            'UPDATE artists SET tracks_payload_hash = NULL WHERE id = (SELECT artist_id FROM tracks WHERE id = ?)',
+            [track_id]
+        )
         conn.execute('DELETE FROM tracks WHERE id = ?', [track_id])
         conn.commit()
         
@@ -609,6 +616,29 @@ def delete_track(track_id):
     conn.close()
     return redirect(url_for('tracks'))
 
+@app.route('/api/search')
+def api_search():
+    """Search the local catalog (artists, tracks or both) for live search boxes"""
+    query = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'all')
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_SEARCH_LIMIT)), 1), 100)
+    except ValueError:
+        limit = DEFAULT_SEARCH_LIMIT
+    
+    results = {'query': query, 'artists': [], 'tracks': []}
+    if not query:
+        return jsonify(results)
+    
+    conn = get_db_connection(readonly=True)
+    if search_type in ('all', 'artists'):
+        results['artists'] = search_artists(conn, query, limit=limit)
+    if search_type in ('all', 'tracks'):
+        results['tracks'] = search_tracks(conn, query, limit=limit)
+    conn.close()
+    
+    return jsonify(results)
+
 @app.route('/api/search_spotify')
 def search_spotify():
     """Search Spotify for artists"""
@@ -695,56 +725,20 @@ def generate_toplist():
     """Generate HTML toplist (same as ht.py)"""
     if request.method == 'POST':
         update_spotify = request.form.get('update_spotify') == 'on'
+        incremental = request.form.get('incremental') == 'on'
         
         try:
             # Update artist data from Spotify if requested
             if update_spotify and sp:
                 conn = get_db_connection()
-                cur = conn.cursor()
-                
-                update_count = 0
-                error_count = 0
-                for row in cur.execute('SELECT * FROM artists ORDER BY id'):
-                    urn = row['id']
-                    
-                    # Use safe Spotify artist call with retry handling
-                    artist = safe_spotify_artist(sp, urn)
-                    if not artist:
-                        logger.error(f"Failed to get artist data for {urn}")
-                        error_count += 1
-                        continue
-                    
-                    print(f"Updating: {artist['name']}")
-                    
-                    if row['bInactivate'] != 0:
-                        continue
-                        
-                    name = artist['name'].replace('"', "''")
-                    popularity = artist['popularity']
-                    followers = artist['followers']['total']
-                    link = artist['external_urls']['spotify']
-                    picture_small = ""
-                    picture_large = ""
-                    
-                    if len(artist['images']) > 0:
-                        picture_large = artist['images'][0]['url']
-                    if len(artist['images']) > 1:
-                        picture_small = artist['images'][1]['url']
-                    
-                    conn.execute('''
-                        UPDATE artists 
-                        SET name = ?, popularity = ?, followers = ?, link = ?, 
-                            picture_small = ?, picture_large = ?
-                        WHERE id = ?
-                    ''', [name, popularity, followers, link, picture_small, picture_large, urn])
-                    
-                    update_count += 1
-                    
-                    # Add small delay between requests to be respectful
-                    rate_limit_delay()
-                
-                conn.commit()
-                conn.close()
+                try:
+                    refresh = refresh_artists_from_spotify(
+                        conn, sp, stale_hours=DEFAULT_STALE_HOURS if incremental else None
+                    )
+                finally:
+                    conn.close()
+                update_count = refresh['update_count']
+                error_count = refresh['error_count']
                 
                 if error_count > 0:
                     flash(f'Updated {update_count} artists from Spotify. {error_count} errors encountered.', 'warning')
@@ -769,6 +763,7 @@ def generate_toplist():
     return render_template('generate_toplist.html', 
                          artist_count=artist_count,
                          active_artists=active_artists,
+                         stale_hours=DEFAULT_STALE_HOURS,
                          spotify_configured=sp is not None)
 
 @app.route('/generate/songs', methods=['POST'])
@@ -792,99 +787,33 @@ def generate_all():
     """Generate all lists (toplist and songs) in one run"""
     if request.method == 'POST':
         update_spotify = request.form.get('update_spotify') == 'on'
-        
-        results = {
-            'toplist_file': None,
-            'songs_file': None,
-            'update_count': 0,
-            'error_count': 0,
-            'errors': []
-        }
+        incremental = request.form.get('incremental') == 'on'
         
         try:
             logger.info("Starting batch generation of all lists...")
-            
-            # Step 1: Update artist data from Spotify if requested
-            if update_spotify and sp:
-                logger.info("Updating artist data from Spotify...")
-                conn = get_db_connection()
-                cur = conn.cursor()
-                
-                for row in cur.execute('SELECT * FROM artists ORDER BY id'):
-                    urn = row['id']
-                    
-                    # Use safe Spotify artist call with retry handling
-                    artist = safe_spotify_artist(sp, urn)
-                    if not artist:
-                        logger.error(f"Failed to get artist data for {urn}")
-                        results['error_count'] += 1
-                        results['errors'].append(f"Failed to update artist {urn}")
-                        continue
-                    
-                    print(f"Updating: {artist['name']}")
-                    
-                    if row['bInactivate'] != 0:
-                        continue
-                        
-                    name = artist['name'].replace('"', "''")
-                    popularity = artist['popularity']
-                    followers = artist['followers']['total']
-                    link = artist['external_urls']['spotify']
-                    picture_small = ""
-                    picture_large = ""
-                    
-                    if len(artist['images']) > 0:
-                        picture_large = artist['images'][0]['url']
-                    if len(artist['images']) > 1:
-                        picture_small = artist['images'][1]['url']
-                    
-                    conn.execute('''
-                        UPDATE artists 
-                        SET name = ?, popularity = ?, followers = ?, link = ?, 
-                            picture_small = ?, picture_large = ?
-                        WHERE id = ?
-                    ''', [name, popularity, followers, link, picture_small, picture_large, urn])
-                    
-                    results['update_count'] += 1
-                    
-                    # Add small delay between requests to be respectful
-                    rate_limit_delay()
-                
-                conn.commit()
-                conn.close()
-                logger.info(f"Updated {results['update_count']} artists from Spotify")
-            
-            # Step 2: Generate HTML toplist
-            logger.info("Generating HTML toplist...")
-            logger.info("Toplist uses DB-only mode (no Spotify API calls during static generation)")
-            try:
-                results['toplist_file'] = generate_html_toplist()
-                logger.info(f"Toplist generated: {results['toplist_file']}")
-            except Exception as e:
-                error_msg = f"Error generating toplist: {str(e)}"
-                logger.error(error_msg)
-                results['errors'].append(error_msg)
-                results['error_count'] += 1
-            
-            # Step 3: Generate HTML songs list
-            logger.info("Generating HTML songs list...")
-            try:
-                results['songs_file'] = generate_html_songs()
-                logger.info(f"Songs list generated: {results['songs_file']}")
-            except Exception as e:
-                error_msg = f"Error generating songs list: {str(e)}"
-                logger.error(error_msg)
-                results['errors'].append(error_msg)
-                results['error_count'] += 1
+            results = run_generation_pipeline(
+                update_spotify=update_spotify and sp is not None,
+                sync_tracks=request.form.get('sync_tracks') == 'on' and sp is not None,
+                match_links=request.form.get('match_links') == 'on',
+                include_random_artist_list=request.form.get('include_random_artist_list') == 'on',
+                stale_hours=DEFAULT_STALE_HOURS if incremental else None,
+                force=request.form.get('force') == 'on'
+            )
             
             # Prepare success/error messages
             success_messages = []
-            if results['toplist_file']:
-                success_messages.append(f"HTML toplist generated: {results['toplist_file']}")
-            if results['songs_file']:
-                success_messages.append(f"HTML songs list generated: {results['songs_file']}")
+            for step, key, label in (
+                ('toplist', 'toplist_file', 'HTML toplist'),
+                ('songs', 'songs_file', 'HTML songs list'),
+                ('random_artist_list', 'random_artist_file', 'Random artist list'),
+            ):
+                if results[key]:
+                    state = 'up to date' if step in results['skipped'] else 'generated'
+                    success_messages.append(f"{label} {state}: {results[key]}")
             if results['update_count'] > 0:
                 success_messages.append(f"Updated {results['update_count']} artists from Spotify")
+            if results['track_count'] > 0:
+                success_messages.append(f"Synced {results['track_count']} tracks from Spotify")
             
             # Flash messages based on results
             if success_messages:
@@ -922,6 +851,7 @@ def generate_all():
                          artist_count=artist_count,
                          active_artists=active_artists,
                          track_count=track_count,
+                         stale_hours=DEFAULT_STALE_HOURS,
                          spotify_configured=sp is not None)
 
 @app.route('/sync/tracks', methods=['GET', 'POST'])
@@ -935,7 +865,16 @@ def sync_tracks():
             if sync_tracks_lock.locked():
                 flash('En låtsynkronisering körs redan.', 'warning')
             else:
-                Thread(target=sync_tracks_from_spotify, daemon=True).start()
+                incremental = request.form.get('incremental') == 'on'
+                resume = request.form.get('action', 'resume') != 'restart'
+                Thread(
+                    target=sync_tracks_from_spotify,
+                    kwargs={
+                        'stale_hours': DEFAULT_STALE_HOURS if incremental else None,
+                        'resume': resume,
+                    },
+                    daemon=True,
+                ).start()
                 flash('Synkronisering startade i bakgrunden. Du kan lämna sidan medan jobbet körs.', 'success')
             
         except Exception as e:
@@ -947,13 +886,27 @@ def sync_tracks():
     conn = get_db_connection()
     artist_count = conn.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
     track_count = conn.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
-    estimated_time = max(1, artist_count // 10)  # Rough estimate
+    estimated_time = max(1, artist_count // 600)  # Rough estimate: ~10 artists/s with concurrent fetches
+    
+    # A job left 'running' by a previous process is resumable once no sync is active
+    last_job = get_sync_job(conn)
+    sync_running = sync_tracks_lock.locked()
+    if last_job and last_job['status'] == 'running' and not sync_running:
+        last_job['status'] = 'interrupted'
+    resumable_job = None if sync_running else find_resumable_job(conn)
+    if resumable_job:
+        # Resuming needs the job's own options, so preselect its incremental choice
+        options = json.loads(resumable_job['options'] or '{}')
+        resumable_job['incremental'] = options.get('stale_hours') is not None
     conn.close()
     
     return render_template('sync_tracks.html',
                          artist_count=artist_count,
                          track_count=track_count,
                          estimated_time=estimated_time,
+                         last_job=last_job,
+                         resumable_job=resumable_job,
+                         stale_hours=DEFAULT_STALE_HOURS,
                          spotify_configured=sp is not None)
 
 @app.route('/download/<filename>')
@@ -964,1975 +917,386 @@ def download_file(filename):
     flash('File not found', 'error')
     return redirect(url_for('generate_menu'))
 
-def generate_html_toplist(output_file=None):
-    """Generate modern, interactive HTML toplist file"""
+def toplist_artists(conn):
+    """Yield the template values of every active artist in toplist order"""
+    # Top tracks for every artist in one query instead of one query per artist
+    top_tracks_by_artist = load_top_tracks(conn)
+    
+    for row in conn.execute('SELECT * FROM artists WHERE bInactivate = 0 OR bInactivate IS NULL ORDER BY popularity DESC, followers DESC, name COLLATE NOCASE, id'):
+        # Always use database values during static generation to avoid long Spotify rate-limit stalls.
+        yield {
+            'id': row['id'],
+            'name': row['name'],
+            'popularity': row['popularity'] or 0,
+            'followers': row['followers'] or 0,
+            'spotify_url': row['link'] or '#',
+            'image_url': row['picture_small'] or '',
+            'apple_music_link': (row['apple_music_link'] or '').strip(),
+            'youtube_music_link': (row['youtube_music_link'] or '').strip(),
+            'markdown_info': (row['markdown_info'] or '').strip(),
+            'added_at': (row['added_at'] or '').strip(),
+            'top_tracks_json': json.dumps(top_tracks_by_artist.get(row['id'], []), ensure_ascii=False),
+        }
+
+def generate_html_toplist(output_file=None, parallel=None, output_mode=TOPLIST_OUTPUT):
+    """
+    Generate modern, interactive HTML toplist file
+    
+    Args:
+        output_file: HTML file to write (defaults to topplista-<today>.html)
+        parallel: Optional ParallelRenderer; the artists then come from its
+            read snapshot and the cards are rendered in its process pool
+        output_mode: 'cards' renders every artist card into the page; 'data'
+            writes a JSON data island rendered by the browser (see toplist_data.py)
+    """
     filename = output_file or f'topplista-{date.today()}.html'
     
-    conn = get_db_connection()
+    conn = None
+    if parallel:
+        artists, cards = parallel.load(toplist_artists), parallel
+    else:
+        conn = get_db_connection()
+        # Optional artist columns are guaranteed by the schema migrations
+        migrate(conn)
+        artists, cards = toplist_artists(conn), fragment_cache
     
-    # Check for optional columns
-    artist_columns = [row[1] for row in conn.execute("PRAGMA table_info(artists)").fetchall()]
-    has_apple_music_link = "apple_music_link" in artist_columns
-    has_youtube_music_link = "youtube_music_link" in artist_columns
-    has_markdown_info = "markdown_info" in artist_columns
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(f'''<!DOCTYPE html>
-<html lang="sv">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <title>Hälsingetoppen - Topplista {date.today()}</title>
-    
-    <!-- Google tag (gtag.js) -->
-    <script async src="https://www.googletagmanager.com/gtag/js?id=UA-69888-1"></script>
-    <script>
-        window.dataLayer = window.dataLayer || [];
-        function gtag(){{dataLayer.push(arguments);}}
-        gtag("js", new Date());
-        gtag("config", "UA-69888-1");
-    </script>
-    
-    <!-- Bootstrap CSS -->
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
-    <!-- Font Awesome -->
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-    <!-- DataTables CSS -->
-    <link href="https://cdn.datatables.net/1.13.7/css/dataTables.bootstrap5.min.css" rel="stylesheet">
-    
-    <style>
-        body {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }}
-        
-        .main-container {{
-            background: rgba(255, 255, 255, 0.95);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            margin: 2rem auto;
-            padding: 2rem;
-        }}
-        
-        .header-section {{
-            text-align: center;
-            margin-bottom: 3rem;
-            padding: 2rem 0;
-            background: linear-gradient(135deg, #ff6b6b, #feca57);
-            border-radius: 15px;
-            color: white;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-        }}
-        
-        .artist-card {{
-            background: white;
-            border-radius: 15px;
-            box-shadow: 0 8px 25px rgba(0,0,0,0.1);
-            transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-            border: none;
-            overflow: hidden;
-            margin-bottom: 1rem;
-        }}
-        
-        .artist-card:hover {{
-            transform: translateY(-5px);
-            box-shadow: 0 15px 40px rgba(0,0,0,0.15);
-        }}
-        
-        .position-badge {{
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            font-weight: bold;
-            font-size: 1.2rem;
-            padding: 0.8rem;
-            text-align: center;
-            min-width: 60px;
-        }}
-        
-        .artist-image {{
-            width: 80px;
-            height: 80px;
-            border-radius: 50%;
-            object-fit: cover;
-            border: 3px solid #fff;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.2);
-        }}
-        
-        .artist-info {{
-            flex-grow: 1;
-            padding: 1rem;
-        }}
-        
-        .artist-name {{
-            font-size: 1.3rem;
-            font-weight: 700;
-            color: #2c3e50;
-            margin-bottom: 0.5rem;
-            text-decoration: none;
-        }}
-
-        .artist-name-trigger {{
-            appearance: none;
-            border: 0;
-            background: transparent;
-            padding: 0;
-            text-align: left;
-            cursor: pointer;
-            color: #2c3e50;
-            font-size: 1.3rem;
-            font-weight: 700;
-            margin-bottom: 0.5rem;
-            text-decoration: none;
-        }}
-
-        .artist-name-trigger:hover {{
-            color: #667eea;
-            text-decoration: underline;
-        }}
-        
-        .artist-name:hover {{
-            color: #667eea;
-            text-decoration: none;
-        }}
-        
-        .stats-container {{
-            display: flex;
-            gap: 1rem;
-            flex-wrap: wrap;
-        }}
-        
-        .stat-item {{
-            background: linear-gradient(135deg, #74b9ff, #0984e3);
-            color: white;
-            padding: 0.5rem 1rem;
-            border-radius: 25px;
-            font-size: 0.9rem;
-            font-weight: 600;
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-        }}
-        
-        .popularity-stat {{ background: linear-gradient(135deg, #fd79a8, #e84393); }}
-        .followers-stat {{ background: linear-gradient(135deg, #fdcb6e, #e17055); }}
-        
-        .controls-section {{
-            background: white;
-            padding: 1.5rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }}
-
-        .new-artist-tip {{
-            margin-top: 1rem;
-        }}
-
-        .new-artist-tip summary {{
-            display: inline-flex;
-            align-items: center;
-            gap: 0.5rem;
-            padding: 0.75rem 1.25rem;
-            border-radius: 25px;
-            background: #0d6efd;
-            color: white;
-            font-weight: 600;
-            cursor: pointer;
-            list-style: none;
-        }}
-
-        .new-artist-tip summary::-webkit-details-marker {{
-            display: none;
-        }}
-
-        .new-artist-tip summary:hover {{
-            background: #0b5ed7;
-        }}
-
-        .new-artist-tip-form {{
-            margin-top: 1rem;
-            padding-top: 1rem;
-            border-top: 1px solid #dee2e6;
-        }}
-        
-        .search-box {{
-            border: 2px solid #e9ecef;
-            border-radius: 25px;
-            padding: 0.75rem 1.5rem;
-            transition: all 0.3s ease;
-        }}
-        
-        .search-box:focus {{
-            border-color: #667eea;
-            box-shadow: 0 0 0 0.2rem rgba(102, 126, 234, 0.25);
-        }}
-        
-        .btn-custom {{
-            border-radius: 25px;
-            padding: 0.75rem 1.5rem;
-            font-weight: 600;
-            transition: all 0.3s ease;
-            border: none;
-        }}
-        
-        .btn-sort {{
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            gap: 0.35rem;
-        }}
-        
-        .btn-sort:hover {{
-            background: linear-gradient(135deg, #764ba2, #667eea);
-            transform: translateY(-2px);
-            color: white;
-        }}
-        
-        .btn-sort:active,
-        .btn-sort.touching {{
-            transform: translateY(0) scale(0.95);
-        }}
-        
-        /* Touch-friendly improvements */
-        @media (hover: none) and (pointer: coarse) {{
-            .btn {{
-                min-height: 44px;
-                padding: 0.75rem 1rem;
-            }}
-            
-            .artist-card {{
-                cursor: default;
-            }}
-            
-            .search-box {{
-                min-height: 44px;
-                font-size: 16px; /* Prevents zoom on iOS */
-            }}
-        }}
-        
-        /* Prevent text selection on touch devices */
-        .btn, .artist-card {{
-            -webkit-touch-callout: none;
-            -webkit-user-select: none;
-            -khtml-user-select: none;
-            -moz-user-select: none;
-            -ms-user-select: none;
-            user-select: none;
-        }}
-        
-        /* Better touch feedback */
-        .artist-card:active {{
-            transform: scale(0.98);
-            transition: transform 0.1s ease;
-        }}
-
-        .btn-sort.active {{
-            background: linear-gradient(135deg, #fd79a8, #e84393);
-            box-shadow: 0 0 0 2px rgba(232, 67, 147, 0.25);
-        }}
-
-        .btn-sort.active::after {{
-            display: inline-block;
-            font-size: 1.2rem;
-            line-height: 1;
-        }}
-
-        .btn-sort.active[data-direction="asc"]::after {{
-            content: "↑";
-        }}
-
-        .btn-sort.active[data-direction="desc"]::after {{
-            content: "↓";
-        }}
-        
-        .info-btn {{
-            background: linear-gradient(135deg, #74b9ff, #0984e3);
-            border: none;
-            color: #fff;
-            font-weight: 700;
-            border-radius: 50%;
-            width: 32px;
-            height: 32px;
-            padding: 0;
-            cursor: pointer;
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 0.9rem;
-            margin-left: 0.5rem;
-        }}
-        
-        .info-btn:hover {{
-            background: linear-gradient(135deg, #0984e3, #74b9ff);
-            transform: scale(1.1);
-        }}
-        
-        .artist-info-panel {{
-            display: none;
-            margin-top: 1rem;
-            border-top: 1px solid #e5e5e5;
-            padding-top: 1rem;
-        }}
-        
-        .artist-info-panel.open {{
-            display: block;
-        }}
-        
-        .artist-info-content {{
-            background: #f8f9fa;
-            border: 1px solid #e5e5e5;
-            border-radius: 10px;
-            padding: 1rem;
-            color: #333;
-            font-size: 0.95rem;
-            line-height: 1.6;
-        }}
-        
-        .artist-info-content p {{
-            margin-bottom: 0.75rem;
-        }}
-        
-        .artist-info-content p:last-child {{
-            margin-bottom: 0;
-        }}
-        
-        .artist-info-content a {{
-            color: #667eea;
-        }}
-
-        .artist-detail-modal {{
-            display: none;
-            position: fixed;
-            inset: 0;
-            z-index: 3000;
-            background: rgba(15, 23, 42, 0.72);
-            padding: 1rem;
-            overflow-y: auto;
-        }}
-
-        .artist-detail-modal.open {{
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }}
-
-        .artist-detail-shell {{
-            width: 100%;
-            max-width: 1100px;
-            max-height: calc(100vh - 2rem);
-            margin: 0 auto;
-            background: #fff;
-            border-radius: 20px;
-            box-shadow: 0 24px 60px rgba(0,0,0,0.28);
-            overflow: hidden;
-            display: flex;
-            flex-direction: column;
-        }}
-
-        .artist-detail-hero {{
-            padding: 1.5rem;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: #fff;
-        }}
-
-        .artist-detail-hero-row {{
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            gap: 1rem;
-            flex-wrap: wrap;
-        }}
-
-        .artist-detail-hero-main {{
-            display: flex;
-            align-items: center;
-            gap: 1rem;
-            flex-wrap: wrap;
-        }}
-
-        .artist-detail-hero-image, .artist-detail-hero-placeholder {{
-            width: 92px;
-            height: 92px;
-            border-radius: 50%;
-            object-fit: cover;
-            border: 3px solid rgba(255,255,255,0.4);
-            background: rgba(255,255,255,0.12);
-            flex-shrink: 0;
-        }}
-
-        .artist-detail-hero-placeholder {{
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-        }}
-
-        .artist-detail-title {{
-            margin: 0 0 0.4rem 0;
-            font-size: 2rem;
-            font-weight: 800;
-        }}
-
-        .artist-detail-stats {{
-            display: flex;
-            flex-wrap: wrap;
-            gap: 0.5rem;
-        }}
-
-        .artist-stat-pill {{
-            display: inline-flex;
-            align-items: center;
-            gap: 0.35rem;
-            background: rgba(255,255,255,0.16);
-            color: #fff;
-            border-radius: 999px;
-            padding: 0.4rem 0.75rem;
-            font-size: 0.9rem;
-            font-weight: 700;
-        }}
-
-        .artist-detail-close {{
-            border: 0;
-            background: rgba(255,255,255,0.18);
-            color: #fff;
-            border-radius: 999px;
-            width: 42px;
-            height: 42px;
-            font-size: 1.25rem;
-            cursor: pointer;
-            flex-shrink: 0;
-        }}
-
-        .artist-detail-close:hover {{
-            background: rgba(255,255,255,0.3);
-        }}
-
-        .artist-detail-body {{
-            flex: 1 1 auto;
-            padding: 1.5rem;
-            overflow-y: auto;
-            min-height: 0;
-        }}
-
-        .artist-detail-grid {{
-            display: grid;
-            grid-template-columns: minmax(0, 1fr) minmax(0, 1fr);
-            gap: 1rem;
-        }}
-
-        .artist-detail-card {{
-            border: 1px solid #e9ecef;
-            border-radius: 16px;
-            background: #fff;
-            box-shadow: 0 8px 24px rgba(0,0,0,0.05);
-            overflow: hidden;
-        }}
-
-        .artist-detail-card-header {{
-            padding: 0.9rem 1rem;
-            background: #f8f9fa;
-            border-bottom: 1px solid #e9ecef;
-            font-weight: 800;
-            color: #2c3e50;
-        }}
-
-        .artist-detail-card-body {{
-            padding: 1rem;
-        }}
-
-        .artist-detail-row {{
-            display: flex;
-            justify-content: space-between;
-            gap: 1rem;
-            align-items: center;
-            padding: 0.75rem 0;
-            border-bottom: 1px solid #f1f3f5;
-        }}
-
-        .artist-detail-row:last-child {{
-            border-bottom: 0;
-            padding-bottom: 0;
-        }}
-
-        .artist-detail-label {{
-            font-weight: 700;
-            color: #495057;
-            display: inline-flex;
-            align-items: center;
-            gap: 0.35rem;
-        }}
-
-        .artist-detail-markdown {{
-            background: #fafafa;
-            border: 1px solid #e9ecef;
-            border-radius: 12px;
-            padding: 1rem;
-            line-height: 1.55;
-            color: #333;
-            min-height: 120px;
-        }}
-
-        .artist-top-tracks {{
-            margin-top: 1rem;
-            padding-top: 1rem;
-            border-top: 1px solid #f1f3f5;
-        }}
-
-        .artist-top-tracks-list {{
-            margin: 0.6rem 0 0;
-            padding-left: 1.25rem;
-        }}
-
-        .artist-top-tracks-list li {{
-            margin-bottom: 0.35rem;
-        }}
-
-        .artist-top-track-link {{
-            color: #0d6efd;
-            text-decoration: none;
-        }}
-
-        .artist-top-track-link:hover {{
-            text-decoration: underline;
-        }}
-
-        .artist-detail-links {{
-            display: flex;
-            flex-wrap: wrap;
-            gap: 0.5rem;
-            margin-top: 1rem;
-        }}
-
-        .artist-detail-link {{
-            display: inline-flex;
-            align-items: center;
-            gap: 0.35rem;
-            border-radius: 999px;
-            padding: 0.45rem 0.85rem;
-            text-decoration: none;
-            font-weight: 700;
-            border: 1px solid transparent;
-        }}
-
-        .artist-detail-link.spotify {{
-            background: #1db954;
-            color: #fff;
-        }}
-
-        .artist-detail-link.spotify:hover {{
-            background: #18a449;
-        }}
-
-        .artist-detail-link.apple {{
-            background: #111;
-            color: #fff;
-        }}
-
-        .artist-detail-link.youtube {{
-            background: #ff0000;
-            color: #fff;
-        }}
-
-        .artist-detail-link.youtube:hover {{
-            background: #d80000;
-        }}
-
-        .artist-detail-link.secondary {{
-            background: #f8f9fa;
-            color: #222;
-            border-color: #dee2e6;
-        }}
-
-        .artist-detail-link.secondary:hover {{
-            background: #eef2f6;
-        }}
-
-        @media (max-width: 768px) {{
-            .artist-detail-grid {{
-                grid-template-columns: 1fr;
-            }}
-            .artist-detail-title {{
-                font-size: 1.5rem;
-            }}
-        }}
-        
-        .music-links {{
-            display: flex;
-            flex-wrap: wrap;
-            gap: 0.5rem;
-            align-items: center;
-        }}
-
-        .footer-section {{
-            text-align: center;
-            margin-top: 3rem;
-            padding: 2rem;
-            background: rgba(255,255,255,0.1);
-            border-radius: 15px;
-        }}
-        
-        .loading-overlay {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0,0,0,0.8);
-            display: none;
-            justify-content: center;
-            align-items: center;
-            z-index: 9999;
-        }}
-        
-        .loading-spinner {{
-            width: 50px;
-            height: 50px;
-            border: 5px solid #f3f3f3;
-            border-top: 5px solid #667eea;
-            border-radius: 50%;
-            animation: spin 1s linear infinite;
-        }}
-        
-        @keyframes spin {{
-            0% {{ transform: rotate(0deg); }}
-            100% {{ transform: rotate(360deg); }}
-        }}
-        
-        @media (max-width: 768px) {{
-            .main-container {{ 
-                margin: 0.5rem; 
-                padding: 0.5rem; 
-            }}
-            .artist-card {{ 
-                margin-bottom: 0.5rem; 
-                padding: 0.75rem;
-            }}
-            .stats-container {{ 
-                flex-direction: column; 
-                gap: 0.5rem;
-            }}
-            .stat-item {{
-                font-size: 0.9rem;
-                padding: 0.4rem 0.8rem;
-            }}
-            .artist-name {{
-                font-size: 1.1rem;
-                line-height: 1.3;
-            }}
-            .artist-image {{
-                width: 50px;
-                height: 50px;
-            }}
-            .position-badge {{
-                width: 35px;
-                height: 35px;
-                font-size: 0.9rem;
-            }}
-            .btn {{
-                font-size: 0.9rem;
-                padding: 0.5rem 1rem;
-            }}
-            .search-container {{
-                margin-bottom: 1rem;
-            }}
-            .search-container input {{
-                font-size: 1rem;
-                padding: 0.75rem;
-            }}
-            .alert {{
-                font-size: 0.9rem;
-                padding: 1rem;
-            }}
-            .header-section h1 {{
-                font-size: 1.8rem;
-            }}
-            .header-section h2 {{
-                font-size: 1.3rem;
-            }}
-        }}
-        
-        @media (max-width: 480px) {{
-            .main-container {{ 
-                margin: 0.25rem; 
-                padding: 0.25rem; 
-            }}
-            .artist-card {{
-                padding: 0.5rem;
-            }}
-            .artist-name {{
-                font-size: 1rem;
-            }}
-            .artist-image {{
-                width: 40px;
-                height: 40px;
-            }}
-            .position-badge {{
-                width: 30px;
-                height: 30px;
-                font-size: 0.8rem;
-            }}
-            .stats-container {{
-                gap: 0.25rem;
-            }}
-            .stat-item {{
-                font-size: 0.8rem;
-                padding: 0.3rem 0.6rem;
-            }}
-            .btn {{
-                font-size: 0.8rem;
-                padding: 0.4rem 0.8rem;
-            }}
-            .header-section h1 {{
-                font-size: 1.5rem;
-            }}
-            .header-section h2 {{
-                font-size: 1.1rem;
-            }}
-            .col-12 .btn {{
-                margin-bottom: 0.5rem;
-                display: block;
-                width: 100%;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="loading-overlay" id="loadingOverlay">
-        <div class="loading-spinner"></div>
-    </div>
-
-    <div class="container-fluid">
-        <div class="main-container">
-            <!-- Header -->
-            <div class="header-section">
-                <h1><i class="fas fa-trophy me-3"></i>Hälsingetoppen</h1>
-                <h2>Topplista {date.today()}</h2>
-                <p class="mb-0">De populäraste artisterna från Hälsingland</p>
-            </div>
-
-            <!-- Description -->
-            <div class="row mb-4">
-                <div class="col-12">
-                    <div class="alert alert-info">
-                        <h5><i class="fas fa-info-circle me-2"></i>Om topplistan</h5>
-                        <p class="mb-2">Topplista med artister från Hälsingland baserad på Spotifys 
-                        <a href="https://community.spotify.com/t5/Content-Questions/Artist-popularity/td-p/4415259" target="_blank">popularitets index (0-100)</a> 
-                        som är konstruerat utifrån hur mycket en artists alla låtar är spelade över tid.</p>
-                        
-                        <p class="mb-2">Artister som har samma popularitet är i sin tur ordnade i antal följare. 
-                        Vill du att din favoritartist skall komma högre upp på den här listan så följ artisten och 
-                        spela artistens musik. Svårare än så är det inte.</p>
-                        
-                        <p class="mb-0">Artisterna som är med har någon form av koppling till Hälsingland. 
-                        Saknar du en artist? Skicka artistens Spotifylänk till 
-                        <a href="mailto:akhe@grodansparadis.com">akhe@grodansparadis.com</a> 
-                        och tala om vilken koppling artisten har till Hälsingland.</p>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Navigation Links -->
-            <div class="row mb-4">
-                <div class="col-12 text-center">
-                    <a href="songs.html" class="btn btn-custom btn-sort me-2">
-                        <i class="fas fa-music me-2"></i>Visa alla låtar
-                    </a>
-                    <a href="https://open.spotify.com/playlist/7zXnbJOPoNFnQmp8JfiwZ4" target="_blank" class="btn btn-custom btn-sort">
-                        <i class="fab fa-spotify me-2"></i>Spotify Spellista
-                    </a>
-                </div>
-            </div>
-
-            <!-- Controls -->
-            <div class="controls-section">
-                <div class="row align-items-center">
-                    <div class="col-md-6">
-                        <div class="input-group">
-                            <span class="input-group-text"><i class="fas fa-search"></i></span>
-                            <input type="text" class="form-control search-box" id="searchInput" placeholder="Sök artist...">
-                        </div>
-                    </div>
-                    <div class="col-md-6">
-                        <div class="btn-group w-100" role="group">
-                            <button type="button" class="btn btn-custom btn-sort active" data-sort="position">
-                                <i class="fas fa-trophy me-1"></i>Position
-                            </button>
-                            <button type="button" class="btn btn-custom btn-sort" data-sort="name">
-                                <i class="fas fa-sort-alpha-up me-1"></i>Namn
-                            </button>
-                            <button type="button" class="btn btn-custom btn-sort" data-sort="popularity">
-                                <i class="fas fa-fire me-1"></i>Popularitet
-                            </button>
-                            <button type="button" class="btn btn-custom btn-sort" data-sort="followers">
-                                <i class="fas fa-users me-1"></i>Följare
-                            </button>
-                        </div>
-                    </div>
-                </div>
-                <details class="new-artist-tip">
-                    <summary><i class="fas fa-user-plus" aria-hidden="true"></i>Tipsa om ny artist</summary>
-                    <form id="newArtistTipForm" class="new-artist-tip-form" action="/api/artist-tip" method="post">
-                        <div class="row g-3">
-                            <div class="col-md-6">
-                                <label for="tipArtist" class="form-label">Artistens namn</label>
-                                <input id="tipArtist" class="form-control" type="text" name="artist" required>
-                            </div>
-                            <div class="col-md-6">
-                                <label for="tipConnection" class="form-label">Koppling till Hälsingland</label>
-                                <input id="tipConnection" class="form-control" type="text" name="halsingland_connection" required>
-                            </div>
-                            <div class="col-md-4">
-                                <label for="tipSpotify" class="form-label">Spotify-länk</label>
-                                <input id="tipSpotify" class="form-control" type="url" name="spotify_link" placeholder="https://open.spotify.com/artist/...">
-                            </div>
-                            <div class="col-md-4">
-                                <label for="tipApple" class="form-label">Apple Music-länk</label>
-                                <input id="tipApple" class="form-control" type="url" name="apple_music_link" placeholder="https://music.apple.com/...">
-                            </div>
-                            <div class="col-md-4">
-                                <label for="tipYoutube" class="form-label">YouTube Music-länk</label>
-                                <input id="tipYoutube" class="form-control" type="url" name="youtube_music_link" placeholder="https://music.youtube.com/...">
-                            </div>
-                            <div class="col-md-6">
-                                <label for="tipName" class="form-label">Ditt namn</label>
-                                <input id="tipName" class="form-control" type="text" name="namn" required>
-                            </div>
-                            <div class="col-md-6">
-                                <label for="tipEmail" class="form-label">Din e-post</label>
-                                <input id="tipEmail" class="form-control" type="email" name="epost" required>
-                            </div>
-                            <div class="col-12">
-                                <label for="tipInformation" class="form-label">Information om artisten</label>
-                                <textarea id="tipInformation" class="form-control" name="information" rows="4" required></textarea>
-                            </div>
-                        </div>
-                        <input type="hidden" name="source_url" value="">
-                        <button type="submit" class="btn btn-primary mt-3"><i class="fas fa-paper-plane me-1" aria-hidden="true"></i>Skicka tips</button>
-                    </form>
-                </details>
-            </div>
-
-            <!-- Artists List -->
-            <div id="artistsList">
-''')
-        
-        cnt = 1
-        for row in conn.execute('SELECT * FROM artists WHERE bInactivate = 0 OR bInactivate IS NULL ORDER BY popularity DESC, followers DESC'):
-            # Always use database values during static generation to avoid long Spotify rate-limit stalls.
-            name = row['name']
-            popularity = row['popularity'] or 0
-            followers = row['followers'] or 0
-            spotify_url = row['link'] or '#'
-            image_url = row['picture_small'] or ''
-            
-            # Get optional music links from database
-            apple_music_link = ""
-            youtube_music_link = ""
-            markdown_info = ""
-            added_at = ""
-            if has_apple_music_link:
-                apple_music_link = (row['apple_music_link'] or "").strip()
-            if has_youtube_music_link:
-                youtube_music_link = (row['youtube_music_link'] or "").strip()
-            if has_markdown_info:
-                markdown_info = (row['markdown_info'] or "").strip()
-            if 'added_at' in row.keys():
-                added_at = (row['added_at'] or "").strip()
-
-            top_tracks_rows = conn.execute('''
-                SELECT name, popularity, url
-                FROM tracks
-                WHERE artist_id = ?
-                ORDER BY popularity DESC, name COLLATE NOCASE ASC
-                LIMIT 5
-            ''', [row['id']]).fetchall()
-            top_tracks = [
-                {
-                    'name': track_row['name'] or 'Okänd låt',
-                    'popularity': track_row['popularity'] if track_row['popularity'] is not None else 0,
-                    'url': track_row['url'] or ''
-                }
-                for track_row in top_tracks_rows
-            ]
-            
-            # Build music links HTML
-            music_links_html = f'<a href="{spotify_url}" target="_blank" class="btn btn-sm btn-success me-1 spotify-btn"><i class="fab fa-spotify me-1"></i>Spotify</a>'
-            if apple_music_link:
-                music_links_html += f'<a href="{apple_music_link}" target="_blank" class="btn btn-sm btn-dark me-1 apple-music-btn"><i class="fab fa-apple me-1"></i>Apple Music</a>'
-            if youtube_music_link:
-                music_links_html += f'<a href="{youtube_music_link}" target="_blank" class="btn btn-sm btn-danger me-1 youtube-music-btn"><i class="fab fa-youtube me-1"></i>YouTube</a>'
-            
-            # Escape markdown for safe HTML embedding
-            markdown_info_escaped = markdown_info.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
-            top_tracks_json = json.dumps(top_tracks, ensure_ascii=False)
-            top_tracks_json_escaped = top_tracks_json.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
-            
-            f.write(f'''                <div class="artist-card" id="artist-card-{cnt}" data-position="{cnt}" data-name="{name.lower()}" data-name-display="{name}" data-spotify-id="{row['id']}" data-popularity="{popularity}" data-followers="{followers}" data-added-at="{added_at if has_markdown_info else ''}" data-markdown-info="{markdown_info_escaped or 'Ingen information tillgänglig ännu.'}" data-top-tracks="{top_tracks_json_escaped}" data-spf-link="{spotify_url}">
-                    <div class="d-flex align-items-center">
-                        <div class="position-badge">
-                            <span class="position-number">#{cnt}</span>
-                        </div>
-                        <div class="p-3">
-                            {f'<img src="{image_url}" alt="{name}" class="artist-image">' if image_url else f'<div class="artist-image bg-light d-flex align-items-center justify-content-center"><i class="fas fa-user fa-2x text-muted"></i></div>'}
-                        </div>
-                        <div class="artist-info flex-grow-1">
-                            <div class="d-flex align-items-center mb-1">
-                                <button type="button" class="artist-name-trigger toggle-artist-detail">{name}</button>
-                                <button type="button" class="info-btn toggle-artist-detail ms-2" aria-label="Visa artistinfo" title="Visa artistinfo"><i class="fas fa-info"></i></button>
-                            </div>
-                            <div class="stats-container mb-2">
-                                <div class="stat-item popularity-stat">
-                                    <i class="fas fa-fire"></i>
-                                    <span>{popularity}% popularitet</span>
-                                </div>
-                                <div class="stat-item followers-stat">
-                                    <i class="fas fa-users"></i>
-                                    <span>{followers:,} följare</span>
-                                </div>
-                            </div>
-                            <div class="music-links">
-                                {music_links_html}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-''')
-            cnt += 1
-        
-        f.write('''            </div>
-
-            <div id="artistDetailModal" class="artist-detail-modal" aria-hidden="true">
-                <div class="artist-detail-shell" role="dialog" aria-modal="true" aria-labelledby="artistDetailTitle">
-                    <div class="artist-detail-hero">
-                        <div class="artist-detail-hero-row">
-                            <div class="artist-detail-hero-main">
-                                <div id="artistDetailImageWrap" class="artist-detail-hero-placeholder"><i class="fas fa-user fa-2x" aria-hidden="true"></i></div>
-                                <div>
-                                    <h2 id="artistDetailTitle" class="artist-detail-title"></h2>
-                                    <div id="artistDetailStats" class="artist-detail-stats"></div>
-                                    <div id="artistDetailLinks" class="artist-detail-links"></div>
-                                </div>
-                            </div>
-                            <button type="button" class="artist-detail-close" id="artistDetailClose" aria-label="Stäng">&times;</button>
-                        </div>
-                    </div>
-                    <div class="artist-detail-body">
-                        <div class="artist-detail-grid">
-                            <section class="artist-detail-card">
-                                <div class="artist-detail-card-header">Artistinformation</div>
-                                <div class="artist-detail-card-body" id="artistDetailInfo"></div>
-                            </section>
-                            <section class="artist-detail-card">
-                                <div class="artist-detail-card-header">Om artisten</div>
-                                <div class="artist-detail-card-body">
-                                    <div id="artistDetailMarkdown" class="artist-detail-markdown"></div>
-                                </div>
-                            </section>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-''')
-
-        f.write(f'''            <!-- Footer -->
-            <div class="footer-section">
-                <p class="mb-2"><strong>Listan uppdateras varje fredag</strong></p>
-                <p class="mb-0">Listan sammanställd av <a href="https://www.akehedman.se/" target="_blank">Åke Hedman</a></p>
-                <p class="small text-muted mt-2">Genererad {datetime.now().strftime("%Y-%m-%d %H:%M")}</p>
-            </div>
-        </div>
-    </div>
-
-    <!-- Scripts -->
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
-    
-    <script>
-        // Application state
-        let currentSort = 'position';
-        let sortDirection = 'asc';
-        let artists = [];
-        const artistDetailModal = document.getElementById('artistDetailModal');
-        const artistDetailClose = document.getElementById('artistDetailClose');
-        const artistDetailTitle = document.getElementById('artistDetailTitle');
-        const artistDetailStats = document.getElementById('artistDetailStats');
-        const artistDetailLinks = document.getElementById('artistDetailLinks');
-        const artistDetailInfo = document.getElementById('artistDetailInfo');
-        const artistDetailMarkdown = document.getElementById('artistDetailMarkdown');
-        const artistDetailImageWrap = document.getElementById('artistDetailImageWrap');
-
-        if (artistDetailModal && artistDetailModal.parentElement !== document.body) {{
-            document.body.appendChild(artistDetailModal);
-        }}
-
-        // Initialize
-        document.addEventListener('DOMContentLoaded', function() {{
-            initializeArtists();
-            setupEventListeners();
-            setupInfoButtons();
-            setupNewArtistTip();
-            hideLoading();
-        }});
-
-        function showLoading() {{
-            document.getElementById('loadingOverlay').style.display = 'flex';
-        }}
-
-        function hideLoading() {{
-            document.getElementById('loadingOverlay').style.display = 'none';
-        }}
-
-        function initializeArtists() {{
-            const artistCards = document.querySelectorAll('.artist-card');
-            artists = Array.from(artistCards).map(card => ({{
-                element: card,
-                position: parseInt(card.dataset.position),
-                name: card.dataset.name,
-                popularity: parseInt(card.dataset.popularity),
-                followers: parseInt(card.dataset.followers)
-            }}));
-        }}
-        
-        function openArtistDetail(card) {{
-            if (!card || !artistDetailModal) return;
-
-            function escapeHtml(value) {{
-                return String(value || '')
-                    .replace(/&/g, '&amp;')
-                    .replace(/</g, '&lt;')
-                    .replace(/>/g, '&gt;')
-                    .replace(/\"/g, '&quot;')
-                    .replace(/'/g, '&#39;');
-            }}
-
-            const artistName = card.dataset.nameDisplay || card.dataset.name || 'Artistinformation';
-            const spotifyId = card.dataset.spotifyId || '';
-            const popularity = card.dataset.popularity || '';
-            const followers = card.dataset.followers || '';
-            const addedAt = card.dataset.addedAt || '';
-            const spotifyLink = card.dataset.spfLink || '';
-            const topTracksRaw = card.dataset.topTracks || '[]';
-            const image = card.querySelector('.artist-image');
-            const markdownText = card.dataset.markdownInfo || '';
-            let topTracks = [];
-
-            try {{
-                topTracks = JSON.parse(topTracksRaw);
-            }} catch (error) {{
-                topTracks = [];
-            }}
-
-            artistDetailTitle.textContent = artistName;
-
-            if (image && image.getAttribute('src')) {{
-                artistDetailImageWrap.innerHTML = '<img class="artist-detail-hero-image" src="' + image.getAttribute('src') + '" alt="' + artistName.replace(/"/g, '&quot;') + '">';
-            }} else {{
-                artistDetailImageWrap.innerHTML = '<div class="artist-detail-hero-placeholder"><i class="fas fa-user fa-2x" aria-hidden="true"></i></div>';
-            }}
-
-            artistDetailStats.innerHTML = ''
-                + '<span class="artist-stat-pill">Aktiv</span>'
-                + (popularity ? '<span class="artist-stat-pill"><i class="fas fa-fire" aria-hidden="true"></i>' + popularity + '% popularitet</span>' : '')
-                + (followers ? '<span class="artist-stat-pill"><i class="fas fa-users" aria-hidden="true"></i>' + followers + ' följare</span>' : '')
-                + (addedAt ? '<span class="artist-stat-pill"><i class="fas fa-calendar" aria-hidden="true"></i>' + addedAt + '</span>' : '');
-
-            const links = [];
-            const spotifyAnchor = card.querySelector('.spotify-btn');
-            const appleMusicAnchor = card.querySelector('.apple-music-btn');
-            const youtubeMusicAnchor = card.querySelector('.youtube-music-btn');
-            if (spotifyAnchor) {{
-                links.push('<a class="artist-detail-link spotify" href="' + spotifyAnchor.href + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-spotify" aria-hidden="true"></i>Spotify</a>');
-            }}
-            if (appleMusicAnchor) {{
-                links.push('<a class="artist-detail-link apple" href="' + appleMusicAnchor.href + '" target="_blank" rel="noopener noreferrer"><i class="fas fa-music" aria-hidden="true"></i>Apple Music</a>');
-            }}
-            if (youtubeMusicAnchor) {{
-                links.push('<a class="artist-detail-link youtube" href="' + youtubeMusicAnchor.href + '" target="_blank" rel="noopener noreferrer"><i class="fab fa-youtube" aria-hidden="true"></i>YouTube Music</a>');
-            }}
-            artistDetailLinks.innerHTML = links.join('');
-
-            artistDetailInfo.innerHTML = ''
-                + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-fire" aria-hidden="true"></i>Popularitet</span><span>' + (popularity || 'Okänt') + '</span></div>'
-                + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-users" aria-hidden="true"></i>Följare</span><span>' + (followers || 'Okänt') + '</span></div>'
-                + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-link" aria-hidden="true"></i>Spotify-länk</span><span>' + (spotifyLink ? 'Ja' : 'Nej') + '</span></div>'
-                + '<div class="artist-detail-row"><span class="artist-detail-label"><i class="fas fa-calendar" aria-hidden="true"></i>Tillagd</span><span>' + (addedAt || 'Okänt') + '</span></div>';
-
-            const topTracksHtml = topTracks.length
-                ? '<div class="artist-top-tracks">'
-                    + '<div class="artist-detail-label"><i class="fas fa-music" aria-hidden="true"></i>Fem mest populära låtar</div>'
-                    + '<ol class="artist-top-tracks-list">'
-                    + topTracks.map(function(track) {{
-                        const trackName = escapeHtml(track && track.name ? track.name : 'Okänd låt');
-                        const trackPopularity = track && track.popularity !== undefined && track.popularity !== null ? track.popularity : 'Okänt';
-                        const trackUrl = track && track.url ? String(track.url) : '';
-                        const titlePart = trackUrl
-                            ? '<a class="artist-top-track-link" href="' + escapeHtml(trackUrl) + '" target="_blank" rel="noopener noreferrer">' + trackName + '</a>'
-                            : '<span>' + trackName + '</span>';
-                        return '<li>' + titlePart + ' <span class="text-muted">(' + trackPopularity + ')</span></li>';
-                    }}).join('')
-                    + '</ol>'
-                + '</div>'
-                : '<div class="artist-top-tracks"><div class="artist-detail-label"><i class="fas fa-music" aria-hidden="true"></i>Fem mest populära låtar</div><p class="text-muted mb-0 mt-2">Inga låtar hittades för artisten.</p></div>';
-
-            artistDetailInfo.innerHTML += topTracksHtml;
-
-            if (window.marked && typeof window.marked.parse === 'function') {{
-                artistDetailMarkdown.innerHTML = markdownText ? window.marked.parse(markdownText) : '<p class="text-muted mb-0">Ingen artistinformation tillagd ännu.</p>';
-            }} else {{
-                artistDetailMarkdown.textContent = markdownText || 'Ingen artistinformation tillagd ännu.';
-            }}
-
-            artistDetailModal.scrollTop = 0;
-            const artistDetailBody = artistDetailModal.querySelector('.artist-detail-body');
-            if (artistDetailBody) {{
-                artistDetailBody.scrollTop = 0;
-            }}
-
-            artistDetailModal.classList.add('open');
-            artistDetailModal.setAttribute('aria-hidden', 'false');
-            document.body.style.overflow = 'hidden';
-        }}
-
-        function closeArtistDetail() {{
-            if (!artistDetailModal) return;
-            artistDetailModal.classList.remove('open');
-            artistDetailModal.setAttribute('aria-hidden', 'true');
-            document.body.style.overflow = '';
-        }}
-
-        function setupInfoButtons() {{
-            document.querySelectorAll('.toggle-artist-detail').forEach(function(button) {{
-                button.addEventListener('click', function() {{
-                    openArtistDetail(button.closest('.artist-card'));
-                }});
-            }});
-        }}
-
-        function setupNewArtistTip() {{
-            const form = document.getElementById('newArtistTipForm');
-            if (!form) return;
-
-            form.elements.source_url.value = window.location.href;
-            form.addEventListener('submit', async function(event) {{
-                event.preventDefault();
-                const formData = new FormData(form);
-
-                try {{
-                    const response = await fetch('/api/artist-tip', {{
-                        method: 'POST',
-                        body: formData
-                    }});
-                    if (!response.ok) throw new Error('Kunde inte skicka tipset');
-
-                    alert('Tack! Ditt tips har skickats.');
-                    form.reset();
-                    form.elements.source_url.value = window.location.href;
-                    form.closest('details').open = false;
-                }} catch (error) {{
-                    const subject = 'Artisttips: ' + (formData.get('artist') || '');
-                    const body = [
-                        'Artist: ' + (formData.get('artist') || ''),
-                        'Koppling till Hälsingland: ' + (formData.get('halsingland_connection') || '-'),
-                        'Spotify-länk: ' + (formData.get('spotify_link') || '-'),
-                        'Apple Music-länk: ' + (formData.get('apple_music_link') || '-'),
-                        'YouTube Music-länk: ' + (formData.get('youtube_music_link') || '-'),
-                        'Namn: ' + (formData.get('namn') || ''),
-                        'E-post: ' + (formData.get('epost') || ''),
-                        'Källa: ' + (formData.get('source_url') || window.location.href),
-                        '',
-                        'Information:',
-                        formData.get('information') || ''
-                    ].join('\\n');
-                    window.location.href = 'mailto:toppen@grodansparadis.com?subject=' + encodeURIComponent(subject) + '&body=' + encodeURIComponent(body);
-                }}
-            }});
-        }}
-
-        function setupEventListeners() {{
-            // Search functionality
-            const searchInput = document.getElementById('searchInput');
-            searchInput.addEventListener('input', handleSearch);
-
-            // Sort buttons
-            const sortButtons = document.querySelectorAll('[data-sort]');
-            sortButtons.forEach(button => {{
-                button.addEventListener('click', handleSort);
-            }});
-
-            updateSortButtonsState(currentSort, sortDirection);
-        }}
-
-        function updateSortButtonsState(sortType, direction) {{
-            document.querySelectorAll('[data-sort]').forEach(btn => {{
-                const isActive = btn.dataset.sort === sortType;
-                btn.classList.toggle('active', isActive);
-                if (isActive) {{
-                    btn.setAttribute('data-direction', direction);
-                }} else {{
-                    btn.removeAttribute('data-direction');
-                }}
-            }});
-        }}
-
-        function handleSearch(e) {{
-            const searchTerm = e.target.value.toLowerCase();
-            
-            artists.forEach(artist => {{
-                const shouldShow = artist.name.includes(searchTerm);
-                artist.element.style.display = shouldShow ? 'block' : 'none';
-            }});
-
-            updatePositionNumbers();
-        }}
-
-        function handleSort(e) {{
-            showLoading();
-            
-            const sortType = e.target.closest('[data-sort]').dataset.sort;
-            
-            // Toggle direction if same sort
-            if (currentSort === sortType) {{
-                sortDirection = sortDirection === 'asc' ? 'desc' : 'asc';
-            }} else {{
-                sortDirection = sortType === 'name' ? 'asc' : 'desc';
-            }}
-            
-            currentSort = sortType;
-            updateSortButtonsState(currentSort, sortDirection);
-            
-            setTimeout(() => {{
-                sortArtists(sortType, sortDirection);
-                hideLoading();
-            }}, 100);
-        }}
-
-        function sortArtists(sortBy, direction) {{
-            const visibleArtists = artists.filter(artist => 
-                artist.element.style.display !== 'none'
-            );
-
-            visibleArtists.sort((a, b) => {{
-                let aVal, bVal;
-                
-                switch(sortBy) {{
-                    case 'name':
-                        aVal = a.name;
-                        bVal = b.name;
-                        break;
-                    case 'popularity':
-                        aVal = a.popularity;
-                        bVal = b.popularity;
-                        break;
-                    case 'followers':
-                        aVal = a.followers;
-                        bVal = b.followers;
-                        break;
-                    default: // position
-                        aVal = a.position;
-                        bVal = b.position;
-                }}
-
-                if (typeof aVal === 'string') {{
-                    return direction === 'asc' ? 
-                        aVal.localeCompare(bVal, 'sv') : 
-                        bVal.localeCompare(aVal, 'sv');
-                }} else {{
-                    return direction === 'asc' ? aVal - bVal : bVal - aVal;
-                }}
-            }});
-
-            // Re-arrange DOM elements
-            const container = document.getElementById('artistsList');
-            visibleArtists.forEach(artist => {{
-                container.appendChild(artist.element);
-            }});
-
-            updatePositionNumbers();
-        }}
-
-        function updatePositionNumbers() {{
-            const visibleCards = Array.from(document.querySelectorAll('.artist-card'))
-                .filter(card => card.style.display !== 'none');
-            
-            visibleCards.forEach((card, index) => {{
-                const positionElement = card.querySelector('.position-number');
-                positionElement.textContent = `#${{index + 1}}`;
-            }});
-        }}
-
-        // Smooth scrolling for internal links
-        document.querySelectorAll('a[href^="#"]').forEach(anchor => {{
-            anchor.addEventListener('click', function (e) {{
-                e.preventDefault();
-                const target = document.querySelector(this.getAttribute('href'));
-                if (target) {{
-                    target.scrollIntoView({{ behavior: 'smooth' }});
-                }}
-            }});
-        }});
-
-        // Add loading animation to external links
-        document.querySelectorAll('a[target="_blank"]').forEach(link => {{
-            link.addEventListener('click', function() {{
-                showLoading();
-                setTimeout(hideLoading, 2000);
-            }});
-        }});
-
-        if (artistDetailClose) {{
-            artistDetailClose.addEventListener('click', closeArtistDetail);
-        }}
+    try:
+        if output_mode == TOPLIST_OUTPUT_DATA:
+            return write_toplist_data(
+                list(artists),
+                filename,
+                list_date=date.today(),
+                generated_at=datetime.now().strftime('%Y-%m-%d %H:%M')
+            )
+        # Filled in as the cards render; the page writes them after the list
+        search_index = SearchIndex()
+        sort_orders = SortOrders(TOPLIST_SORT_KEYS)
+        rows = sort_orders.collect(search_index.collect(artists, 'name'))
+        render_page(
+            'site/toplist.html',
+            filename,
+            list_date=date.today(),
+            generated_at=datetime.now().strftime('%Y-%m-%d %H:%M'),
+            artist_cards=cards.render(
+                'site/cards/toplist_artist.html',
+                ({'artist': artist, 'position': position}
+                 for position, artist in enumerate(rows, 1))
+            ),
+            search_index=search_index,
+            sort_orders=sort_orders
+        )
+    finally:
+        if conn:
+            conn.close()
+    return filename
 
-        if (artistDetailModal) {{
-            artistDetailModal.addEventListener('click', function(event) {{
-                if (event.target === artistDetailModal) {{
-                    closeArtistDetail();
-                }}
-            }});
-        }}
 
-        document.addEventListener('keydown', function(event) {{
-            if (event.key === 'Escape') {{
-                closeArtistDetail();
-            }}
-        }});
-    </script>
-</body>
-</html>''')
-    
-    conn.close()
-    return filename
+def songs_list(conn):
+    """Yield the template values of every track in song name order"""
+    for row in conn.execute('''
+        SELECT t.name, t.url, t.album_type, t.release_date, a.name as artist_name, a.link as artist_link
+        FROM tracks t 
+        LEFT JOIN artists a ON t.artist_id = a.id 
+        ORDER BY t.name
+    '''):
+        yield {
+            'name': row['name'],
+            'url': row['url'],
+            'album_type': row['album_type'] or 'Unknown',
+            'release_date': row['release_date'] or 'Unknown',
+            'artist_name': row['artist_name'] or 'Unknown Artist',
+            'artist_link': row['artist_link'],
+        }
 
-def generate_html_songs():
-    """Generate modern, interactive HTML songs list file"""
+def generate_html_songs(parallel=None, output_mode=SONGS_OUTPUT, shard_size=SONGS_SHARD_SIZE):
+    """
+    Generate modern, interactive HTML songs list file
+    
+    Args:
+        parallel: Optional ParallelRenderer; the tracks then come from its
+            read snapshot and the cards are rendered in its process pool
+        output_mode: 'single' writes every song to songs.html; 'sharded'
+            makes songs.html an index of letter pages under songs/ (see song_shards.py)
+        shard_size: Songs per letter page at most in the sharded mode
+    """
     filename = 'songs.html'
     
-    conn = get_db_connection()
+    conn = None
+    if parallel:
+        songs, cards = parallel.load(songs_list), parallel
+    else:
+        conn = get_db_connection(readonly=True)
+        songs, cards = songs_list(conn), fragment_cache
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(f'''<!DOCTYPE html>
-<html lang="sv">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <title>Hälsingetoppen - Alla låtar</title>
-    
-    <!-- Google tag (gtag.js) -->
-    <script async src="https://www.googletagmanager.com/gtag/js?id=G-SNRXECZNJX"></script>
-    <script>
-        window.dataLayer = window.dataLayer || [];
-        function gtag(){{dataLayer.push(arguments);}}
-        gtag('js', new Date());
-        gtag('config', 'G-SNRXECZNJX');
-    </script>
-    
-    <!-- Bootstrap CSS -->
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
-    <!-- Font Awesome -->
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-    
-    <style>
-        body {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }}
-        
-        .main-container {{
-            background: rgba(255, 255, 255, 0.95);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            margin: 2rem auto;
-            padding: 2rem;
-        }}
-        
-        .header-section {{
-            text-align: center;
-            margin-bottom: 3rem;
-            padding: 2rem 0;
-            background: linear-gradient(135deg, #55a3ff, #003d82);
-            border-radius: 15px;
-            color: white;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-        }}
-        
-        .song-card {{
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-            border: none;
-            overflow: hidden;
-            margin-bottom: 0.75rem;
-        }}
-        
-        .song-card:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-        }}
-        
-        .song-info {{
-            padding: 1rem;
-        }}
-        
-        .song-title {{
-            font-size: 1.1rem;
-            font-weight: 600;
-            color: #2c3e50;
-            text-decoration: none;
-            display: block;
-            margin-bottom: 0.5rem;
-        }}
-        
-        .song-title:hover {{
-            color: #667eea;
-            text-decoration: none;
-        }}
-        
-        .artist-link {{
-            color: #74b9ff;
-            text-decoration: none;
-            font-weight: 500;
-        }}
-        
-        .artist-link:hover {{
-            color: #0984e3;
-            text-decoration: underline;
-        }}
-        
-        .song-meta {{
-            display: flex;
-            gap: 1rem;
-            flex-wrap: wrap;
-            margin-top: 0.5rem;
-        }}
-        
-        .meta-tag {{
-            background: linear-gradient(135deg, #fd79a8, #e84393);
-            color: white;
-            padding: 0.25rem 0.75rem;
-            border-radius: 15px;
-            font-size: 0.8rem;
-            font-weight: 500;
-        }}
-        
-        .meta-tag.album {{ background: linear-gradient(135deg, #fdcb6e, #e17055); }}
-        .meta-tag.date {{ background: linear-gradient(135deg, #74b9ff, #0984e3); }}
-        
-        .controls-section {{
-            background: white;
-            padding: 1.5rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }}
-        
-        .search-box {{
-            border: 2px solid #e9ecef;
-            border-radius: 25px;
-            padding: 0.75rem 1.5rem;
-            transition: all 0.3s ease;
-        }}
-        
-        .search-box:focus {{
-            border-color: #667eea;
-            box-shadow: 0 0 0 0.2rem rgba(102, 126, 234, 0.25);
-        }}
-        
-        .btn-custom {{
-            border-radius: 25px;
-            padding: 0.75rem 1.5rem;
-            font-weight: 600;
-            transition: all 0.3s ease;
-            border: none;
-        }}
-        
-        .btn-sort {{
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            gap: 0.35rem;
-        }}
-        
-        .btn-sort:hover {{
-            background: linear-gradient(135deg, #764ba2, #667eea);
-            transform: translateY(-2px);
-            color: white;
-        }}
-        
-        .btn-sort:active,
-        .btn-sort.touching {{
-            transform: translateY(0) scale(0.95);
-        }}
-        
-        /* Touch-friendly improvements */
-        @media (hover: none) and (pointer: coarse) {{
-            .btn {{
-                min-height: 44px;
-                padding: 0.75rem 1rem;
-            }}
-            
-            .song-card {{
-                cursor: default;
-            }}
-            
-            .search-box {{
-                min-height: 44px;
-                font-size: 16px; /* Prevents zoom on iOS */
-            }}
-        }}
-        
-        /* Prevent text selection on touch devices */
-        .btn, .song-card {{
-            -webkit-touch-callout: none;
-            -webkit-user-select: none;
-            -khtml-user-select: none;
-            -moz-user-select: none;
-            -ms-user-select: none;
-            user-select: none;
-        }}
-        
-        /* Better touch feedback */
-        .song-card:active {{
-            transform: scale(0.98);
-            transition: transform 0.1s ease;
-        }}
-
-        .btn-sort.active {{
-            background: linear-gradient(135deg, #fd79a8, #e84393);
-            box-shadow: 0 0 0 2px rgba(232, 67, 147, 0.25);
-        }}
-
-        .btn-sort.active::after {{
-            display: inline-block;
-            font-size: 1.2rem;
-            line-height: 1;
-        }}
-
-        .btn-sort.active[data-direction="asc"]::after {{
-            content: "↑";
-        }}
-
-        .btn-sort.active[data-direction="desc"]::after {{
-            content: "↓";
-        }}
-
-        .stats-section {{
-            background: rgba(255,255,255,0.1);
-            padding: 1rem;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            text-align: center;
-        }}
-        
-        .loading-overlay {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0,0,0,0.8);
-            display: none;
-            justify-content: center;
-            align-items: center;
-            z-index: 9999;
-        }}
-        
-        .loading-spinner {{
-            width: 50px;
-            height: 50px;
-            border: 5px solid #f3f3f3;
-            border-top: 5px solid #667eea;
-            border-radius: 50%;
-            animation: spin 1s linear infinite;
-        }}
-        
-        @keyframes spin {{
-            0% {{ transform: rotate(0deg); }}
-            100% {{ transform: rotate(360deg); }}
-        }}
-        
-        @media (max-width: 768px) {{
-            .main-container {{ 
-                margin: 0.5rem; 
-                padding: 0.5rem; 
-            }}
-            .song-card {{ 
-                margin-bottom: 0.5rem; 
-                padding: 0.75rem;
-            }}
-            .song-stats {{ 
-                flex-direction: column; 
-                gap: 0.5rem;
-            }}
-            .stat-item {{
-                font-size: 0.9rem;
-                padding: 0.4rem 0.8rem;
-            }}
-            .song-title {{
-                font-size: 1.1rem;
-                line-height: 1.3;
-            }}
-            .artist-name {{
-                font-size: 0.95rem;
-            }}
-            .position-badge {{
-                width: 35px;
-                height: 35px;
-                font-size: 0.9rem;
-            }}
-            .btn {{
-                font-size: 0.9rem;
-                padding: 0.5rem 1rem;
-            }}
-            .search-container {{
-                margin-bottom: 1rem;
-            }}
-            .search-container input {{
-                font-size: 1rem;
-                padding: 0.75rem;
-            }}
-            .alert {{
-                font-size: 0.9rem;
-                padding: 1rem;
-            }}
-            .header-section h1 {{
-                font-size: 1.8rem;
-            }}
-            .header-section h2 {{
-                font-size: 1.3rem;
-            }}
-            .song-meta {{ 
-                flex-direction: column; 
-                gap: 0.5rem; 
-            }}
-        }}
-        
-        @media (max-width: 480px) {{
-            .main-container {{ 
-                margin: 0.25rem; 
-                padding: 0.25rem; 
-            }}
-            .song-card {{
-                padding: 0.5rem;
-            }}
-            .song-title {{
-                font-size: 1rem;
-            }}
-            .artist-name {{
-                font-size: 0.9rem;
-            }}
-            .position-badge {{
-                width: 30px;
-                height: 30px;
-                font-size: 0.8rem;
-            }}
-            .song-stats {{
-                gap: 0.25rem;
-            }}
-            .stat-item {{
-                font-size: 0.8rem;
-                padding: 0.3rem 0.6rem;
-            }}
-            .btn {{
-                font-size: 0.8rem;
-                padding: 0.4rem 0.8rem;
-            }}
-            .header-section h1 {{
-                font-size: 1.5rem;
-            }}
-            .header-section h2 {{
-                font-size: 1.1rem;
-            }}
-            .col-12 .btn {{
-                margin-bottom: 0.5rem;
-                display: block;
-                width: 100%;
-            }}
-            .song-meta {{
-                gap: 0.25rem;
-            }}
-            .meta-tag {{
-                font-size: 0.7rem;
-                padding: 0.2rem 0.6rem;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="loading-overlay" id="loadingOverlay">
-        <div class="loading-spinner"></div>
-    </div>
-
-    <div class="container-fluid">
-        <div class="main-container">
-            <!-- Header -->
-            <div class="header-section">
-                <h1><i class="fas fa-music me-3"></i>Hälsingetoppen</h1>
-                <h2>Mest lyssnade spår</h2>
-                <p class="mb-0">Alla artisters populäraste låtar i alfabetisk ordning</p>
-            </div>
-
-            <!-- Description -->
-            <div class="row mb-4">
-                <div class="col-12">
-                    <div class="alert alert-info">
-                        <h5><i class="fas fa-info-circle me-2"></i>Om låtlistan</h5>
-                        <p class="mb-2">Här listas topplistans alla artisters mest lyssnade spår (max tio spår per artist). 
-                        Eftersom Spotify inte delar antal lysningar per låt listas låtarna i alfabetisk ordning.</p>
-                        
-                        <p class="mb-0">Spår som finns både som singel och i ett album listas separat om båda är bland de mest avlyssnade.</p>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Navigation Links -->
-            <div class="row mb-4">
-                <div class="col-12 text-center">
-                    <a href="topplista-{date.today()}.html" class="btn btn-custom btn-sort me-2">
-                        <i class="fas fa-home me-2"></i>Tillbaka till topplistan
-                    </a>
-                    <a href="https://open.spotify.com/playlist/7zXnbJOPoNFnQmp8JfiwZ4" target="_blank" class="btn btn-custom btn-sort">
-                        <i class="fab fa-spotify me-2"></i>Spotify Spellista
-                    </a>
-                </div>
-            </div>
-
-            <!-- Stats -->
-            <div class="stats-section">
-                <h5 id="songCount">Laddar låtar...</h5>
-            </div>
-
-            <!-- Controls -->
-            <div class="controls-section">
-                <div class="row align-items-center">
-                    <div class="col-md-6">
-                        <div class="input-group">
-                            <span class="input-group-text"><i class="fas fa-search"></i></span>
-                            <input type="text" class="form-control search-box" id="searchInput" placeholder="Sök låt eller artist...">
-                        </div>
-                    </div>
-                    <div class="col-md-6">
-                        <div class="btn-group w-100" role="group">
-                            <button type="button" class="btn btn-custom btn-sort active" data-sort="song">
-                                <i class="fas fa-music me-1"></i>Låt
-                            </button>
-                            <button type="button" class="btn btn-custom btn-sort" data-sort="artist">
-                                <i class="fas fa-user me-1"></i>Artist
-                            </button>
-                            <button type="button" class="btn btn-custom btn-sort" data-sort="date">
-                                <i class="fas fa-calendar me-1"></i>Datum
-                            </button>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Songs List -->
-            <div id="songsList">
-''')
-        
-        song_count = 0
-        for row in conn.execute('''
-            SELECT t.*, a.name as artist_name, a.link as artist_link
-            FROM tracks t 
-            LEFT JOIN artists a ON t.artist_id = a.id 
-            ORDER BY t.name
-        '''):
-            album_type = row['album_type'] or 'Unknown'
-            release_date = row['release_date'] or 'Unknown'
-            artist_name = row['artist_name'] or 'Unknown Artist'
-            
-            f.write(f'''                <div class="song-card" data-song="{row['name'].lower()}" data-artist="{artist_name.lower()}" data-date="{release_date}">
-                    <div class="song-info">
-                        <a href="{row['url']}" target="_blank" class="song-title">
-                            <i class="fab fa-spotify me-2"></i>{row['name']}
-                        </a>
-                        <div>
-                            <span>av </span>
-                            <a href="{row['artist_link'] or '#'}" target="_blank" class="artist-link">
-                                {artist_name}
-                            </a>
-                        </div>
-                        <div class="song-meta">
-                            <span class="meta-tag album">{album_type}</span>
-                            <span class="meta-tag date">{release_date}</span>
-                        </div>
-                    </div>
-                </div>
-''')
-            song_count += 1
-        
-        f.write(f'''            </div>
-
-            <!-- Footer -->
-            <div class="text-center mt-4">
-                <p class="mb-0">Listan sammanställd av <a href="https://www.akehedman.se/" target="_blank">Åke Hedman</a></p>
-                <p class="small text-muted mt-2">Genererad {datetime.now().strftime("%Y-%m-%d %H:%M")}</p>
-            </div>
-        </div>
-    </div>
-
-    <!-- Scripts -->
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
-    
-    <script>
-        // Application state
-        let currentSort = 'song';
-        let sortDirection = 'asc';
-        let songs = [];
-        const totalSongs = {song_count};
-
-        // Initialize
-        document.addEventListener('DOMContentLoaded', function() {{
-            initializeSongs();
-            setupEventListeners();
-            updateSongCount();
-            hideLoading();
-        }});
-
-        function showLoading() {{
-            document.getElementById('loadingOverlay').style.display = 'flex';
-        }}
-
-        function hideLoading() {{
-            document.getElementById('loadingOverlay').style.display = 'none';
-        }}
-
-        function initializeSongs() {{
-            const songCards = document.querySelectorAll('.song-card');
-            songs = Array.from(songCards).map(card => ({{
-                element: card,
-                song: card.dataset.song,
-                artist: card.dataset.artist,
-                date: card.dataset.date
-            }}));
-        }}
-
-        function setupEventListeners() {{
-            // Search functionality
-            const searchInput = document.getElementById('searchInput');
-            searchInput.addEventListener('input', handleSearch);
-
-            // Sort buttons
-            const sortButtons = document.querySelectorAll('[data-sort]');
-            sortButtons.forEach(button => {{
-                button.addEventListener('click', handleSort);
-            }});
-
-            updateSortButtonsState(currentSort, sortDirection);
-        }}
+    try:
+        if output_mode == SONGS_OUTPUT_SHARDED:
+            # The shards are planned from the complete list
+            return write_sharded_songs(
+                list(songs),
+                cards,
+                index_file=filename,
+                shard_size=shard_size,
+                list_date=date.today(),
+                generated_at=datetime.now().strftime('%Y-%m-%d %H:%M')
+            )
+        # Filled in as the cards render; the page writes them after the list
+        search_index = SearchIndex()
+        sort_orders = SortOrders(SONG_SORT_KEYS)
+        rows = sort_orders.collect(search_index.collect(songs, 'name', 'artist_name'))
+        render_page(
+            'site/songs.html',
+            filename,
+            list_date=date.today(),
+            generated_at=datetime.now().strftime('%Y-%m-%d %H:%M'),
+            song_cards=cards.render(
+                'site/cards/song.html',
+                ({'song': song} for song in rows)
+            ),
+            search_index=search_index,
+            sort_orders=sort_orders
+        )
+    finally:
+        if conn:
+            conn.close()
+    return filename
 
-        function updateSortButtonsState(sortType, direction) {{
-            document.querySelectorAll('[data-sort]').forEach(btn => {{
-                const isActive = btn.dataset.sort === sortType;
-                btn.classList.toggle('active', isActive);
-                if (isActive) {{
-                    btn.setAttribute('data-direction', direction);
-                }} else {{
-                    btn.removeAttribute('data-direction');
-                }}
-            }});
-        }}
+# Database columns the generated pages are built from (pipeline step inputs)
+TOPLIST_ARTIST_INPUTS = (
+    'id', 'name', 'popularity', 'followers', 'link', 'picture_small', 'apple_music_link',
+    'youtube_music_link', 'markdown_info', 'added_at', 'bInactivate'
+)
+TOPLIST_TRACK_INPUTS = ('artist_id', 'name', 'popularity', 'url')
+SONGS_ARTIST_INPUTS = ('id', 'name', 'link')
+SONGS_TRACK_INPUTS = ('artist_id', 'name', 'url', 'album_type', 'release_date')
 
-        function handleSearch(e) {{
-            const searchTerm = e.target.value.toLowerCase();
-            let visibleCount = 0;
-            
-            songs.forEach(song => {{
-                const shouldShow = song.song.includes(searchTerm) || song.artist.includes(searchTerm);
-                song.element.style.display = shouldShow ? 'block' : 'none';
-                if (shouldShow) visibleCount++;
-            }});
 
-            updateSongCount(visibleCount);
-        }}
+def _source_files(*names):
+    """Paths of code files next to this module, used as pipeline inputs"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(app_dir, name) for name in names]
 
-        function handleSort(e) {{
-            showLoading();
-            
-            const sortType = e.target.closest('[data-sort]').dataset.sort;
-            
-            // Toggle direction if same sort
-            if (currentSort === sortType) {{
-                sortDirection = sortDirection === 'asc' ? 'desc' : 'asc';
-            }} else {{
-                sortDirection = 'asc';
-            }}
-            
-            currentSort = sortType;
-            updateSortButtonsState(currentSort, sortDirection);
-            
-            setTimeout(() => {{
-                sortSongs(sortType, sortDirection);
-                hideLoading();
-            }}, 100);
-        }}
 
-        function sortSongs(sortBy, direction) {{
-            const visibleSongs = songs.filter(song => 
-                song.element.style.display !== 'none'
-            );
+def _refresh_artists_step(stale_hours=None, max_artists=None):
+    """Pipeline step: refresh artist data from Spotify"""
+    if not sp:
+        raise RuntimeError("Spotify client is not configured")
+    conn = get_db_connection()
+    try:
+        return refresh_artists_from_spotify(conn, sp, stale_hours=stale_hours, max_artists=max_artists)
+    finally:
+        conn.close()
 
-            visibleSongs.sort((a, b) => {{
-                let aVal, bVal;
-                
-                switch(sortBy) {{
-                    case 'artist':
-                        aVal = a.artist;
-                        bVal = b.artist;
-                        break;
-                    case 'date':
-                        aVal = a.date;
-                        bVal = b.date;
-                        break;
-                    default: // song
-                        aVal = a.song;
-                        bVal = b.song;
-                }}
 
-                return direction === 'asc' ? 
-                    aVal.localeCompare(bVal, 'sv') : 
-                    bVal.localeCompare(aVal, 'sv');
-            }});
+def _sync_tracks_step(stale_hours=None, max_artists=None):
+    """Pipeline step: sync top tracks, resuming an interrupted sync job"""
+    if not sp:
+        raise RuntimeError("Spotify client is not configured")
+    if not sync_tracks_lock.acquire(blocking=False):
+        raise RuntimeError("Track synchronization is already running")
+    try:
+        return TrackSyncEngine(sp, DB_PATH).run_job(stale_hours=stale_hours, max_artists=max_artists)
+    finally:
+        sync_tracks_lock.release()
 
-            // Re-arrange DOM elements
-            const container = document.getElementById('songsList');
-            visibleSongs.forEach(song => {{
-                container.appendChild(song.element);
-            }});
-        }}
 
-        function updateSongCount(visible = null) {{
-            const count = visible !== null ? visible : totalSongs;
-            const text = visible !== null ? 
-                `Visar ${{count}} av ${{totalSongs}} låtar` : 
-                `${{totalSongs}} låtar totalt`;
-            
-            document.getElementById('songCount').textContent = text;
-        }}
+def _match_links_step():
+    """Pipeline step: match missing Apple Music and YouTube Music links"""
+    from match_apple_music_links import (
+        DEFAULT_COUNTRY, DEFAULT_DELAY as APPLE_DELAY, DEFAULT_MIN_SCORE as APPLE_MIN_SCORE,
+        match_all_apple_links
+    )
+    results = {
+        'apple_music': match_all_apple_links(
+            DB_PATH, APPLE_MIN_SCORE, DEFAULT_COUNTRY, dry_run=False, delay=APPLE_DELAY
+        )
+    }
 
-        // Add loading animation to external links
-        document.querySelectorAll('a[target="_blank"]').forEach(link => {{
-            link.addEventListener('click', function() {{
-                showLoading();
-                setTimeout(hideLoading, 2000);
-            }});
-        }});
-    </script>
-</body>
-</html>''')
+    # ytmusicapi is optional; without it only Apple Music links are matched
+    try:
+        from match_youtube_music_links import (
+            DEFAULT_DELAY as YOUTUBE_DELAY, DEFAULT_MIN_SCORE as YOUTUBE_MIN_SCORE,
+            match_all_youtube_links
+        )
+    except ImportError as e:
+        logger.warning(f"Skipping YouTube Music link matching: {e}")
+    else:
+        results['youtube_music'] = match_all_youtube_links(
+            DB_PATH, YOUTUBE_MIN_SCORE, dry_run=False, delay=YOUTUBE_DELAY
+        )
+    return results
+
+
+def generation_pipeline(update_spotify=False, sync_tracks=False, match_links=False,
+                        include_random_artist_list=False, stale_hours=None, max_artists=None,
+                        force=False, parallel=None, toplist_output=TOPLIST_OUTPUT, songs_output=SONGS_OUTPUT,
+                        precompress=PRECOMPRESS):
+    """
+    Build the generate-all pipeline.
+    
+    Spotify refresh, track sync and link matching only run when requested and
+    always run then (their input is remote), as does the random artist list.
+    The toplist and songs pages are skipped when the database columns,
+    templates and code they are built from are unchanged.
+    Link matching talks to Apple and YouTube, so it runs alongside the
+    Spotify steps; the pages wait for every step that writes their data, or
+    for every fetch step when they share a parallel render snapshot.
+    
+    Args:
+        update_spotify: Refresh artist data from Spotify first
+        sync_tracks: Sync top tracks from Spotify first
+        match_links: Match missing Apple Music and YouTube Music links first
+        include_random_artist_list: Also generate the randomized artist list
+        stale_hours: Incremental mode for the Spotify steps (None refreshes all)
+        max_artists: Optional cap on the number of artists refreshed and synced
+        force: Regenerate every page even if its inputs are unchanged
+        parallel: Optional ParallelRenderer the pages are rendered with
+        toplist_output: Toplist output mode, 'cards' or 'data'
+        songs_output: Songs list output mode, 'single' or 'sharded'
+        precompress: Write .gz and .br siblings of the generated files (see precompress.py)
+    
+    Returns:
+        Pipeline
+    """
+    today = date.today()
+    # Pages link fingerprinted asset files; new links must regenerate them
+    assets = asset_manifest()
+    page_files = [os.path.join(TEMPLATE_DIR, 'site')] + _source_files(
+        'renderer.py', 'search_index.py', 'sort_orders.py', 'static_assets.py', 'web_admin.py'
+    )
     
-    conn.close()
-    return filename
+    steps = []
+    if update_spotify:
+        steps.append(Step('spotify_refresh', lambda: _refresh_artists_step(stale_hours, max_artists)))
+    if sync_tracks:
+        # The artist refresh and the track sync share the Spotify rate limit
+        steps.append(Step('track_sync', lambda: _sync_tracks_step(stale_hours, max_artists),
+                          after=[step.name for step in steps]))
+    if match_links:
+        steps.append(Step('link_matching', _match_links_step))
+    fetch_steps = [step.name for step in steps]
+    
+    if STATIC_ASSETS:
+        # Declares no inputs: it only writes the asset files that are missing
+        steps.append(Step('assets', build_assets, outputs=[ASSET_DIR]))
+    
+    def page_after(*unrelated):
+        # A shared snapshot must only be taken once every fetch step is done
+        return [name for name in fetch_steps if parallel or name not in unrelated]
+    
+    toplist_file = f'topplista-{today}.html'
+    steps.append(Step(
+        'toplist',
+        lambda: generate_html_toplist(toplist_file, parallel=parallel, output_mode=toplist_output),
+        after=page_after(),
+        tables={'artists': TOPLIST_ARTIST_INPUTS, 'tracks': TOPLIST_TRACK_INPUTS},
+        files=page_files + _source_files('toplist_data.py'),
+        values={'list_date': today, 'toplist_output': toplist_output, 'assets': assets},
+        outputs=[toplist_file] + ([info_file_for(toplist_file)] if toplist_output == TOPLIST_OUTPUT_DATA else [])
+    ))
+    steps.append(Step(
+        'songs',
+        lambda: generate_html_songs(parallel=parallel, output_mode=songs_output),
+        after=page_after('link_matching'),
+        tables={'artists': SONGS_ARTIST_INPUTS, 'tracks': SONGS_TRACK_INPUTS},
+        files=page_files + _source_files('song_shards.py'),
+        # The page links back to the toplist of the day
+        values={
+            'list_date': today, 'songs_output': songs_output, 'shard_size': SONGS_SHARD_SIZE, 'assets': assets
+        },
+        outputs=['songs.html'] + ([SONGS_SHARD_DIR] if songs_output == SONGS_OUTPUT_SHARDED else [])
+    ))
+    if include_random_artist_list:
+        # Declares no inputs: the list gets a new random order on every run
+        steps.append(Step(
+            'random_artist_list',
+            lambda: generate_random_artist_list(parallel=parallel),
+            after=page_after('track_sync')
+        ))
+    
+    if precompress:
+        page_steps = [step.name for step in steps if step.name not in fetch_steps]
+        page_outputs = [path for step in steps for path in step.outputs]
+        if include_random_artist_list:
+            page_outputs.append(RANDOM_ARTIST_FILE)
+        # Declares no inputs: it compares every file with its siblings itself,
+        # which costs a decompression per file when nothing changed
+        steps.append(Step(
+            'precompress',
+            lambda: precompress_outputs(page_outputs),
+            after=page_steps
+        ))
+    
+    return Pipeline(steps, db_path=DB_PATH, force=force)
+
+
+def run_generation_pipeline(processes=RENDER_PROCESSES, **options):
+    """
+    Run the generate-all pipeline and summarize its results.
+    
+    Args:
+        processes: Render the pages from one read snapshot in this many
+            worker processes (0 or 1 renders them in-process)
+        **options: Passed on to generation_pipeline()
+    
+    Returns:
+        dict with toplist_file, songs_file, random_artist_file (None unless
+        generated or up to date), update_count, changed_artist_ids,
+        track_count, error_count, errors, skipped (names of up-to-date steps)
+        and steps (per-step status, result, error and elapsed time)
+    """
+    if processes > 1:
+        with ParallelRenderer(DB_PATH, processes) as parallel:
+            steps = generation_pipeline(parallel=parallel, **options).run()
+    else:
+        steps = generation_pipeline(**options).run()
+    
+    results = {
+        'toplist_file': None,
+        'songs_file': None,
+        'random_artist_file': None,
+        'update_count': 0,
+        'changed_artist_ids': set(),
+        'track_count': 0,
+        'error_count': 0,
+        'errors': [],
+        'skipped': [name for name, step in steps.items() if step['status'] == STATUS_SKIPPED],
+        'steps': steps,
+    }
+    
+    for name, step in steps.items():
+        if step['status'] == STATUS_FAILED:
+            results['errors'].append(f"Step {name} failed: {step['error']}")
+            results['error_count'] += 1
+    
+    refresh = steps.get('spotify_refresh', {}).get('result')
+    if refresh:
+        results['update_count'] = refresh['update_count']
+        results['changed_artist_ids'] = refresh['changed_ids']
+        results['error_count'] += refresh['error_count']
+        if refresh['error_count']:
+            results['errors'].append(f"Failed to update {refresh['error_count']} artists from Spotify")
+    
+    track_sync = steps.get('track_sync', {}).get('result')
+    if track_sync:
+        results['track_count'] = track_sync['track_count']
+        results['error_count'] += track_sync['error_count']
+        if track_sync['error_count']:
+            results['errors'].append(f"Failed to sync tracks for {track_sync['error_count']} artists")
+    
+    pages = {
+        'toplist': ('toplist_file', f'topplista-{date.today()}.html'),
+        'songs': ('songs_file', 'songs.html'),
+        'random_artist_list': ('random_artist_file', RANDOM_ARTIST_FILE),
+    }
+    for name, (key, filename) in pages.items():
+        step = steps.get(name)
+        if step and step['status'] != STATUS_FAILED:
+            results[key] = step['result'] or filename
+    
+    return results
 
 if __name__ == '__main__':
     init_database()
+    # The admin runs for days; pick up edited page templates without a restart
+    enable_template_auto_reload()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file